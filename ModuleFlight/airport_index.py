@@ -0,0 +1,238 @@
+"""
+Index local des aéroports et des villes (autocomplétion)
+Chargé en mémoire depuis les fichiers de référence livrés avec le module
+(ModuleFlight/data) : aucune requête en base ni appel Duffel par frappe
+"""
+
+import csv
+import logging
+import os
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict, namedtuple
+from itertools import chain
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+_SEPARATORS = re.compile(r'[\W_]+')
+
+Airport = namedtuple('Airport', 'code name city country latitude longitude time_zone city_code')
+City = namedtuple('City', 'code name country airports')
+
+# Préfixes parcourus au plus par requête (requêtes très courtes : « a », « sa »)
+MAX_PREFIX_MATCHES = 400
+# Mot indexé seul s'il figure dans au plus N noms
+MAX_WORD_ENTRIES = 50
+# Part minimale de trigrammes communs pour une suggestion approchée (fautes de frappe)
+MIN_FUZZY_SCORE = 0.5
+
+
+def fold(text):
+    """Texte comparable : minuscules, sans accents ni ponctuation"""
+    text = text or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _SEPARATORS.sub(' ', text.lower()).strip()
+
+
+def trigrams(text):
+    """Trigrammes d'un texte déjà normalisé (bornés par des blancs)"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AirportIndex:
+    """
+    Index préfixe + trigrammes des aéroports et villes multi-aéroports
+
+    Les clés (code, nom, ville, mots du nom) sont triées pour une recherche par
+    préfixe en bisect ; les trigrammes des noms rattrapent les fautes de frappe.
+    Le chargement a lieu au premier appel, une fois par processus.
+    """
+
+    def __init__(self, airports_path=None, cities_path=None):
+        self.airports_path = airports_path or os.path.join(DATA_DIR, 'airports.csv')
+        self.cities_path = cities_path or os.path.join(DATA_DIR, 'cities.csv')
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.airports = {}
+        self.cities = {}
+        self._entries = []
+        self._entry_ids = {}
+        self._entry_cities = []
+        self._weights = []
+        self._keys = []
+        self._key_entries = []
+        self._trigrams = {}
+        self._key_trigrams = []
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def _load(self):
+        """Lit les fichiers de référence et construit les index"""
+        with open(self.cities_path, encoding='utf-8', newline='') as f:
+            cities = [
+                City(row['code'], row['name'], row['country'], tuple(row['airports'].split()))
+                for row in csv.DictReader(f)
+            ]
+        city_of = {code: city.code for city in cities for code in city.airports}
+
+        with open(self.airports_path, encoding='utf-8', newline='') as f:
+            airports = [
+                Airport(
+                    row['code'], row['name'], row['city'], row['country'],
+                    float(row['latitude']), float(row['longitude']), row['time_zone'],
+                    city_of.get(row['code'])
+                )
+                for row in csv.DictReader(f)
+            ]
+
+        self.cities = {city.code: city for city in cities}
+        self.airports = {airport.code: airport for airport in airports}
+
+        # Les villes d'abord : à rang égal, « PAR » passe avant ses aéroports
+        self._entries = cities + airports
+        self._entry_ids = {(type(entry), entry.code): entry_id for entry_id, entry in enumerate(self._entries)}
+        self._weights = [self._weight(entry) for entry in self._entries]
+        entries_by_key = defaultdict(list)
+        fuzzy_keys = set()
+        self._entry_cities = []
+        entry_words = []
+        word_counts = Counter()
+        for entry_id, entry in enumerate(self._entries):
+            name = fold(entry.name)
+            city = name if isinstance(entry, City) else fold(entry.city)
+            self._entry_cities.append(city)
+            names = {name, city} - {''}
+            words = {word for name in names for word in name.split() if len(word) >= 3} - names
+            word_counts.update(words)
+            entry_words.append(words)
+            fuzzy_keys.add(city)
+            for key in names | {entry.code.lower()}:
+                entries_by_key[key].append(entry_id)
+        # Les mots trop courants (« airport », « international ») ne sont pas des clés
+        for entry_id, words in enumerate(entry_words):
+            for word in words:
+                if word_counts[word] <= MAX_WORD_ENTRIES:
+                    entries_by_key[word].append(entry_id)
+                    fuzzy_keys.add(word)
+
+        # Clés uniques triées (préfixes) ; trigrammes des villes et des mots (fautes de frappe)
+        self._keys = sorted(entries_by_key)
+        self._key_entries = [tuple(entries_by_key[key]) for key in self._keys]
+        postings = defaultdict(list)
+        self._key_trigrams = []
+        for key_id, key in enumerate(self._keys):
+            grams = trigrams(key) if key in fuzzy_keys else ()
+            self._key_trigrams.append(len(grams))
+            for gram in grams:
+                postings[gram].append(key_id)
+        self._trigrams = dict(postings)
+        logger.info(f"Index aéroports chargé: {len(self.airports)} aéroports, {len(self.cities)} villes")
+
+    def get(self, code):
+        """Aéroport ou ville multi-aéroports d'un code IATA, ou None"""
+        self._ensure_loaded()
+        code = (code or '').upper()
+        return self.cities.get(code) or self.airports.get(code)
+
+    def search(self, query, limit=10):
+        """
+        Suggestions pour une saisie partielle (code, ville ou nom d'aéroport)
+
+        Ordre : code exact, puis préfixes (ville, puis nom), puis correspondances
+        approchées ; à rang égal, villes et aéroports rattachés à une ville en tête.
+
+        Returns:
+            list: Suggestions (dict) prêtes à sérialiser
+        """
+        self._ensure_loaded()
+        folded = fold(query)
+        if not folded:
+            return []
+
+        ranks = {}
+
+        code = folded.upper()
+        for kind in (City, Airport):
+            entry_id = self._entry_ids.get((kind, code))
+            if entry_id is not None:
+                ranks[entry_id] = 0
+
+        start = bisect_left(self._keys, folded)
+        for position in range(start, min(start + MAX_PREFIX_MATCHES, len(self._keys))):
+            if not self._keys[position].startswith(folded):
+                break
+            for entry_id in self._key_entries[position]:
+                rank = 1 if self._entry_cities[entry_id].startswith(folded) else 2
+                ranks[entry_id] = min(ranks.get(entry_id, rank), rank)
+
+        if len(ranks) < limit and len(folded) >= 4:
+            fuzzy = {}
+            for key_id, score in self._fuzzy(folded):
+                for entry_id in self._key_entries[key_id]:
+                    fuzzy[entry_id] = max(fuzzy.get(entry_id, 0), score)
+            for entry_id, score in fuzzy.items():
+                ranks.setdefault(entry_id, 4 - score)
+
+        weights = self._weights
+        ordered = sorted(ranks, key=lambda entry_id: (ranks[entry_id], weights[entry_id]))
+        return [self._suggestion(self._entries[entry_id]) for entry_id in ordered[:limit]]
+
+    def _fuzzy(self, folded):
+        """Clés qui partagent assez de trigrammes avec la saisie (score de Dice)"""
+        grams = trigrams(folded)
+        # Comptage en C (Counter) ; une clé a au moins 3 trigrammes, d'où le seuil
+        shared = Counter(chain.from_iterable(self._trigrams.get(gram, ()) for gram in grams))
+        threshold = MIN_FUZZY_SCORE * (len(grams) + 3) / 2
+        matches = []
+        for key_id, count in shared.most_common():
+            if count < threshold:
+                break
+            score = 2 * count / (len(grams) + self._key_trigrams[key_id])
+            if score >= MIN_FUZZY_SCORE:
+                matches.append((key_id, score))
+        return matches
+
+    @staticmethod
+    def _weight(entry):
+        """Départage à rang égal : villes, aéroports d'une ville, internationaux"""
+        if isinstance(entry, City):
+            return (0, entry.name)
+        international = 'international' in entry.name.lower()
+        return (1 if entry.city_code else 2, not international, entry.name)
+
+    @staticmethod
+    def _suggestion(entry):
+        if isinstance(entry, City):
+            return {
+                'code': entry.code,
+                'type': 'city',
+                'name': entry.name,
+                'city': entry.name,
+                'country': entry.country,
+                'airports': list(entry.airports),
+            }
+        return {
+            'code': entry.code,
+            'type': 'airport',
+            'name': entry.name,
+            'city': entry.city,
+            'country': entry.country,
+            'city_code': entry.city_code,
+        }
+
+
+# Instance globale (chargée au premier appel)
+airport_index = AirportIndex()
@@ -6,11 +6,21 @@ Expose les fonctionnalités via une API REST
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.views import APIView
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework import exceptions
+from django.conf import settings
 from django.db import transaction
 from django.core.exceptions import ValidationError
+from django.http import HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
 from datetime import datetime
+import json
 import logging
 
 from .models import TravelAgency, MerchantAgency, FlightBooking, FlightUserManager
@@ -20,14 +30,107 @@ from .serializers import (
     FlightBookingSerializer,
     FlightBookingCreateSerializer,
     FlightSearchSerializer,
-    FlightOfferSerializer
+    FlightOfferSerializer,
+    SearchResultsQuerySerializer,
+    AirportSearchQuerySerializer
 )
-from .duffel_service import duffel_service, DuffelAPIError
+from .duffel_service import duffel_service, DuffelAPIError, DuffelDeadlineError, DuffelUnavailableError
+from .duffel_async import async_duffel_service
+from .duffel_deadline import with_deadline
+from .duffel_offers import normalize_offers, select_fields
+from .duffel_results import results_store
+from .airport_index import airport_index
+from .reference_store import reference_store
 from ModuleProfils.models import ClientProfile, MerchantProfile
 
 logger = logging.getLogger(__name__)
 
 
+def format_search_response(search_results, validated_data):
+    """
+    Construit la réponse de FlightSearchAPIView à partir des résultats Duffel
+    
+    Args:
+        search_results (dict): Résultats de search_flights
+        validated_data (dict): Données validées par FlightSearchSerializer
+    
+    Returns:
+        dict: Offres formatées, paramètres de recherche et total
+    """
+    # Formatage des offres
+    formatted_offers = []
+    for offer in search_results.get('offers', []):
+        formatted_offer = duffel_service.format_offer_for_frontend(offer)
+        if formatted_offer:
+            formatted_offers.append(formatted_offer)
+    
+    # Classement (tri « meilleur » par défaut) ; la recherche reste interrogeable par search_id
+    search_id, formatted_offers = results_store.rank(search_results, formatted_offers)
+    
+    return_date = validated_data.get('return_date')
+    response = format_offers_payload(formatted_offers, validated_data)
+    response.update({
+        'search_params': {
+            'origin': validated_data['origin'],
+            'destination': validated_data['destination'],
+            'departure_date': validated_data['departure_date'].isoformat(),
+            'return_date': return_date.isoformat() if return_date else None,
+            'passengers': validated_data['passengers'],
+            'cabin_class': validated_data['cabin_class'],
+            'flex_days': validated_data.get('flex_days', 0),
+            'legs': [
+                dict(leg, departure_date=leg['departure_date'].isoformat())
+                for leg in validated_data.get('legs') or []
+            ]
+        },
+        'search_id': search_id,
+        'response_format': validated_data.get('response_format', 'full'),
+        'total_offers': len(formatted_offers),
+        'flex_summary': search_results.get('flex_summary', []),
+        'itineraries': search_results.get('itineraries', []),
+        'multi_city_summary': search_results.get('multi_city_summary'),
+        'stale': search_results.get('stale', False),
+        'stale_since': search_results.get('stale_since')
+    })
+    return response
+
+
+def format_offers_payload(offers, validated_data):
+    """
+    Offres d'une réponse de recherche au format demandé
+    
+    Args:
+        offers (list): Offres formatées
+        validated_data (dict): response_format ('full' ou 'normalized') et fields
+    
+    Returns:
+        dict: 'offers', plus 'airports', 'carriers' et 'aircraft' en format normalisé
+    """
+    fields = validated_data.get('fields')
+    if validated_data.get('response_format') == 'normalized':
+        return normalize_offers(offers, fields)
+    return {'offers': select_fields(offers, fields) if fields else offers}
+
+
+def raw_search_response(body, validated_data):
+    """
+    Réponse du format raw : corps Duffel relayé sans décodage ni réencodage
+    
+    L'enveloppe {success, data} est ajoutée par simple concaténation d'octets,
+    sauf avec bare=true.
+    
+    Args:
+        body (bytes): Réponse JSON de POST offer_requests
+        validated_data (dict): Données validées par FlightSearchSerializer
+    
+    Returns:
+        HttpResponse: Réponse application/json
+    """
+    if not validated_data.get('bare'):
+        body = b''.join((b'{"success": true, "data": ', body, b'}'))
+    return HttpResponse(body, content_type='application/json')
+
+
 class TravelAgencyViewSet(viewsets.ModelViewSet):
     """ViewSet pour la gestion des agences de voyage"""
     
@@ -173,6 +276,7 @@ class FlightBookingViewSet(viewsets.ModelViewSet):
             return FlightBookingCreateSerializer
         return FlightBookingSerializer
     
+    @with_deadline()
     def create(self, request, *args, **kwargs):
         """Créer une nouvelle réservation via API"""
         try:
@@ -222,6 +326,18 @@ class FlightBookingViewSet(viewsets.ModelViewSet):
                         'message': 'Offre invalide ou expirée'
                     }, status=status.HTTP_400_BAD_REQUEST)
                 
+            except DuffelDeadlineError as e:
+                # Budget épuisé : pas de réservation créée sans les données de l'offre
+                logger.warning(f"Réservation abandonnée, délai dépassé pour l'offre {duffel_offer_id}")
+                return Response({
+                    'success': False,
+                    'message': str(e)
+                }, status=status.HTTP_504_GATEWAY_TIMEOUT)
+            except DuffelUnavailableError as e:
+                return Response({
+                    'success': False,
+                    'message': str(e)
+                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             except DuffelAPIError as e:
                 return Response({
                     'success': False,
@@ -384,6 +500,7 @@ class FlightSearchAPIView(APIView):
     
     permission_classes = [IsAuthenticated]
     
+    @with_deadline()
     def post(self, request):
         """Rechercher des vols via l'API Duffel"""
         try:
@@ -397,39 +514,39 @@ class FlightSearchAPIView(APIView):
             return_date = serializer.validated_data.get('return_date')
             passengers = serializer.validated_data['passengers']
             cabin_class = serializer.validated_data['cabin_class']
+            flex_days = serializer.validated_data['flex_days']
+            legs = serializer.validated_data.get('legs')
             
             # Recherche via Duffel
             try:
+                if serializer.validated_data['response_format'] == 'raw':
+                    return raw_search_response(
+                        duffel_service.search_flights_raw(
+                            origin=origin,
+                            destination=destination,
+                            departure_date=departure_date,
+                            return_date=return_date,
+                            passengers=passengers,
+                            cabin_class=cabin_class,
+                            legs=legs
+                        ),
+                        serializer.validated_data
+                    )
+                
                 search_results = duffel_service.search_flights(
                     origin=origin,
                     destination=destination,
                     departure_date=departure_date,
                     return_date=return_date,
                     passengers=passengers,
-                    cabin_class=cabin_class
+                    cabin_class=cabin_class,
+                    flex_days=flex_days,
+                    legs=legs
                 )
                 
-                # Formatage des offres
-                formatted_offers = []
-                for offer in search_results.get('offers', []):
-                    formatted_offer = duffel_service.format_offer_for_frontend(offer)
-                    if formatted_offer:
-                        formatted_offers.append(formatted_offer)
-                
                 return Response({
                     'success': True,
-                    'data': {
-                        'offers': formatted_offers,
-                        'search_params': {
-                            'origin': origin,
-                            'destination': destination,
-                            'departure_date': departure_date.isoformat(),
-                            'return_date': return_date.isoformat() if return_date else None,
-                            'passengers': passengers,
-                            'cabin_class': cabin_class
-                        },
-                        'total_offers': len(formatted_offers)
-                    }
+                    'data': format_search_response(search_results, serializer.validated_data)
                 })
                 
             except DuffelAPIError as e:
@@ -446,6 +563,7 @@ class FlightSearchAPIView(APIView):
                 'message': 'Erreur interne lors de la recherche'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @with_deadline()
     def get(self, request):
         """Récupérer les détails d'une offre spécifique"""
         try:
@@ -484,3 +602,223 @@ class FlightSearchAPIView(APIView):
                 'success': False,
                 'message': 'Erreur interne'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class SearchResultsAPIView(APIView):
+    """API de filtre, tri et facettes sur les résultats d'une recherche déjà faite"""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, search_id):
+        """Offres filtrées et triées d'une recherche, avec les facettes de la sélection"""
+        serializer = SearchResultsQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            results = results_store.query(search_id, **serializer.to_query())
+        except Exception as e:
+            logger.error(f"Erreur lors de la requête sur les résultats {search_id}: {str(e)}")
+            return Response({
+                'success': False,
+                'message': 'Erreur interne'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        if results is None:
+            return Response({
+                'success': False,
+                'message': 'Recherche expirée, relancez la recherche'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        data = serializer.validated_data
+        return Response({
+            'success': True,
+            'data': {
+                'search_id': search_id,
+                'offers': results['offers'],
+                'total_offers': results['total_offers'],
+                'facets': results['facets'],
+                'sort': data['sort'],
+                'order': data['order'],
+                'offset': data['offset'],
+                'limit': data['limit']
+            }
+        })
+
+
+class AirportAutocompleteAPIView(APIView):
+    """
+    API d'autocomplétion des aéroports et villes (index local en mémoire)
+    
+    Données de référence publiques : ni authentification ni session, donc aucune
+    requête en base par frappe.
+    """
+    
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        """Suggestions pour ?q=<saisie>&limit=<n>"""
+        serializer = AirportSearchQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        response = Response({
+            'success': True,
+            'data': {
+                'query': data['q'],
+                'results': airport_index.search(data['q'], limit=data['limit'])
+            }
+        })
+        response['Cache-Control'] = f"public, max-age={settings.FLIGHT_CONFIG.get('AIRPORT_SUGGESTIONS_CACHE_TTL', 86400)}"
+        return response
+
+
+class DuffelStatsAPIView(APIView):
+    """API d'observation du transport Duffel (processus courant)"""
+    
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        """Statistiques de connexions et de latence par endpoint Duffel, état du référentiel"""
+        return Response({
+            'success': True,
+            'data': dict(duffel_service.get_stats(), reference_store=reference_store.info())
+        })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncFlightSearchAPIView(View):
+    """
+    Variante asynchrone de FlightSearchAPIView (Daphne/ASGI)
+    
+    Mêmes entrées et sorties ; l'authentification réutilise les classes DRF configurées.
+    """
+    
+    async def authenticate(self, request):
+        """Utilisateur authentifié via les authentificateurs DRF, ou None"""
+        drf_request = Request(
+            request,
+            authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        )
+        try:
+            user = await sync_to_async(lambda: drf_request.user)()
+        except exceptions.APIException:
+            return None
+        return user if user and user.is_authenticated else None
+    
+    def forbidden(self):
+        return JsonResponse({
+            'detail': "Informations d'authentification non fournies."
+        }, status=403)
+    
+    @with_deadline()
+    async def post(self, request, *args, **kwargs):
+        """Rechercher des vols via l'API Duffel"""
+        if not await self.authenticate(request):
+            return self.forbidden()
+        
+        try:
+            try:
+                payload = json.loads(request.body or b'{}')
+            except json.JSONDecodeError:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Données JSON invalides'
+                }, status=400)
+            
+            serializer = FlightSearchSerializer(data=payload)
+            if not serializer.is_valid():
+                return JsonResponse({
+                    'success': False,
+                    'errors': serializer.errors
+                }, status=400)
+            
+            data = serializer.validated_data
+            try:
+                if data['response_format'] == 'raw':
+                    return raw_search_response(await async_duffel_service.search_flights_raw(
+                        origin=data['origin'],
+                        destination=data['destination'],
+                        departure_date=data['departure_date'],
+                        return_date=data.get('return_date'),
+                        passengers=data['passengers'],
+                        cabin_class=data['cabin_class'],
+                        legs=data.get('legs')
+                    ), data)
+                
+                search_results = await async_duffel_service.search_flights(
+                    origin=data['origin'],
+                    destination=data['destination'],
+                    departure_date=data['departure_date'],
+                    return_date=data.get('return_date'),
+                    passengers=data['passengers'],
+                    cabin_class=data['cabin_class'],
+                    flex_days=data['flex_days'],
+                    legs=data.get('legs')
+                )
+            except DuffelAPIError as e:
+                logger.error(f"Erreur API Duffel: {str(e)}")
+                return JsonResponse({
+                    'success': False,
+                    'message': f'Erreur lors de la recherche: {str(e)}'
+                }, status=400)
+            
+            return JsonResponse({
+                'success': True,
+                'data': await sync_to_async(format_search_response, thread_sensitive=False)(search_results, data)
+            })
+            
+        except Exception as e:
+            logger.error(f"Erreur dans AsyncFlightSearchAPIView: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'message': 'Erreur interne lors de la recherche'
+            }, status=500)
+    
+    @with_deadline()
+    async def get(self, request, *args, **kwargs):
+        """Récupérer les détails d'une offre spécifique"""
+        if not await self.authenticate(request):
+            return self.forbidden()
+        
+        offer_id = request.GET.get('offer_id')
+        if not offer_id:
+            return JsonResponse({
+                'success': False,
+                'message': 'ID d\'offre requis'
+            }, status=400)
+        
+        try:
+            offer_details = await async_duffel_service.get_offer(offer_id)
+            formatted_offer = async_duffel_service.format_offer_for_frontend(offer_details)
+            
+            if not formatted_offer:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Offre introuvable ou invalide'
+                }, status=404)
+            
+            return JsonResponse({
+                'success': True,
+                'data': formatted_offer
+            })
+            
+        except DuffelAPIError as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Erreur lors de la récupération: {str(e)}'
+            }, status=400)
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération d'offre: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'message': 'Erreur interne'
+            }, status=500)
@@ -0,0 +1,591 @@
+"""
+Client asyncio pour l'API Duffel
+Variante non bloquante de DuffelService, destinée aux vues async servies par Daphne
+"""
+
+import asyncio
+import time
+import weakref
+
+import httpx
+from asgiref.sync import sync_to_async
+import logging
+
+from .duffel_metrics import duffel_metrics, endpoint_key
+from .duffel_circuit import CLOSED, HALF_OPEN
+from .duffel_deadline import deadline
+from .duffel_logging import log_call
+from .duffel_service import DuffelService, DuffelAPIError, DuffelUnavailableError, TopOffers, duffel_service
+from .duffel_stream import StreamedJSON
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDuffelTransport:
+    """
+    Transport HTTP asynchrone (httpx) vers Duffel
+
+    Un client (et son pool de connexions) par boucle d'événements : Daphne en
+    utilise une par processus, les scripts en créent une par asyncio.run().
+    """
+
+    def __init__(self, base_url, headers, config=None, metrics=None):
+        config = config or {}
+        self.base_url = base_url
+        self.headers = dict(headers)
+        self.keep_alive = config.get('KEEP_ALIVE', True)
+        self.max_connections = config.get('ASYNC_MAX_CONNECTIONS', 200)
+        self.max_keepalive_connections = config.get('POOL_MAXSIZE', 20) if self.keep_alive else 0
+        self.metrics = metrics or duffel_metrics
+        self._clients = weakref.WeakKeyDictionary()
+
+    def client(self):
+        """Client httpx de la boucle d'événements courante"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                headers=self.headers,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections
+                )
+            )
+            self._clients[loop] = client
+        return client
+
+    async def request(self, method, endpoint, stream=False, **kwargs):
+        """
+        Envoie une requête sans bloquer la boucle d'événements
+
+        Args:
+            stream (bool): Rendre la réponse dès les en-têtes reçus (corps lu par aiter_bytes)
+
+        Returns:
+            httpx.Response: Réponse HTTP (même interface que requests.Response)
+        """
+        key = endpoint_key(endpoint)
+        started = time.perf_counter()
+        client = self.client()
+        try:
+            if stream:
+                return await client.send(client.build_request(method, f"{self.base_url}/{endpoint}", **kwargs), stream=True)
+            return await client.request(method, f"{self.base_url}/{endpoint}", **kwargs)
+        finally:
+            self.metrics.incr(key, 'async_requests')
+            self.metrics.observe(key, 'async_latency', time.perf_counter() - started)
+
+    async def aclose(self):
+        """Ferme le client de la boucle courante"""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+class AsyncDuffelService(DuffelService):
+    """
+    Service Duffel asynchrone
+
+    Expose les mêmes méthodes publiques que DuffelService ; celles qui appellent
+    l'API sont des coroutines. Le formatage et la validation sont partagés.
+    """
+
+    def __init__(self, base_url=None, config=None, sync_service=None):
+        """
+        Args:
+            sync_service (DuffelService, optional): Service synchrone du processus. Son
+                limiteur de débit, son ordonnanceur et son disjoncteur sont repris : les
+                deux services partagent le même budget et voient le même incident
+        """
+        super().__init__(base_url=base_url, config=config)
+        if sync_service is not None:
+            self.rate_limiter = sync_service.rate_limiter
+            self.scheduler = sync_service.scheduler
+            self.circuit = sync_service.circuit
+        self.async_transport = AsyncDuffelTransport(self.base_url, self.headers, self.config)
+        self._refreshing_tasks = set()
+
+    async def _make_request(self, method, endpoint, data=None, params=None, stream_path=None, raw=False):
+        """
+        Effectue une requête HTTP asynchrone vers l'API Duffel (nouvelles tentatives selon retry_policy)
+
+        Args:
+            stream_path (tuple, optional): Tableau à lire en flux (voir DuffelService._make_request)
+            raw (bool): Rendre le corps d'une réponse en succès tel quel (bytes)
+        """
+        retry = self.retry_policy.start(method, endpoint)
+        while True:
+            timeout = self._call_timeout(endpoint)
+            if not self.circuit.allow():
+                raise DuffelUnavailableError("Duffel est momentanément indisponible, réessayez dans quelques instants")
+
+            async with self.scheduler.aslot(endpoint) as granted:
+                if not granted:
+                    raise DuffelAPIError("Limite de requêtes Duffel atteinte, réessayez dans quelques instants")
+
+                wire = self.wire_log.sample()
+                if wire:
+                    self.wire_log.log_request(method, f"{self.base_url}/{endpoint}", self.headers, data, params)
+
+                started = time.monotonic()
+                try:
+                    response = await self.async_transport.request(
+                        method,
+                        endpoint,
+                        json=data,
+                        params=params,
+                        timeout=timeout,
+                        stream=stream_path is not None
+                    )
+
+                except httpx.HTTPError as e:
+                    latency = time.monotonic() - started
+                    log_call(method, endpoint_key(endpoint), None, 0, latency, retry.attempt + 1, type(e).__name__)
+                    self.circuit.record(False, latency)
+                    delay = retry.backoff(not_sent=isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)))
+                    if delay is None:
+                        logger.error(f"Erreur de connexion Duffel: {str(e)}")
+                        raise DuffelAPIError(f"Erreur de connexion: {str(e)}")
+                else:
+                    latency = time.monotonic() - started
+                    size = self._response_size(response, stream_path is not None)
+                    log_call(method, endpoint_key(endpoint), response.status_code, size, latency, retry.attempt + 1)
+                    if stream_path is not None and (wire or response.status_code >= 400):
+                        # Corps d'erreur ou trace complète : lu en entier (aiter_bytes le relit ensuite)
+                        await response.aread()
+                    if wire:
+                        self.wire_log.log_response(response)
+                    self.circuit.record(response.status_code < 500, latency)
+                    delay = retry.backoff(response.status_code, response.headers.get('Retry-After'))
+                    if delay is None:
+                        if stream_path is not None and response.status_code < 400:
+                            return StreamedJSON(response, stream_path, self.stream_chunk_size)
+                        if raw and response.status_code < 400:
+                            return response.content
+                        return self._handle_response(response)
+                    await response.aclose()
+
+            # Attente hors de la place réservée par le scheduler
+            await asyncio.sleep(delay)
+
+    async def search_flights(self, origin, destination, departure_date, return_date=None,
+                             passengers=1, cabin_class='economy', use_cache=True, flex_days=0, legs=None):
+        """
+        Recherche des vols via l'API Duffel (voir DuffelService.search_flights)
+
+        Returns:
+            dict: Données de l'offre request et des offres
+        """
+        if legs:
+            return await self._search_multi_city(legs, passengers, cabin_class, use_cache)
+
+        if flex_days:
+            pairs = self._flex_date_pairs(departure_date, return_date, flex_days)
+            outcomes = await self._run_concurrently_async(self.search_flights, [
+                {
+                    'origin': origin,
+                    'destination': destination,
+                    'departure_date': flex_departure,
+                    'return_date': flex_return,
+                    'passengers': passengers,
+                    'cabin_class': cabin_class,
+                    'use_cache': use_cache,
+                }
+                for flex_departure, flex_return in pairs
+            ])
+            return self._merge_flexible_results(pairs, outcomes, departure_date)
+
+        cache_params = {
+            'origin': origin,
+            'destination': destination,
+            'departure_date': departure_date,
+            'return_date': return_date,
+            'passengers': passengers,
+            'cabin_class': cabin_class,
+        }
+        return await self._search_cached(cache_params, use_cache)
+
+    async def _search_cached(self, cache_params, use_cache):
+        """Recherche d'un jeu de paramètres : cache, regroupement, résultats périmés (voir DuffelService._search_cached)"""
+        if use_cache:
+            cached_results = await sync_to_async(self.search_cache.get, thread_sensitive=False)(**cache_params)
+            if cached_results is not None:
+                logger.info(
+                    f"Recherche servie depuis le cache: {cache_params['origin']} → {cache_params['destination']} "
+                    f"({cache_params['departure_date']})"
+                )
+                return cached_results
+
+        # Duffel en incident : dernière recherche connue plutôt qu'une attente vaine
+        if self.circuit.state != CLOSED:
+            stale_results = await self._stale_search(cache_params)
+            if stale_results is not None:
+                return stale_results
+
+        try:
+            return await self.search_calls.ado(
+                self.search_cache.make_key(**cache_params),
+                lambda: self._search_and_store(cache_params, use_cache)
+            )
+        except DuffelAPIError as e:
+            # Refus du disjoncteur, ou échec qui vient de l'ouvrir
+            stale_results = None
+            if isinstance(e, DuffelUnavailableError) or self.circuit.state != CLOSED:
+                stale_results = await self._stale_search(cache_params)
+            if stale_results is None:
+                raise
+            return stale_results
+
+    async def _stale_search(self, cache_params):
+        """Résultats périmés pendant un incident (voir DuffelService._stale_search)"""
+        stale_results = await sync_to_async(self.search_cache.get_stale, thread_sensitive=False)(**cache_params)
+        if stale_results is None:
+            return None
+        logger.warning(
+            f"Duffel indisponible, résultats du {stale_results['stale_since']} servis: "
+            f"{cache_params['origin']} → {cache_params['destination']} ({cache_params['departure_date']})"
+        )
+        self.transport.metrics.incr('search', 'stale_served')
+        if self.circuit.state == HALF_OPEN:
+            self._refresh_in_background(cache_params)
+        return stale_results
+
+    def _refresh_in_background(self, cache_params):
+        """Relance la recherche dans une tâche de la boucle courante (une par jeu de paramètres)"""
+        key = self.search_cache.make_key(**cache_params)
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        # Référence conservée dans _refreshing_tasks : une tâche sans référence peut être collectée
+        task = asyncio.ensure_future(self._refresh_search(key, cache_params))
+        self._refreshing_tasks.add(task)
+        task.add_done_callback(self._refreshing_tasks.discard)
+
+    async def _refresh_search(self, key, cache_params):
+        try:
+            with deadline(None):  # La tâche hérite du contexte de la requête, pas de son budget
+                await self.search_calls.ado(key, lambda: self._search_and_store(cache_params, True))
+            logger.info(f"Recherche rafraîchie en arrière-plan: {cache_params['origin']} → {cache_params['destination']}")
+        except DuffelAPIError as e:
+            logger.info(f"Rafraîchissement en arrière-plan sans succès: {str(e)}")
+        finally:
+            with self._refreshing_lock:
+                self._refreshing.discard(key)
+
+    async def _search_and_store(self, cache_params, use_cache):
+        """Exécute la recherche et alimente les caches (voir DuffelService._search_and_store)"""
+        results = await self._fetch_search(**cache_params)
+        await sync_to_async(self.offer_cache.set_many, thread_sensitive=False)(results.get('offers', []))
+
+        if use_cache:
+            await sync_to_async(self.search_cache.set, thread_sensitive=False)(results, **cache_params)
+        return results
+
+    async def _search_multi_city(self, legs, passengers, cabin_class, use_cache):
+        """Recherche combinée et allers simples en parallèle (voir DuffelService._search_multi_city)"""
+        searches = self._multi_city_params(legs, passengers, cabin_class)
+        outcomes = await self._run_concurrently_async(self._search_cached, [
+            {'cache_params': cache_params, 'use_cache': use_cache} for cache_params in searches
+        ])
+        return self._merge_multi_city_results(searches[1:], outcomes)
+
+    async def _run_concurrently_async(self, func, calls):
+        """
+        Exécute les coroutines func(**kwargs) en parallèle, au plus
+        DUFFEL_CONFIG['SEARCH_MAX_WORKERS'] à la fois
+
+        Returns:
+            list: [(résultat, exception)] dans l'ordre des appels
+        """
+        semaphore = asyncio.Semaphore(max(1, self.search_max_workers))
+
+        async def run(kwargs):
+            async with semaphore:
+                return await func(**kwargs)
+
+        results = await asyncio.gather(*(run(kwargs) for kwargs in calls), return_exceptions=True)
+        return [(None, result) if isinstance(result, Exception) else (result, None) for result in results]
+
+    async def _fetch_search(self, origin, destination, departure_date, return_date=None,
+                            passengers=1, cabin_class='economy', legs=None):
+        """Exécute la recherche auprès de Duffel (voir DuffelService._fetch_search)"""
+        try:
+            logger.info(f"Recherche Duffel async: {origin} → {destination} ({departure_date}, retour {return_date})")
+
+            search_data = self._build_search_data(
+                origin, destination, departure_date, return_date, passengers, cabin_class, legs
+            )
+
+            started = time.perf_counter()
+
+            inline = self.inline_offers and not self.fetch_all_offers
+            offer_request_params = {'return_offers': 'true' if inline else 'false'}
+            if inline and self.stream_offers:
+                offer_request_response, inline_offers, received = await self._stream_offers(
+                    'POST', 'offer_requests', ('data', 'offers'), data=search_data, params=offer_request_params
+                )
+                offer_request = offer_request_response['data']
+            else:
+                offer_request_response = await self._make_request(
+                    'POST',
+                    'offer_requests',
+                    data=search_data,
+                    params=offer_request_params
+                )
+                offer_request = offer_request_response['data']
+                inline_offers, received = offer_request.pop('offers', None), None
+
+            if self.fetch_all_offers:
+                top_offers = TopOffers(self.results_limit)
+                async for page in self.iter_offer_pages(offer_request['id'], self.max_offers_scanned,
+                                                        self.offers_page_size):
+                    top_offers.extend(page)
+                return self._finish_search(offer_request, top_offers.sorted(), 'all_pages', started, top_offers.seen)
+
+            if inline and inline_offers is not None:
+                return self._finish_search(offer_request, inline_offers, 'inline', started, received)
+            if self.inline_offers:
+                logger.warning(f"Offres absentes de la demande {offer_request['id']}, lecture via /offers")
+                self.transport.metrics.incr('search', 'inline_fallbacks')
+
+            if self.stream_offers:
+                _, offers, received = await self._stream_offers(
+                    'GET', 'offers', ('data',), params=self._offer_list_params(offer_request['id'])
+                )
+                return self._finish_search(offer_request, offers or [], 'two_step', started, received)
+
+            offers_response = await self._make_request(
+                'GET',
+                'offers',
+                params=self._offer_list_params(offer_request['id'])
+            )
+
+            return self._finish_search(offer_request, offers_response['data'], 'two_step', started)
+
+        except DuffelAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche de vols: {str(e)}")
+            raise DuffelAPIError(f"Erreur lors de la recherche: {str(e)}")
+
+    async def search_flights_raw(self, origin, destination, departure_date, return_date=None,
+                                 passengers=1, cabin_class='economy', legs=None):
+        """
+        Recherche relayée telle quelle (voir DuffelService.search_flights_raw)
+
+        Returns:
+            bytes: Réponse JSON de Duffel
+        """
+        try:
+            logger.info(f"Recherche Duffel relayée async: {origin} → {destination} ({departure_date}, retour {return_date})")
+            search_data = self._build_search_data(
+                origin, destination, departure_date, return_date, passengers, cabin_class, legs
+            )
+            started = time.perf_counter()
+            body = await self._make_request(
+                'POST', 'offer_requests', data=search_data, params={'return_offers': 'true'}, raw=True
+            )
+        except DuffelAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche de vols: {str(e)}")
+            raise DuffelAPIError(f"Erreur lors de la recherche: {str(e)}")
+
+        return self._finish_raw_search(body, started)
+
+    async def _stream_offers(self, method, endpoint, path, data=None, params=None):
+        """Lit les offres d'une réponse Duffel en flux (voir DuffelService._stream_offers)"""
+        stream = await self._make_request(method, endpoint, data=data, params=params, stream_path=path)
+        top_offers = TopOffers(self.results_limit)
+        async for offer in stream:
+            top_offers.push(offer)
+        self.transport.metrics.incr(endpoint_key(endpoint), 'streamed_bytes', stream.size)
+        return stream.document, top_offers.sorted() if stream.found else None, top_offers.seen
+
+    async def iter_search_offers(self, origin, destination, departure_date, return_date=None,
+                                 passengers=1, cabin_class='economy', use_cache=True, results=None):
+        """
+        Recherche des vols en renvoyant les offres au fil de leur réception
+        (voir DuffelService.iter_search_offers, y compris `results`)
+
+        Yields:
+            dict: Offres brutes Duffel
+        """
+        cache_params = {
+            'origin': origin,
+            'destination': destination,
+            'departure_date': departure_date,
+            'return_date': return_date,
+            'passengers': passengers,
+            'cabin_class': cabin_class,
+        }
+        if use_cache:
+            cached_results = await sync_to_async(self.search_cache.get, thread_sensitive=False)(**cache_params)
+            if cached_results is not None:
+                logger.info(f"Recherche servie depuis le cache: {origin} → {destination} ({departure_date})")
+                for offer in cached_results.get('offers', []):
+                    yield offer
+                if results is not None:
+                    results.update(offer_request=cached_results.get('offer_request'), offers=cached_results.get('offers', []))
+                return
+
+        try:
+            search_data = self._build_search_data(
+                origin, destination, departure_date, return_date, passengers, cabin_class
+            )
+            offer_request = (await self._make_request(
+                'POST', 'offer_requests', data=search_data, params={'return_offers': 'false'}
+            ))['data']
+        except DuffelAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche de vols: {str(e)}")
+            raise DuffelAPIError(f"Erreur lors de la recherche: {str(e)}")
+
+        offers = []
+        async for page in self.iter_offer_pages(offer_request['id'], self.results_limit, self.stream_page_size):
+            offers.extend(page)
+            for offer in page:
+                yield offer
+
+        logger.info(f"Offres récupérées en flux: {len(offers)} offres")
+        await sync_to_async(self.offer_cache.set_many, thread_sensitive=False)(offers)
+        if use_cache:
+            await sync_to_async(self.search_cache.set, thread_sensitive=False)(
+                {'offer_request': offer_request, 'offers': offers}, **cache_params
+            )
+        if results is not None:
+            results.update(offer_request=offer_request, offers=offers)
+
+    async def iter_offer_pages(self, offer_request_id, max_offers, page_size):
+        """
+        Parcourt les pages d'offres via le curseur `after`, la page suivante étant
+        demandée pendant le traitement de la courante (voir DuffelService.iter_offer_pages)
+
+        Yields:
+            list: Offres brutes de chaque page
+        """
+        received = 0
+        params = self._offer_page_params(offer_request_id, received, max_offers, page_size)
+        pending = asyncio.ensure_future(self._make_request('GET', 'offers', params=params)) if params else None
+        try:
+            while pending is not None:
+                try:
+                    response = await pending
+                except DuffelAPIError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Erreur lors de la lecture des offres: {str(e)}")
+                    raise DuffelAPIError(f"Erreur lors de la recherche: {str(e)}")
+                page = response.get('data', [])
+                received += len(page)
+                params = self._offer_page_params(offer_request_id, received, max_offers, page_size, response, page)
+                pending = asyncio.ensure_future(self._make_request('GET', 'offers', params=params)) if params else None
+                self.transport.metrics.incr('offers', 'pages')
+                yield page
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+    async def get_offer(self, offer_id, use_cache=True):
+        """Récupère les détails d'une offre spécifique (voir DuffelService.get_offer)"""
+        if use_cache:
+            cached_offer = await sync_to_async(self.offer_cache.get, thread_sensitive=False)(offer_id)
+            if cached_offer is not None:
+                logger.info(f"Offre servie depuis le cache: {offer_id}")
+                return cached_offer
+
+        return await self.offer_calls.ado(offer_id, lambda: self._fetch_offer(offer_id))
+
+    async def _fetch_offer(self, offer_id):
+        """Lit une offre chez Duffel et la met en stock"""
+        try:
+            logger.info(f"Récupération de l'offre: {offer_id}")
+
+            response = await self._make_request('GET', f'offers/{offer_id}')
+            await sync_to_async(self.offer_cache.set, thread_sensitive=False)(response['data'])
+            return response['data']
+
+        except DuffelAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération de l'offre {offer_id}: {str(e)}")
+            raise DuffelAPIError(f"Erreur lors de la récupération de l'offre: {str(e)}")
+
+    async def get_offer_details(self, offer_id, use_cache=True):
+        """Récupère les détails complets d'une offre (voir DuffelService.get_offer_details)"""
+        try:
+            return await self.get_offer(offer_id, use_cache=use_cache)
+        except DuffelAPIError:
+            raise
+        except Exception as e:
+            raise DuffelAPIError(f"Impossible de récupérer les détails de l'offre: {str(e)}")
+
+    async def create_booking(self, offer_id, passenger_data, payment_data):
+        """Crée une réservation sur Duffel (voir DuffelService.create_booking)"""
+        try:
+            booking_data = {
+                "data": {
+                    "selected_offers": [offer_id],
+                    "passengers": passenger_data,
+                    "payments": [payment_data]
+                }
+            }
+
+            logger.info(f"Création de réservation pour l'offre: {offer_id}")
+
+            response = await self._make_request('POST', 'orders', data=booking_data)
+            return response['data']
+
+        except DuffelAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors de la création de réservation: {str(e)}")
+            raise DuffelAPIError(f"Erreur lors de la création de réservation: {str(e)}")
+
+    async def confirm_booking(self, booking_id):
+        """Confirme une réservation (voir DuffelService.confirm_booking)"""
+        try:
+            logger.info(f"Confirmation de réservation: {booking_id}")
+
+            response = await self._make_request('POST', f'orders/{booking_id}/actions/confirm')
+            return response['data']
+
+        except DuffelAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors de la confirmation: {str(e)}")
+            raise DuffelAPIError(f"Erreur lors de la confirmation: {str(e)}")
+
+    async def cancel_booking(self, booking_id):
+        """Annule une réservation (voir DuffelService.cancel_booking)"""
+        try:
+            logger.info(f"Annulation de réservation: {booking_id}")
+
+            response = await self._make_request('POST', f'orders/{booking_id}/actions/cancel')
+            return response['data']
+
+        except DuffelAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors de l'annulation: {str(e)}")
+            raise DuffelAPIError(f"Erreur lors de l'annulation: {str(e)}")
+
+    async def get_booking_details(self, booking_id):
+        """Récupère les détails d'une réservation (voir DuffelService.get_booking_details)"""
+        try:
+            logger.info(f"Récupération des détails de réservation: {booking_id}")
+
+            response = await self._make_request('GET', f'orders/{booking_id}')
+            return response['data']
+
+        except DuffelAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des détails: {str(e)}")
+            raise DuffelAPIError(f"Erreur lors de la récupération: {str(e)}")
+
+
+# Instance globale du service asynchrone (débit, priorités et disjoncteur communs avec duffel_service)
+async_duffel_service = AsyncDuffelService(sync_service=duffel_service)
@@ -0,0 +1,232 @@
+"""
+Caches des données Duffel
+S'appuie sur le framework de cache Django (LocMem par défaut, Redis si configuré)
+"""
+
+import hashlib
+import json
+import time
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.cache import caches
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def parse_expires_at(value):
+    """
+    Convertit un `expires_at` Duffel (ISO 8601, suffixe Z) en timestamp
+
+    Returns:
+        float | None: Timestamp UNIX, ou None si absent/invalide
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def earliest_expiry(offers):
+    """Timestamp d'expiration le plus proche parmi les offres (None si aucune date)"""
+    expiries = [ts for ts in (parse_expires_at(offer.get('expires_at')) for offer in offers) if ts]
+    return min(expiries) if expiries else None
+
+
+class SearchCache:
+    """
+    Cache des résultats de recherche, indexé sur les paramètres normalisés
+
+    Une copie de secours de la dernière recherche réussie est gardée
+    FLIGHT_CONFIG['STALE_RESULTS_TTL'] secondes, au-delà de l'expiration des offres :
+    elle n'est servie que lorsque Duffel est indisponible (disjoncteur ouvert).
+    """
+
+    KEY_PREFIX = 'duffel:search:'
+    STALE_PREFIX = 'duffel:search-stale:'
+
+    def __init__(self, duffel_config=None, flight_config=None):
+        duffel_config = duffel_config if duffel_config is not None else getattr(settings, 'DUFFEL_CONFIG', {})
+        flight_config = flight_config if flight_config is not None else getattr(settings, 'FLIGHT_CONFIG', {})
+        self.enabled = flight_config.get('CACHE_SEARCH_RESULTS', False)
+        self.ttl = duffel_config.get('OFFER_CACHE_TTL', 900)
+        self.stale_ttl = flight_config.get('STALE_RESULTS_TTL', 21600)
+        self.alias = duffel_config.get('CACHE_ALIAS', 'default')
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def normalize(**params):
+        """
+        Normalise les paramètres de recherche (casse, dates ISO, types)
+
+        Returns:
+            dict: Paramètres normalisés, triables et sérialisables
+        """
+        normalized = {}
+        for name, value in params.items():
+            if isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            elif isinstance(value, str):
+                value = value.strip()
+                value = value.lower() if name == 'cabin_class' else value.upper()
+            normalized[name] = value
+        return normalized
+
+    def make_key(self, **params):
+        """Clé de cache stable pour un jeu de paramètres de recherche"""
+        payload = json.dumps(self.normalize(**params), sort_keys=True, default=str)
+        return self.KEY_PREFIX + hashlib.sha1(payload.encode()).hexdigest()
+
+    def get(self, **params):
+        """
+        Résultats en cache pour ces paramètres
+
+        Returns:
+            dict | None: Résultats (offer_request + offers) ou None si absents/expirés
+        """
+        if not self.enabled:
+            return None
+        entry = self.cache.get(self.make_key(**params))
+        if not entry:
+            return None
+        # Double contrôle : le backend peut conserver une entrée un peu au-delà de l'expiration
+        if entry.get('expires_at') and entry['expires_at'] <= time.time():
+            return None
+        return entry['results']
+
+    def set(self, results, **params):
+        """
+        Met en cache les résultats jusqu'au TTL ou à l'expiration de la première offre
+
+        Returns:
+            int: Durée de conservation en secondes (0 si non mis en cache)
+        """
+        now = time.time()
+        if self.stale_ttl:
+            self.cache.set(self.make_stale_key(**params), {'results': results, 'cached_at': now}, self.stale_ttl)
+        if not self.enabled:
+            return 0
+        expires_at = now + self.ttl
+        first_expiry = earliest_expiry(results.get('offers', []))
+        if first_expiry:
+            expires_at = min(expires_at, first_expiry)
+        timeout = int(expires_at - now)
+        if timeout <= 0:
+            return 0
+        self.cache.set(
+            self.make_key(**params),
+            {'results': results, 'cached_at': now, 'expires_at': expires_at},
+            timeout
+        )
+        logger.info(f"Recherche mise en cache pour {timeout}s")
+        return timeout
+
+    def delete(self, **params):
+        """Supprime l'entrée correspondant à ces paramètres"""
+        self.cache.delete(self.make_key(**params))
+
+    def make_stale_key(self, **params):
+        return self.STALE_PREFIX + self.make_key(**params)[len(self.KEY_PREFIX):]
+
+    def get_stale(self, **params):
+        """
+        Dernière recherche réussie pour ces paramètres, même expirée
+
+        Returns:
+            dict | None: Résultats marqués `stale` (avec `stale_since`, ISO 8601) ou None
+        """
+        if not self.stale_ttl:
+            return None
+        entry = self.cache.get(self.make_stale_key(**params))
+        if not entry:
+            return None
+        return {
+            **entry['results'],
+            'stale': True,
+            'stale_since': datetime.fromtimestamp(entry['cached_at']).isoformat(timespec='seconds'),
+        }
+
+
+class OfferCache:
+    """
+    Stock des offres Duffel indexé par ID d'offre
+
+    Chaque offre est conservée jusqu'à son propre `expires_at` moins
+    FLIGHT_CONFIG['OFFER_EXPIRY_BUFFER'], pour ne jamais servir une offre sur le point d'expirer.
+    """
+
+    KEY_PREFIX = 'duffel:offer:'
+
+    def __init__(self, duffel_config=None, flight_config=None):
+        duffel_config = duffel_config if duffel_config is not None else getattr(settings, 'DUFFEL_CONFIG', {})
+        flight_config = flight_config if flight_config is not None else getattr(settings, 'FLIGHT_CONFIG', {})
+        self.enabled = flight_config.get('CACHE_OFFERS', True)
+        self.buffer = flight_config.get('OFFER_EXPIRY_BUFFER', 300)
+        self.alias = duffel_config.get('CACHE_ALIAS', 'default')
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, offer_id):
+        return f"{self.KEY_PREFIX}{offer_id}"
+
+    def timeout_for(self, offer):
+        """Durée de conservation d'une offre (0 si sans expiration connue ou trop proche)"""
+        expires_at = parse_expires_at(offer.get('expires_at'))
+        if not expires_at:
+            return 0
+        return max(0, int(expires_at - self.buffer - time.time()))
+
+    def get(self, offer_id):
+        """
+        Offre en cache
+
+        Returns:
+            dict | None: Données brutes de l'offre ou None
+        """
+        if not self.enabled or not offer_id:
+            return None
+        offer = self.cache.get(self.make_key(offer_id))
+        if offer and self.timeout_for(offer) <= 0:
+            return None
+        return offer
+
+    def set(self, offer):
+        """Met une offre en cache (ignorée si elle expire avant le buffer)"""
+        if not self.enabled or not offer or 'id' not in offer:
+            return 0
+        timeout = self.timeout_for(offer)
+        if timeout > 0:
+            self.cache.set(self.make_key(offer['id']), offer, timeout)
+        return timeout
+
+    def set_many(self, offers):
+        """
+        Met en cache un lot d'offres (regroupées par durée de conservation)
+
+        Returns:
+            int: Nombre d'offres mises en cache
+        """
+        if not self.enabled:
+            return 0
+        groups = {}
+        for offer in offers:
+            if not offer or 'id' not in offer:
+                continue
+            timeout = self.timeout_for(offer)
+            if timeout > 0:
+                groups.setdefault(timeout, {})[self.make_key(offer['id'])] = offer
+        for timeout, entries in groups.items():
+            self.cache.set_many(entries, timeout)
+        return sum(len(entries) for entries in groups.values())
+
+    def delete(self, offer_id):
+        """Retire une offre du cache (ex: offre refusée par Duffel)"""
+        self.cache.delete(self.make_key(offer_id))
@@ -0,0 +1,134 @@
+"""
+Disjoncteur des appels Duffel
+S'ouvre sur un taux d'erreurs ou d'appels lents ; les appels échouent alors aussitôt
+"""
+
+import threading
+import time
+from collections import deque
+
+import logging
+
+from .duffel_metrics import duffel_metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur par processus (DUFFEL_CONFIG['CIRCUIT_*'])
+
+    Fermé : les appels passent et leurs résultats sont comptés sur une fenêtre
+    glissante de CIRCUIT_WINDOW secondes. Dès CIRCUIT_MIN_CALLS appels, il s'ouvre
+    si CIRCUIT_ERROR_RATE des appels ont échoué (erreur de connexion, 5xx) ou si
+    CIRCUIT_SLOW_RATE ont duré plus de CIRCUIT_SLOW_CALL secondes.
+    Ouvert : les appels sont refusés sans attendre pendant CIRCUIT_OPEN_SECONDS.
+    Semi-ouvert : un seul appel d'essai passe ; son succès referme le disjoncteur,
+    son échec le rouvre.
+    """
+
+    def __init__(self, name, config=None, metrics=None):
+        config = config or {}
+        self.name = name
+        self.enabled = config.get('CIRCUIT_BREAKER', True)
+        self.window = config.get('CIRCUIT_WINDOW', 30)
+        self.min_calls = config.get('CIRCUIT_MIN_CALLS', 10)
+        self.error_rate = config.get('CIRCUIT_ERROR_RATE', 0.5)
+        self.slow_call = config.get('CIRCUIT_SLOW_CALL', 10)
+        self.slow_rate = config.get('CIRCUIT_SLOW_RATE', 0.5)
+        self.open_seconds = config.get('CIRCUIT_OPEN_SECONDS', 30)
+        # Un appel d'essai sans réponse au-delà de ce délai n'empêche plus d'en lancer un autre
+        self.probe_timeout = config.get('REQUEST_TIMEOUT', 30) + 5
+        self.metrics = metrics or duffel_metrics
+        self._lock = threading.Lock()
+        self._calls = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_started = None
+
+    @property
+    def state(self):
+        """État courant (OPEN devient HALF_OPEN après CIRCUIT_OPEN_SECONDS)"""
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now):
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_started = None
+            logger.info(f"Disjoncteur {self.name} semi-ouvert : appel d'essai autorisé")
+        return self._state
+
+    def allow(self):
+        """
+        Autorise ou non un appel amont
+
+        Returns:
+            bool: False si le disjoncteur est ouvert (ou si l'essai est déjà en cours)
+        """
+        if not self.enabled:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and (self._probe_started is None or now - self._probe_started > self.probe_timeout):
+                self._probe_started = now
+                return True
+        self.metrics.incr(self.name, 'circuit_rejections')
+        return False
+
+    def record(self, ok, latency):
+        """
+        Compte le résultat d'un appel amont
+
+        Args:
+            ok (bool): Réponse obtenue hors 5xx
+            latency (float): Durée de l'appel en secondes
+        """
+        if not self.enabled:
+            return
+        slow = latency >= self.slow_call
+        with self._lock:
+            now = time.monotonic()
+            if self._current_state(now) == HALF_OPEN:
+                if ok and not slow:
+                    self._close()
+                else:
+                    self._open(now, 'appel d\'essai en échec')
+                return
+            if self._state == OPEN:
+                return
+
+            self._calls.append((now, ok, slow))
+            while self._calls and now - self._calls[0][0] > self.window:
+                self._calls.popleft()
+            if len(self._calls) < self.min_calls:
+                return
+            total = len(self._calls)
+            errors = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+            slow_calls = sum(1 for _, _, call_slow in self._calls if call_slow)
+            if errors / total >= self.error_rate:
+                self._open(now, f"{errors}/{total} appels en erreur")
+            elif slow_calls / total >= self.slow_rate:
+                self._open(now, f"{slow_calls}/{total} appels de plus de {self.slow_call}s")
+
+    def _open(self, now, reason):
+        self._state = OPEN
+        self._opened_at = now
+        self._probe_started = None
+        self._calls.clear()
+        self.metrics.incr(self.name, 'circuit_opened')
+        logger.warning(f"Disjoncteur {self.name} ouvert pour {self.open_seconds}s : {reason}")
+
+    def _close(self):
+        self._state = CLOSED
+        self._probe_started = None
+        self._calls.clear()
+        self.metrics.incr(self.name, 'circuit_closed')
+        logger.info(f"Disjoncteur {self.name} refermé : Duffel répond de nouveau")
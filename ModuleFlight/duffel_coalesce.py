@@ -0,0 +1,257 @@
+"""
+Regroupement (single-flight) des appels Duffel identiques simultanés
+Un seul appel amont par clé ; les appels concurrents attendent et reçoivent son résultat
+"""
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+import weakref
+
+from asgiref.sync import sync_to_async
+import logging
+
+from .duffel_deadline import bounded
+from .duffel_metrics import duffel_metrics
+
+try:
+    import redis
+except ImportError:  # Regroupement inter-processus indisponible, regroupement local seulement
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Libère le verrou seulement s'il appartient encore à l'appelant
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class _Call:
+    """Appel en cours pour une clé"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Regroupe les appels identiques simultanés
+
+    Entre threads d'un même processus, les appels concurrents attendent l'appel en
+    cours. Avec DUFFEL_CONFIG['REDIS_URL'], un verrou Redis élit un seul processus
+    pour l'appel amont ; les autres lisent son résultat (JSON) publié dans Redis.
+    """
+
+    KEY_PREFIX = 'duffel:flight:'
+
+    def __init__(self, name, config=None, metrics=None):
+        config = config or {}
+        self.name = name
+        self.enabled = config.get('COALESCE_REQUESTS', True)
+        self.timeout = config.get('COALESCE_TIMEOUT', config.get('REQUEST_TIMEOUT', 30) + 5)
+        self.poll_interval = config.get('COALESCE_POLL_INTERVAL', 0.05)
+        self.redis_url = config.get('REDIS_URL')
+        self.metrics = metrics or duffel_metrics
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = weakref.WeakKeyDictionary()
+        self._redis = None
+
+    # ----- Regroupement local (threads) -----
+
+    def do(self, key, func):
+        """
+        Exécute func() une seule fois pour tous les appels simultanés de même clé
+
+        Returns:
+            Résultat de func() (partagé entre les appelants : ne pas le modifier)
+        """
+        if not self.enabled:
+            return func()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            self.metrics.incr(self.name, 'coalesced')
+            # Au-delà du budget de la requête, func() échoue aussitôt (DuffelDeadlineError)
+            if not call.event.wait(bounded(self.timeout)):
+                logger.warning(f"Appel {self.name} {key} toujours en cours, appel direct")
+                return func()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_distributed(key, func)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    async def ado(self, key, coroutine_function):
+        """
+        Variante asyncio de do() : un appel par clé et par boucle d'événements
+
+        Returns:
+            Résultat de coroutine_function() (partagé entre les appelants)
+        """
+        if not self.enabled:
+            return await coroutine_function()
+
+        with self._lock:
+            calls = self._async_calls.setdefault(asyncio.get_running_loop(), {})
+        pending = calls.get(key)
+        if pending is not None:
+            self.metrics.incr(self.name, 'coalesced')
+            try:
+                return await asyncio.wait_for(asyncio.shield(pending), bounded(self.timeout))
+            except asyncio.TimeoutError:
+                logger.warning(f"Appel {self.name} {key} toujours en cours, appel direct")
+                return await coroutine_function()
+
+        pending = asyncio.ensure_future(self._arun_distributed(key, coroutine_function))
+        calls[key] = pending
+        try:
+            return await asyncio.shield(pending)
+        finally:
+            if pending.done():
+                calls.pop(key, None)
+            else:
+                pending.add_done_callback(lambda _: calls.pop(key, None))
+
+    # ----- Regroupement inter-processus (Redis) -----
+
+    @property
+    def client(self):
+        """Client Redis (None si REDIS_URL absent ou redis non installé)"""
+        if self._redis is None and self.redis_url and redis is not None:
+            self._redis = redis.Redis.from_url(self.redis_url)
+        return self._redis
+
+    def _keys(self, key):
+        base = f"{self.KEY_PREFIX}{self.name}:{key}"
+        return f"{base}:lock", f"{base}:result"
+
+    def _acquire(self, key, token):
+        """Prend le verrou Redis de la clé ; None si Redis est indisponible"""
+        client = self.client
+        if client is None:
+            return None
+        lock_key, _ = self._keys(key)
+        try:
+            return bool(client.set(lock_key, token, nx=True, px=int(self.timeout * 1000)))
+        except redis.RedisError as e:
+            logger.warning(f"Redis indisponible pour le regroupement {self.name}: {str(e)}")
+            return None
+
+    def _publish(self, key, token, result):
+        """Publie le résultat pour les autres processus puis libère le verrou"""
+        _, result_key = self._keys(key)
+        try:
+            self.client.set(f"{result_key}:{token}", json.dumps(result, default=str), px=int(self.timeout * 1000))
+        except (TypeError, ValueError, redis.RedisError) as e:
+            logger.warning(f"Résultat {self.name} non publié: {str(e)}")
+        self._release(key, token)
+
+    def _release(self, key, token):
+        lock_key, _ = self._keys(key)
+        try:
+            self.client.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+        except redis.RedisError:
+            pass
+
+    def _poll_remote(self, key, token=None):
+        """
+        Résultat publié par le processus qui détient le verrou
+
+        Args:
+            token (str, optional): Jeton du détenteur, lu lors d'un appel précédent
+
+        Returns:
+            tuple: (trouvé, résultat, jeton) - trouvé vaut None tant que l'appel est
+            en cours, False si le verrou a disparu sans résultat
+        """
+        lock_key, result_key = self._keys(key)
+        try:
+            # Le verrou est lu avant le résultat : le détenteur publie avant de libérer
+            holder = self.client.get(lock_key)
+            token = token or (holder.decode() if holder else None)
+            if token is None:
+                return False, None, None
+            payload = self.client.get(f"{result_key}:{token}")
+            if payload is not None:
+                return True, json.loads(payload), token
+            if holder is None:
+                return False, None, token
+        except redis.RedisError:
+            return False, None, token
+        return None, None, token
+
+    def _run_distributed(self, key, func):
+        token = uuid.uuid4().hex
+        acquired = self._acquire(key, token)
+        if acquired is None:
+            return func()
+        if acquired:
+            try:
+                result = func()
+            except Exception:
+                self._release(key, token)
+                raise
+            self._publish(key, token, result)
+            return result
+
+        holder = None
+        deadline = time.monotonic() + bounded(self.timeout)
+        while time.monotonic() < deadline:
+            found, result, holder = self._poll_remote(key, holder)
+            if found:
+                self.metrics.incr(self.name, 'coalesced_remote')
+                return result
+            if found is False:
+                break
+            time.sleep(self.poll_interval)
+        return func()
+
+    async def _arun_distributed(self, key, coroutine_function):
+        token = uuid.uuid4().hex
+        acquired = await sync_to_async(self._acquire, thread_sensitive=False)(key, token) if self.redis_url else None
+        if acquired is None:
+            return await coroutine_function()
+        if acquired:
+            try:
+                result = await coroutine_function()
+            except Exception:
+                await sync_to_async(self._release, thread_sensitive=False)(key, token)
+                raise
+            await sync_to_async(self._publish, thread_sensitive=False)(key, token, result)
+            return result
+
+        holder = None
+        deadline = time.monotonic() + bounded(self.timeout)
+        while time.monotonic() < deadline:
+            found, result, holder = await sync_to_async(self._poll_remote, thread_sensitive=False)(key, holder)
+            if found:
+                self.metrics.incr(self.name, 'coalesced_remote')
+                return result
+            if found is False:
+                break
+            await asyncio.sleep(self.poll_interval)
+        return await coroutine_function()
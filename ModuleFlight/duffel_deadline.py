@@ -0,0 +1,94 @@
+"""
+Budget de temps d'une requête utilisateur, partagé par tous ses appels Duffel
+La vue fixe l'échéance ; chaque appel reçoit le temps restant comme timeout
+"""
+
+import asyncio
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Échéance (time.monotonic) de la requête en cours ; None = pas de budget
+_deadline = contextvars.ContextVar('duffel_deadline', default=None)
+
+
+def remaining():
+    """
+    Temps restant avant l'échéance de la requête en cours
+
+    Returns:
+        float | None: Secondes restantes (négatif si dépassé), None sans budget
+    """
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
+
+
+def bounded(seconds):
+    """Durée `seconds` ramenée au temps restant (sans descendre sous 0)"""
+    left = remaining()
+    if left is None:
+        return seconds
+    return max(0.0, min(seconds, left))
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Fixe un budget de `seconds` secondes pour le bloc
+
+    Un budget imbriqué ne peut que raccourcir l'échéance englobante ;
+    deadline(None) retire tout budget (tâches de fond lancées par une requête).
+    """
+    if seconds is None:
+        expires_at = None
+    else:
+        expires_at = time.monotonic() + seconds
+        current = _deadline.get()
+        if current is not None:
+            expires_at = min(expires_at, current)
+    token = _deadline.set(expires_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def request_budget():
+    """Budget par défaut d'une requête (FLIGHT_CONFIG['REQUEST_DEADLINE'], None = sans limite)"""
+    return settings.FLIGHT_CONFIG.get('REQUEST_DEADLINE')
+
+
+def with_deadline(seconds=None):
+    """
+    Décorateur de vue (sync ou async) : budget FLIGHT_CONFIG['REQUEST_DEADLINE'] par défaut
+
+    Args:
+        seconds (float, optional): Budget propre à la vue
+    """
+    def decorator(view):
+        def budget():
+            return seconds if seconds is not None else request_budget()
+
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(*args, **kwargs):
+                with deadline(budget()):
+                    return await view(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with deadline(budget()):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def submit_with_context(executor, func, *args, **kwargs):
+    """executor.submit() qui transmet le contexte (dont l'échéance) au thread"""
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
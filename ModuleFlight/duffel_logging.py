@@ -0,0 +1,143 @@
+"""
+Journalisation des appels Duffel à faible coût
+Un événement résumé par appel, traces complètes échantillonnées, handler à file d'attente
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+
+# Un événement par appel Duffel (endpoint, statut, octets, latence)
+call_logger = logging.getLogger('ModuleFlight.duffel.calls')
+
+# Traces complètes (corps, en-têtes) pour une part DUFFEL_CONFIG['LOG_WIRE_SAMPLE_RATE'] des appels
+wire_logger = logging.getLogger('ModuleFlight.duffel.wire')
+
+REDACTED_HEADERS = frozenset({'authorization', 'proxy-authorization', 'cookie', 'set-cookie'})
+
+
+def redact_headers(headers):
+    """En-têtes sans secrets (jeton Bearer, cookies)"""
+    return {name: '***' if name.lower() in REDACTED_HEADERS else value for name, value in headers.items()}
+
+
+def log_call(method, endpoint, status, size, latency, attempt=1, error=None):
+    """
+    Émet l'événement résumé d'un appel Duffel
+
+    Formatage différé (arguments %) : rien n'est calculé si le niveau INFO est coupé.
+
+    Args:
+        endpoint (str): Endpoint normalisé (ex: offers/{id})
+        status (int | None): Statut HTTP, None si erreur de transport
+        size (int): Taille du corps de réponse en octets
+        latency (float): Durée de l'appel en secondes
+        attempt (int): Numéro de tentative
+        error (str, optional): Erreur de transport
+    """
+    if not call_logger.isEnabledFor(logging.INFO):
+        return
+    level = logging.WARNING if error or (status or 0) >= 500 else logging.INFO
+    call_logger.log(
+        level, "Duffel %s %s -> %s %dB %.0fms (tentative %d)",
+        method, endpoint, status or error, size, latency * 1000, attempt,
+        extra={'duffel_call': {
+            'method': method,
+            'endpoint': endpoint,
+            'status': status,
+            'bytes': size,
+            'latency_ms': round(latency * 1000, 1),
+            'attempt': attempt,
+            'error': error,
+        }}
+    )
+
+
+class WireSampler:
+    """Tirage des appels dont les échanges complets sont journalisés (niveau DEBUG)"""
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.rate = config.get('LOG_WIRE_SAMPLE_RATE', 0)
+
+    def sample(self):
+        """True si cet appel doit être tracé en entier"""
+        return bool(self.rate) and wire_logger.isEnabledFor(logging.DEBUG) and random.random() < self.rate
+
+    def log_request(self, method, url, headers, data=None, params=None):
+        wire_logger.debug(
+            "Requête Duffel %s %s headers=%s params=%s body=%s",
+            method, url, json.dumps(redact_headers(headers)), params, json.dumps(data, default=str) if data else None
+        )
+
+    def log_response(self, response):
+        wire_logger.debug(
+            "Réponse Duffel %s headers=%s body=%s",
+            response.status_code, json.dumps(redact_headers(dict(response.headers))), response.text
+        )
+
+
+class StructuredFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement (champs `duffel_call` inclus)"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        call = getattr(record, 'duffel_call', None)
+        if call:
+            entry.update(call)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class QueueHandler(logging.Handler):
+    """
+    Handler non bloquant : l'appelant ne fait que déposer l'enregistrement
+
+    Formatage (JSON par défaut) et écriture se font dans le thread d'un
+    QueueListener, à la différence de logging.handlers.QueueHandler qui formate
+    chez l'appelant. Les arguments des messages doivent donc être immuables (cas
+    de log_call). File bornée à `queue_size` : au-delà, les enregistrements sont
+    abandonnés et comptés (`dropped`) plutôt que de ralentir les requêtes.
+    """
+
+    def __init__(self, queue_size=10000, stream=None):
+        super().__init__()
+        self.queue = queue.Queue(queue_size)
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.target.setFormatter(StructuredFormatter())
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self.listener = logging.handlers.QueueListener(self.queue, self.target)
+        self.listener.start()
+        self._listening = True
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt):
+        # Le formatage a lieu dans le listener
+        self.target.setFormatter(fmt)
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def close(self):
+        # Vide la file avant l'arrêt du processus
+        if self._listening:
+            self._listening = False
+            self.listener.stop()
+        self.target.close()
+        super().close()
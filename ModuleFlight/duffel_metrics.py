@@ -0,0 +1,83 @@
+"""
+Métriques en mémoire pour les appels API Duffel
+Compteurs et temps cumulés par endpoint, propres au processus
+"""
+
+import re
+import threading
+
+
+# Segments d'URL correspondant à un identifiant Duffel (off_0000..., ord_0000..., orq_0000...)
+_ID_SEGMENT = re.compile(r'^[a-z]{2,5}_(?=[0-9A-Za-z]*[0-9])[0-9A-Za-z]{6,}$')
+
+
+def endpoint_key(endpoint):
+    """
+    Normalise un endpoint pour l'agrégation des métriques
+
+    Args:
+        endpoint (str): Endpoint relatif (ex: offers/off_123)
+
+    Returns:
+        str: Endpoint générique (ex: offers/{id})
+    """
+    path = endpoint.split('?', 1)[0].strip('/')
+    return '/'.join('{id}' if _ID_SEGMENT.match(part) else part for part in path.split('/'))
+
+
+class DuffelMetrics:
+    """Registre thread-safe de compteurs et de durées par endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timings = {}
+
+    def incr(self, endpoint, name, value=1):
+        """Incrémente le compteur `name` de l'endpoint"""
+        with self._lock:
+            counters = self._counters.setdefault(endpoint, {})
+            counters[name] = counters.get(name, 0) + value
+
+    def observe(self, endpoint, name, seconds):
+        """Enregistre une durée (en secondes) pour l'endpoint"""
+        with self._lock:
+            timing = self._timings.setdefault(endpoint, {}).setdefault(
+                name, {'count': 0, 'total': 0.0, 'max': 0.0}
+            )
+            timing['count'] += 1
+            timing['total'] += seconds
+            if seconds > timing['max']:
+                timing['max'] = seconds
+
+    def snapshot(self):
+        """
+        Retourne une copie des métriques
+
+        Returns:
+            dict: {endpoint: {compteur: valeur, durée: {count, total_ms, avg_ms, max_ms}}}
+        """
+        with self._lock:
+            result = {}
+            for endpoint, counters in self._counters.items():
+                result[endpoint] = dict(counters)
+            for endpoint, timings in self._timings.items():
+                entry = result.setdefault(endpoint, {})
+                for name, timing in timings.items():
+                    entry[name] = {
+                        'count': timing['count'],
+                        'total_ms': round(timing['total'] * 1000, 2),
+                        'avg_ms': round(timing['total'] * 1000 / timing['count'], 2) if timing['count'] else 0.0,
+                        'max_ms': round(timing['max'] * 1000, 2),
+                    }
+            return result
+
+    def reset(self):
+        """Remet toutes les métriques à zéro"""
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+# Registre global du processus
+duffel_metrics = DuffelMetrics()
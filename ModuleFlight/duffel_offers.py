@@ -0,0 +1,477 @@
+"""
+Représentation compacte des offres Duffel pour le frontend
+Un seul passage sur l'offre brute ; les données rarement affichées sont calculées à la demande
+"""
+
+import logging
+
+from .reference_store import reference_store, Airport, Airline
+
+logger = logging.getLogger(__name__)
+
+_EMPTY = {}
+
+# Référentiel sans entrée pour le code : les données de l'offre sont gardées
+_NO_AIRPORT = Airport('', '', '', '', None, None, '')
+_NO_AIRLINE = Airline('', '', '', '')
+
+# Clé absente de l'offre formatée (ex: 'passengers' sans passagers)
+_MISSING = object()
+
+
+def _airport(segment, kind):
+    airport = segment.get(kind) or _EMPTY
+    # Noms, coordonnées et fuseau du référentiel partagé, sinon ceux de l'offre
+    reference = reference_store.airport(airport.get('iata_code')) or _NO_AIRPORT
+    return {
+        'iata_code': airport.get('iata_code', ''),
+        'name': reference.name or airport.get('name', 'Aéroport inconnu'),
+        'city_name': reference.city_name or airport.get('city_name', ''),
+        'terminal': segment.get(f'{kind}_terminal', ''),
+        'latitude': reference.latitude if reference.latitude is not None else airport.get('latitude'),
+        'longitude': reference.longitude if reference.longitude is not None else airport.get('longitude'),
+        'time_zone': reference.time_zone or airport.get('time_zone')
+    }
+
+
+def _carrier(carrier, flight_number):
+    carrier = carrier or _EMPTY
+    reference = reference_store.airline(carrier.get('iata_code')) or _NO_AIRLINE
+    return {
+        'name': reference.name or carrier.get('name', ''),
+        'iata_code': carrier.get('iata_code', ''),
+        'flight_number': flight_number,
+        'logo_symbol_url': reference.logo_symbol_url or carrier.get('logo_symbol_url', ''),
+        'id': carrier.get('id', '')
+    }
+
+
+def _aircraft(aircraft):
+    reference = reference_store.aircraft(aircraft.get('iata_code')) if aircraft else None
+    if reference is None or not reference.name or reference.name == aircraft.get('name'):
+        return aircraft
+    return dict(aircraft, name=reference.name)
+
+
+def _segment(segment):
+    get = segment.get
+    record = FormattedSegment({
+        'id': get('id'),
+        'departing_at': get('departing_at', ''),
+        'arriving_at': get('arriving_at', ''),
+        'duration': get('duration', ''),
+        'distance': get('distance'),
+        'stops': get('stops', []),
+        'origin_terminal': get('origin_terminal'),
+        'destination_terminal': get('destination_terminal'),
+        'aircraft': _aircraft(get('aircraft')),
+        'passengers': get('passengers', [])
+    })
+    record._source = segment
+    return record
+
+
+def _slice(slice_data, segments):
+    first_segment = segments[0]
+    return {
+        'id': slice_data.get('id'),
+        'fare_brand_name': slice_data.get('fare_brand_name'),
+        'origin': _airport(first_segment, 'origin'),
+        'destination': _airport(first_segment, 'destination'),
+        'segments': [_segment(segment) for segment in segments],
+        'duration': slice_data.get('duration', ''),
+        'stops': len(segments) - 1,  # Nombre d'escales
+        'conditions': slice_data.get('conditions', {})
+    }
+
+
+def _passengers(offer):
+    passengers = offer.get('passengers')
+    if not passengers:
+        return _MISSING
+    return [
+        {
+            'id': passenger.get('id'),
+            'type': passenger.get('type'),
+            'age': passenger.get('age'),
+            'family_name': passenger.get('family_name'),
+            'given_name': passenger.get('given_name'),
+            'fare_type': passenger.get('fare_type'),
+            'loyalty_programme_accounts': passenger.get('loyalty_programme_accounts', [])
+        }
+        for passenger in passengers
+    ]
+
+
+class LazyDict(dict):
+    """
+    dict des champs remplis à la construction, plus des clés calculées à la demande
+
+    Les clés remplies se lisent à la vitesse d'un dict. Celles de LAZY_FIELDS
+    (fonction de la donnée brute) ne sont calculées qu'à la première lecture, puis
+    gardées dans un slot ; une fonction peut renvoyer _MISSING (clé absente).
+    items(), keys(), len(), ==, la sérialisation JSON (DRF) et pickle les incluent,
+    dans l'ordre de KEYS.
+    """
+
+    __slots__ = ('_source', '_lazy')
+
+    KEYS = ()
+    LAZY_FIELDS = {}
+
+    # Pas de __init__ : la construction reste celle d'un dict (le constructeur
+    # renseigne ensuite _source ; _lazy n'est créé qu'à la première clé calculée)
+
+    def _lazy_value(self, key):
+        try:
+            lazy = self._lazy
+        except AttributeError:
+            lazy = self._lazy = {}
+        if key not in lazy:
+            lazy[key] = self.LAZY_FIELDS[key](self._source)
+        return lazy[key]
+
+    def __missing__(self, key):
+        if key in self.LAZY_FIELDS:
+            value = self._lazy_value(key)
+            if value is not _MISSING:
+                return value
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or (key in self.LAZY_FIELDS and self._lazy_value(key) is not _MISSING)
+
+    def items(self):
+        result = []
+        for key in self.KEYS:
+            if dict.__contains__(self, key):
+                result.append((key, dict.__getitem__(self, key)))
+            elif key in self.LAZY_FIELDS:
+                value = self._lazy_value(key)
+                if value is not _MISSING:
+                    result.append((key, value))
+        return result
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.items())
+
+    def __eq__(self, other):
+        return isinstance(other, dict) and dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (type(self), (dict(dict.items(self)),), (None, {'_source': self._source}))
+
+    def to_dict(self):
+        """Copie dict simple (clés calculées incluses)"""
+        return dict(self.items())
+
+
+class FormattedSegment(LazyDict):
+    """Segment formaté : compagnies (opérante, commerciale) calculées à la demande"""
+
+    __slots__ = ()
+
+    KEYS = ('id', 'departing_at', 'arriving_at', 'duration', 'distance', 'operating_carrier', 'marketing_carrier',
+            'stops', 'origin_terminal', 'destination_terminal', 'aircraft', 'passengers')
+    LAZY_FIELDS = {
+        'operating_carrier': lambda segment: _carrier(segment.get('operating_carrier'),
+                                                      segment.get('operating_carrier_flight_number', '')),
+        'marketing_carrier': lambda segment: _carrier(segment.get('marketing_carrier'),
+                                                      segment.get('marketing_carrier_flight_number', '')),
+    }
+
+
+class FormattedOffer(LazyDict):
+    """
+    Offre formatée (mêmes clés que l'ancien dict de format_offer_for_frontend)
+
+    Passagers et programmes de fidélité, documents acceptés et available_services,
+    rarement affichés, sont calculés à la demande.
+    """
+
+    __slots__ = ()
+
+    KEYS = ('id', 'total_amount', 'total_currency', 'base_amount', 'tax_amount', 'base_currency', 'tax_currency',
+            'total_emissions_kg', 'owner', 'passenger_identity_documents_required', 'available_seats', 'live_mode',
+            'created_at', 'expires_at', 'partial', 'slices', 'payment', 'conditions', 'slice_conditions',
+            'passengers', 'supported_passenger_identity_document_types', 'supported_loyalty_programmes',
+            'available_services')
+    LAZY_FIELDS = {
+        'passengers': _passengers,
+        'supported_passenger_identity_document_types':
+            lambda offer: offer.get('supported_passenger_identity_document_types', []),
+        'supported_loyalty_programmes': lambda offer: offer.get('supported_loyalty_programmes', []),
+        'available_services': lambda offer: offer.get('available_services'),
+    }
+
+
+def format_offer(offer):
+    """
+    Formate une offre Duffel v2 en un seul passage
+
+    Args:
+        offer (dict): Offre brute de l'API
+
+    Returns:
+        FormattedOffer: Offre prête pour les templates et l'API
+    """
+    get = offer.get
+    owner = get('owner') or _EMPTY
+    owner_reference = reference_store.airline(owner.get('iata_code')) or _NO_AIRLINE
+    fields = {
+        'id': get('id'),
+        'total_amount': get('total_amount'),
+        'total_currency': get('total_currency'),
+        'base_amount': get('base_amount'),
+        'tax_amount': get('tax_amount'),
+        'base_currency': get('base_currency'),
+        'tax_currency': get('tax_currency'),
+        'total_emissions_kg': get('total_emissions_kg'),
+        'owner': {
+            'name': owner_reference.name or owner.get('name', 'Compagnie inconnue'),
+            'iata_code': owner.get('iata_code', ''),
+            'logo_symbol_url': owner_reference.logo_symbol_url or owner.get('logo_symbol_url', ''),
+            'logo_lockup_url': owner_reference.logo_lockup_url or owner.get('logo_lockup_url', ''),
+            'id': owner.get('id', '')
+        },
+        'passenger_identity_documents_required': get('passenger_identity_documents_required', False),
+        'available_seats': 10,  # Valeur par défaut
+        'live_mode': get('live_mode', False),
+        'created_at': get('created_at'),
+        'expires_at': get('expires_at'),
+        'partial': get('partial', False)
+    }
+
+    # Slices et conditions de changement par slice, en un seul parcours
+    slices = get('slices')
+    slice_change = None
+    if slices:
+        formatted_slices = []
+        for slice_data in slices:
+            # Slices et segments nuls ou mal formés ignorés (l'offre reste affichable)
+            if not isinstance(slice_data, dict):
+                continue
+            segments = [segment for segment in slice_data.get('segments') or () if isinstance(segment, dict)]
+            if segments:
+                formatted_slices.append(_slice(slice_data, segments))
+            change_info = (slice_data.get('conditions') or _EMPTY).get('change_before_departure')
+            if change_info and change_info.get('allowed'):
+                slice_change = change_info
+        fields['slices'] = formatted_slices
+
+    payment_reqs = get('payment_requirements')
+    if payment_reqs:
+        fields['payment'] = {
+            'requires_instant_payment': payment_reqs.get('requires_instant_payment', False),
+            'price_guarantee_expires_at': payment_reqs.get('price_guarantee_expires_at', ''),
+            'payment_required_by': payment_reqs.get('payment_required_by', '')
+        }
+
+    conditions = get('conditions') or _EMPTY
+    refund = conditions.get('refund_before_departure') or _EMPTY
+    change = conditions.get('change_before_departure') or _EMPTY
+    fields['conditions'] = {
+        'refundable': refund.get('allowed', False),
+        'refund_penalty_amount': refund.get('penalty_amount'),
+        'refund_penalty_currency': refund.get('penalty_currency'),
+        'changeable': change.get('allowed', False),
+        'change_penalty_amount': change.get('penalty_amount'),
+        'change_penalty_currency': change.get('penalty_currency')
+    }
+
+    # Conditions du dernier slice dont le changement est autorisé
+    if slice_change:
+        fields['slice_conditions'] = {
+            'change_before_departure': {
+                'allowed': True,
+                'penalty_amount': slice_change.get('penalty_amount'),
+                'penalty_currency': slice_change.get('penalty_currency')
+            }
+        }
+
+    record = FormattedOffer(fields)
+    record._source = offer
+    return record
+
+
+def format_valid_offer(offer):
+    """
+    format_offer pour une liste de résultats : une offre mal formée est écartée
+    (None) sans faire échouer toute la recherche
+
+    Returns:
+        FormattedOffer | None: None si l'offre est invalide ou sans trajet exploitable
+    """
+    if not offer or 'id' not in offer:
+        logger.warning("Offre invalide reçue")
+        return None
+    try:
+        formatted_offer = format_offer(offer)
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        logger.warning(f"Offre mal formée ignorée ({offer.get('id')}): {str(e)}")
+        return None
+    if offer.get('slices') and not formatted_offer.get('slices'):
+        logger.warning(f"Offre sans trajet exploitable ignorée ({offer.get('id')})")
+        return None
+    return formatted_offer
+
+
+# ===== FORMAT NORMALISÉ (API) =====
+
+def _airport_entry(airport):
+    reference = reference_store.airport(airport.get('iata_code')) or _NO_AIRPORT
+    return {
+        'iata_code': airport.get('iata_code', ''),
+        'name': reference.name or airport.get('name'),
+        'city_name': reference.city_name or airport.get('city_name'),
+        'latitude': reference.latitude if reference.latitude is not None else airport.get('latitude'),
+        'longitude': reference.longitude if reference.longitude is not None else airport.get('longitude'),
+        'time_zone': reference.time_zone or airport.get('time_zone')
+    }
+
+
+def _carrier_entry(carrier):
+    reference = reference_store.airline(carrier.get('iata_code')) or _NO_AIRLINE
+    return {
+        'name': reference.name or carrier.get('name', ''),
+        'iata_code': carrier.get('iata_code', ''),
+        'logo_symbol_url': reference.logo_symbol_url or carrier.get('logo_symbol_url', ''),
+        'logo_lockup_url': reference.logo_lockup_url or carrier.get('logo_lockup_url', ''),
+        'id': carrier.get('id', '')
+    }
+
+
+class _References:
+    """Dictionnaires partagés d'une réponse normalisée : un objet par code"""
+
+    def __init__(self):
+        self.airports = {}
+        self.carriers = {}
+        self.aircraft = {}
+
+    def airport(self, airport):
+        if not airport:
+            return None
+        code = airport.get('iata_code') or airport.get('name')
+        if code not in self.airports:
+            self.airports[code] = _airport_entry(airport)
+        return code
+
+    def carrier(self, carrier):
+        if not carrier:
+            return None
+        code = carrier.get('iata_code') or carrier.get('id') or carrier.get('name')
+        if code not in self.carriers:
+            self.carriers[code] = _carrier_entry(carrier)
+        return code
+
+    def aircraft_code(self, aircraft):
+        if not aircraft:
+            return None
+        code = aircraft.get('iata_code') or aircraft.get('id')
+        if code not in self.aircraft:
+            self.aircraft[code] = aircraft
+        return code
+
+    def segment(self, segment):
+        source = segment._source
+        get = segment.get
+        return {
+            'id': get('id'),
+            'departing_at': get('departing_at'),
+            'arriving_at': get('arriving_at'),
+            'duration': get('duration'),
+            'distance': get('distance'),
+            'operating_carrier': self.carrier(source.get('operating_carrier')),
+            'operating_carrier_flight_number': source.get('operating_carrier_flight_number', ''),
+            'marketing_carrier': self.carrier(source.get('marketing_carrier')),
+            'marketing_carrier_flight_number': source.get('marketing_carrier_flight_number', ''),
+            'stops': [dict(stop, airport=self.airport(stop.get('airport'))) for stop in get('stops') or ()],
+            'origin_terminal': get('origin_terminal'),
+            'destination_terminal': get('destination_terminal'),
+            'aircraft': self.aircraft_code(get('aircraft')),
+            'passengers': get('passengers')
+        }
+
+    def slice(self, slice_info):
+        origin = slice_info['origin']
+        destination = slice_info['destination']
+        return {
+            'id': slice_info['id'],
+            'fare_brand_name': slice_info['fare_brand_name'],
+            'origin': self.airport(origin),
+            'origin_terminal': origin['terminal'],
+            'destination': self.airport(destination),
+            'destination_terminal': destination['terminal'],
+            'segments': [self.segment(segment) for segment in slice_info['segments']],
+            'duration': slice_info['duration'],
+            'stops': slice_info['stops'],
+            'conditions': slice_info['conditions']
+        }
+
+
+def select_fields(offers, fields):
+    """
+    Offres formatées réduites aux champs demandés (format complet)
+
+    Les champs calculés à la demande et non demandés ne sont jamais calculés.
+    """
+    return [{key: offer[key] for key in fields if key in offer} for offer in offers]
+
+
+def normalize_offers(offers, fields=None):
+    """
+    Format normalisé : aéroports, compagnies et appareils dans des dictionnaires
+    partagés, référencés par code dans les offres
+
+    owner, les origin/destination des slices, les compagnies et l'appareil des
+    segments deviennent des codes ; le terminal passe dans le slice
+    (origin_terminal, destination_terminal).
+
+    Args:
+        offers (list): Offres formatées (FormattedOffer)
+        fields (list, optional): Champs d'offre à garder (tous par défaut)
+
+    Returns:
+        dict: 'offers', 'airports', 'carriers', 'aircraft'
+    """
+    fields = fields or FormattedOffer.KEYS
+    references = _References()
+    normalized = []
+    for offer in offers:
+        record = {}
+        for key in fields:
+            if key == 'owner':
+                record['owner'] = references.carrier(offer._source.get('owner'))
+            elif key == 'slices':
+                if 'slices' in offer:
+                    record['slices'] = [references.slice(slice_info) for slice_info in offer['slices']]
+            elif key in offer:
+                record[key] = offer[key]
+        normalized.append(record)
+    return {
+        'offers': normalized,
+        'airports': references.airports,
+        'carriers': references.carriers,
+        'aircraft': references.aircraft
+    }
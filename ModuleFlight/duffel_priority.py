@@ -0,0 +1,139 @@
+"""
+Ordonnancement des appels Duffel par priorité
+Réservations (orders) > détail d'offre > recherches, chacune avec son budget
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+import logging
+
+from .duffel_deadline import bounded
+from .duffel_metrics import duffel_metrics, endpoint_key
+
+logger = logging.getLogger(__name__)
+
+ORDER = 'order'
+OFFER = 'offer'
+SEARCH = 'search'
+
+PRIORITY_CLASSES = (ORDER, OFFER, SEARCH)
+
+DEFAULT_CONCURRENCY = {ORDER: 4, OFFER: 8, SEARCH: 16}
+DEFAULT_RESERVED = {ORDER: 0, OFFER: 5, SEARCH: 15}
+
+
+def priority_class(endpoint):
+    """
+    Classe de priorité d'un appel Duffel
+
+    Args:
+        endpoint (str): Endpoint relatif (ex: orders/ord_123/actions/confirm)
+
+    Returns:
+        str: ORDER (commandes, paiements), OFFER (offers/{id}) ou SEARCH
+    """
+    key = endpoint_key(endpoint)
+    if key.startswith(('orders', 'order_', 'payments')):
+        return ORDER
+    if key.startswith('offers/{id}'):
+        return OFFER
+    return SEARCH
+
+
+class PriorityScheduler:
+    """
+    File d'attente des appels Duffel par classe de priorité
+
+    Chaque classe a son propre nombre d'appels simultanés par processus
+    (PRIORITY_CONCURRENCY) : des recherches en rafale n'occupent jamais les places
+    des réservations. Sur le seau de RateLimiter, chaque classe laisse un plancher
+    de jetons (PRIORITY_RESERVED_TOKENS) aux classes supérieures : à l'approche de
+    la limite, les recherches attendent les premières et les réservations passent.
+    L'attente totale (place puis jeton) tient dans RATE_LIMIT_MAX_WAIT et dans le
+    budget de la requête.
+    """
+
+    def __init__(self, rate_limiter, config=None, metrics=None):
+        config = config or {}
+        self.rate_limiter = rate_limiter
+        self.max_wait = config.get('RATE_LIMIT_MAX_WAIT', 10)
+        self.metrics = metrics or duffel_metrics
+        concurrency = {**DEFAULT_CONCURRENCY, **(config.get('PRIORITY_CONCURRENCY') or {})}
+        reserved = {**DEFAULT_RESERVED, **(config.get('PRIORITY_RESERVED_TOKENS') or {})}
+        self.concurrency = {name: max(1, int(concurrency[name])) for name in PRIORITY_CLASSES}
+        # Un plancher au niveau de la capacité bloquerait la classe indéfiniment
+        ceiling = max(0, rate_limiter.capacity - 1)
+        self.reserved = {name: min(max(0, reserved[name]), ceiling) for name in PRIORITY_CLASSES}
+        self._semaphores = {name: threading.BoundedSemaphore(self.concurrency[name]) for name in PRIORITY_CLASSES}
+        self._async_semaphores = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _record(self, priority, endpoint, waited, granted):
+        name = f"priority:{priority}"
+        self.metrics.incr(name, 'scheduled')
+        self.metrics.observe(name, 'queue_wait', waited)
+        if not granted:
+            self.metrics.incr(name, 'rejections')
+            logger.warning(f"Appel Duffel {endpoint} ({priority}) refusé après {waited:.2f}s d'attente")
+
+    @contextmanager
+    def slot(self, endpoint):
+        """
+        Réserve une place et un jeton pour un appel
+
+        Yields:
+            bool: True si l'appel peut partir, False si l'attente dépasserait max_wait
+        """
+        priority = priority_class(endpoint)
+        key = endpoint_key(endpoint)
+        started = time.monotonic()
+        max_wait = bounded(self.max_wait)
+        semaphore = self._semaphores[priority]
+        if not semaphore.acquire(timeout=max_wait):
+            self._record(priority, key, time.monotonic() - started, False)
+            yield False
+            return
+        try:
+            granted = self.rate_limiter.acquire(key, floor=self.reserved[priority],
+                                                max_wait=max(0.0, max_wait - (time.monotonic() - started)))
+            self._record(priority, key, time.monotonic() - started, granted)
+            yield granted
+        finally:
+            semaphore.release()
+
+    def _loop_semaphore(self, priority):
+        with self._lock:
+            semaphores = self._async_semaphores.setdefault(asyncio.get_running_loop(), {})
+            if priority not in semaphores:
+                semaphores[priority] = asyncio.BoundedSemaphore(self.concurrency[priority])
+            return semaphores[priority]
+
+    @asynccontextmanager
+    async def aslot(self, endpoint):
+        """Variante asyncio de slot() (places comptées par boucle d'événements)"""
+        priority = priority_class(endpoint)
+        key = endpoint_key(endpoint)
+        started = time.monotonic()
+        max_wait = bounded(self.max_wait)
+        semaphore = self._loop_semaphore(priority)
+        try:
+            # Place libre : prise sans attente (wait_for avec un délai nul refuserait toujours)
+            if semaphore.locked():
+                await asyncio.wait_for(semaphore.acquire(), max_wait)
+            else:
+                await semaphore.acquire()
+        except asyncio.TimeoutError:
+            self._record(priority, key, time.monotonic() - started, False)
+            yield False
+            return
+        try:
+            granted = await self.rate_limiter.aacquire(key, floor=self.reserved[priority],
+                                                       max_wait=max(0.0, max_wait - (time.monotonic() - started)))
+            self._record(priority, key, time.monotonic() - started, granted)
+            yield granted
+        finally:
+            semaphore.release()
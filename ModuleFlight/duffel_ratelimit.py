@@ -0,0 +1,159 @@
+"""
+Limitation du débit des appels Duffel (seau à jetons)
+Budget DUFFEL_CONFIG['RATE_LIMIT_PER_MINUTE'] partagé par tous les workers via Redis
+"""
+
+import asyncio
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+import logging
+
+from .duffel_metrics import duffel_metrics
+
+try:
+    import redis
+except ImportError:  # Seau local au processus uniquement
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Prend un jeton si le solde reste au-dessus du plancher ARGV[3] (jetons réservés aux
+# classes prioritaires) ; sinon renvoie l'attente (s) avant que ce soit possible.
+# L'horloge est celle de Redis, commune à tous les workers.
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local floor = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens - 1 >= floor then
+    tokens = tokens - 1
+else
+    wait = (floor + 1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RateLimiter:
+    """
+    Seau à jetons : RATE_LIMIT_PER_MINUTE jetons par minute, RATE_LIMIT_BURST d'avance
+
+    Avec DUFFEL_CONFIG['REDIS_URL'] le seau est partagé (script Lua atomique) ;
+    sans Redis, ou s'il ne répond pas, chaque processus tient son propre seau.
+    Un appel sans jeton attend (au plus RATE_LIMIT_MAX_WAIT secondes) ; le plancher
+    `floor` laisse des jetons aux classes prioritaires (voir PriorityScheduler).
+    """
+
+    KEY = 'duffel:ratelimit'
+
+    def __init__(self, config=None, metrics=None):
+        config = config or {}
+        per_minute = config.get('RATE_LIMIT_PER_MINUTE')
+        self.enabled = bool(per_minute)
+        self.rate = per_minute / 60 if per_minute else 0
+        self.capacity = config.get('RATE_LIMIT_BURST') or per_minute or 0
+        self.max_wait = config.get('RATE_LIMIT_MAX_WAIT', 10)
+        self.redis_url = config.get('REDIS_URL')
+        self.metrics = metrics or duffel_metrics
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._redis = None
+        self._script = None
+
+    @property
+    def client(self):
+        """Client Redis (None si REDIS_URL absent ou redis non installé)"""
+        if self._redis is None and self.redis_url and redis is not None:
+            self._redis = redis.Redis.from_url(self.redis_url)
+            self._script = self._redis.register_script(_TOKEN_BUCKET_SCRIPT)
+        return self._redis
+
+    def _take_local(self, floor):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens - 1 >= floor:
+                self._tokens -= 1
+                return 0.0
+            return (floor + 1 - self._tokens) / self.rate
+
+    def _take(self, floor=0):
+        """
+        Tente de prendre un jeton sans descendre sous `floor`
+
+        Returns:
+            float: 0 si un jeton a été pris, sinon l'attente (s) avant le prochain essai
+        """
+        if self.client is not None:
+            try:
+                return float(self._script(keys=[self.KEY], args=[self.rate, self.capacity, floor]))
+            except redis.RedisError as e:
+                logger.warning(f"Redis indisponible pour la limitation de débit, seau local: {str(e)}")
+        return self._take_local(floor)
+
+    def _record(self, endpoint, waited, acquired):
+        if waited:
+            self.metrics.incr(endpoint, 'rate_limited')
+            self.metrics.observe(endpoint, 'rate_limit_wait', waited)
+        if not acquired:
+            self.metrics.incr(endpoint, 'rate_limit_rejections')
+            logger.warning(f"Limite de débit Duffel atteinte: {endpoint} refusé après {waited:.2f}s d'attente")
+
+    def acquire(self, endpoint, floor=0, max_wait=None):
+        """
+        Attend un jeton (au plus max_wait secondes)
+
+        Args:
+            endpoint (str): Endpoint normalisé (métriques)
+            floor (int): Jetons à laisser dans le seau pour les appels prioritaires
+            max_wait (float, optional): Attente maximale (défaut: RATE_LIMIT_MAX_WAIT)
+
+        Returns:
+            bool: True si l'appel peut partir, False si l'attente dépasserait max_wait
+        """
+        if not self.enabled:
+            return True
+        max_wait = self.max_wait if max_wait is None else max_wait
+        started = time.monotonic()
+        while True:
+            wait = self._take(floor)
+            waited = time.monotonic() - started
+            if not wait:
+                self._record(endpoint, waited, True)
+                return True
+            if waited + wait > max_wait:
+                self._record(endpoint, waited, False)
+                return False
+            time.sleep(wait)
+
+    async def aacquire(self, endpoint, floor=0, max_wait=None):
+        """Variante asyncio de acquire() (l'attente ne bloque pas la boucle)"""
+        if not self.enabled:
+            return True
+        max_wait = self.max_wait if max_wait is None else max_wait
+        started = time.monotonic()
+        while True:
+            if self.redis_url:
+                wait = await sync_to_async(self._take, thread_sensitive=False)(floor)
+            else:
+                wait = self._take(floor)
+            waited = time.monotonic() - started
+            if not wait:
+                self._record(endpoint, waited, True)
+                return True
+            if waited + wait > max_wait:
+                self._record(endpoint, waited, False)
+                return False
+            await asyncio.sleep(wait)
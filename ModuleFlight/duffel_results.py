@@ -0,0 +1,479 @@
+"""
+Requêtes sur les résultats d'une recherche, servies en mémoire
+Filtres, tris et facettes sans nouvel appel Duffel ni traitement côté navigateur
+"""
+
+import hashlib
+import re
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+from itertools import compress
+
+import numpy as np
+
+from django.conf import settings
+from django.core.cache import caches
+import logging
+
+from .duffel_cache import earliest_expiry
+from .duffel_metrics import duffel_metrics
+from .duffel_offers import format_valid_offer
+
+logger = logging.getLogger(__name__)
+
+INF = float('inf')
+
+SORT_KEYS = ('best', 'price', 'duration', 'stops', 'emissions', 'departure')
+
+# Poids par défaut du tri « meilleur » (FLIGHT_CONFIG['BEST_SORT_WEIGHTS'])
+BEST_WEIGHTS = {'price': 0.5, 'duration': 0.3, 'stops': 0.15, 'emissions': 0.05}
+
+# Tranches horaires du premier départ (minutes depuis minuit)
+DEPARTURE_WINDOWS = (
+    ('night', 0, 6 * 60),
+    ('morning', 6 * 60, 12 * 60),
+    ('afternoon', 12 * 60, 18 * 60),
+    ('evening', 18 * 60, 24 * 60),
+)
+
+_ISO_DURATION = re.compile(r'^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d+)?)S)?)?$')
+
+
+def iso_duration_minutes(value):
+    """
+    Durée ISO 8601 de Duffel (ex: PT2H30M, P1DT4H) en minutes
+
+    Returns:
+        int | None: Minutes, None si absente ou illisible
+    """
+    match = _ISO_DURATION.match(value or '')
+    if not match or not any(match.groups()):
+        return None
+    days, hours, minutes, seconds = match.groups()
+    return int(days or 0) * 1440 + int(hours or 0) * 60 + int(minutes or 0) + round(float(seconds or 0) / 60)
+
+
+def minute_of_day(value):
+    """
+    Heure locale d'un horodatage Duffel (ex: 2025-03-01T06:45:00) en minutes depuis minuit
+
+    Returns:
+        int | None: Minutes, None si absent ou illisible
+    """
+    try:
+        return int(value[11:13]) * 60 + int(value[14:16])
+    except (TypeError, ValueError):
+        return None
+
+
+def search_id_for(results):
+    """
+    Identifiant stable d'un jeu de résultats : ID de l'offer_request, ou empreinte
+    des offer_requests fusionnées (dates flexibles)
+    """
+    offer_requests = results.get('offer_requests')
+    if offer_requests:
+        ids = ','.join(sorted(offer_request['id'] for offer_request in offer_requests))
+        return 'flx_' + hashlib.sha1(ids.encode()).hexdigest()[:24]
+    return (results.get('offer_request') or {}).get('id')
+
+
+class ResultsIndex:
+    """
+    Colonnes numériques des offres formatées d'une recherche
+
+    Calculées une fois à la construction : prix, durée totale (minutes, somme des
+    slices), escales (maximum sur les slices), minute du premier départ, émissions
+    et compagnie. Une valeur inconnue vaut INF : elle est triée en dernier et
+    exclue par les filtres portant sur sa colonne. Les ordres de tri sont calculés
+    à la première demande puis gardés.
+
+    Filtres et facettes passent par des masques (bytearray 0/1) combinés en entiers,
+    et des décomptes Counter/compress ; tris et score « meilleur » sont calculés par
+    NumPy sur les colonnes : pas de boucle Python par offre et par requête.
+    """
+
+    def __init__(self, offers, weights=None):
+        self.offers = offers
+        self.weights = weights or BEST_WEIGHTS
+        self.price = array('d')
+        self.duration = array('d')
+        self.stops = array('d')
+        self.departure = array('d')
+        self.emissions = array('d')
+        self.carriers = []
+        self.carrier_names = {}
+        self.currency = None
+        for offer in offers:
+            self._add(offer)
+        self.windows = [_window(minute) for minute in self.departure]
+        self._all = bytearray(b'\x01') * len(offers)
+        self._orders = {}
+        self._carrier_rows = None
+        self._lock = threading.Lock()
+
+    def _add(self, offer):
+        self.price.append(_number(offer.get('total_amount')))
+        self.emissions.append(_number(offer.get('total_emissions_kg')))
+        self.currency = self.currency or offer.get('total_currency')
+
+        owner = offer['owner']
+        carrier = owner['iata_code'] or owner['name']
+        self.carriers.append(carrier)
+        self.carrier_names.setdefault(carrier, owner['name'])
+
+        slices = offer.get('slices') or ()
+        total, stops = 0, -1
+        for slice_info in slices:
+            minutes = iso_duration_minutes(slice_info['duration'])
+            total = None if minutes is None or total is None else total + minutes
+            stops = max(stops, slice_info['stops'])
+        self.duration.append(INF if not slices or total is None else total)
+        self.stops.append(INF if stops < 0 else stops)
+        departure = minute_of_day(slices[0]['segments'][0]['departing_at']) if slices else None
+        self.departure.append(INF if departure is None else departure)
+
+    def __len__(self):
+        return len(self.offers)
+
+    def column(self, name):
+        """Colonne numérique en tableau NumPy (vue sans copie)"""
+        return np.frombuffer(getattr(self, name), dtype=np.float64)
+
+    def scores(self):
+        """
+        Score « meilleur » de chaque offre : 0 = meilleure sur tous les critères, 1 = pire
+
+        Chaque critère de self.weights (price, duration, stops, emissions) est ramené
+        à [0, 1] entre la meilleure et la pire valeur connue de la recherche ; une
+        valeur inconnue compte comme la pire. Les poids sont relatifs (normalisés).
+
+        Returns:
+            numpy.ndarray: Scores, dans l'ordre des offres
+        """
+        total = np.zeros(len(self.offers))
+        weight_sum = 0.0
+        for name, weight in self.weights.items():
+            if not weight:
+                continue
+            column = self.column(name)
+            known = np.isfinite(column)
+            normalized = np.ones(len(column))
+            if known.any():
+                low = column[known].min()
+                span = column[known].max() - low
+                normalized[known] = (column[known] - low) / span if span else 0.0
+            total += weight * normalized
+            weight_sum += weight
+        return total / weight_sum if weight_sum else total
+
+    def order(self, sort='price', descending=False):
+        """Indices des offres triées par `sort` (prix croissant en second critère, inconnues en dernier)"""
+        key = (sort, descending)
+        with self._lock:
+            order = self._orders.get(key)
+        if order is None:
+            column = self.scores() if sort == 'best' else self.column(sort)
+            known = np.isfinite(column)
+            values = np.where(known, column, 0.0)
+            # np.lexsort : la dernière clé est la principale ; tri stable
+            order = np.lexsort((self.column('price'), -values if descending else values, ~known)).tolist()
+            with self._lock:
+                self._orders[key] = order
+        return order
+
+    def _masks(self, carriers=None, stops=None, max_price=None, max_duration=None,
+               depart_after=None, depart_before=None, max_emissions=None):
+        """Lignes retenues par chaque groupe de filtres actif (bytearray 0/1)"""
+        masks = {}
+        if carriers:
+            masks['carriers'] = bytearray(map(set(carriers).__contains__, self.carriers))
+        if stops is not None and len(stops):
+            masks['stops'] = bytearray(map({float(stop) for stop in stops}.__contains__, self.stops))
+        if max_price is not None:
+            masks['price'] = bytearray(map(float(max_price).__ge__, self.price))
+        if max_duration is not None:
+            masks['duration'] = bytearray(map(float(max_duration).__ge__, self.duration))
+        if max_emissions is not None:
+            masks['emissions'] = bytearray(map(float(max_emissions).__ge__, self.emissions))
+        if depart_after is not None or depart_before is not None:
+            low = float(depart_after if depart_after is not None else 0)
+            high = float(depart_before if depart_before is not None else 24 * 60)
+            masks['departure'] = _and(bytearray(map(low.__le__, self.departure)),
+                                      bytearray(map(high.__ge__, self.departure)))
+        return masks
+
+    def _combine(self, masks, exclude=None):
+        combined = None
+        for name, mask in masks.items():
+            if name != exclude:
+                combined = mask if combined is None else _and(combined, mask)
+        return self._all if combined is None else combined
+
+    def query(self, sort='price', descending=False, offset=0, limit=None, **filters):
+        """
+        Filtre, trie et pagine les offres, avec les facettes de la sélection
+
+        Les facettes sont calculées « à la disjonctive » : le décompte par compagnie
+        ignore le filtre sur les compagnies (pour pouvoir en cocher d'autres), de
+        même pour les escales, les tranches de départ et la fourchette de prix.
+
+        Args:
+            sort (str): Une des SORT_KEYS ('best' : score de scores())
+            offset (int): Première offre renvoyée
+            limit (int, optional): Nombre d'offres renvoyées (toutes par défaut)
+            **filters: carriers, stops, max_price, max_duration, max_emissions,
+                depart_after, depart_before (minutes depuis minuit)
+
+        Returns:
+            dict: 'offers' (page), 'total_offers' (après filtres), 'facets'
+        """
+        masks = self._masks(**filters)
+        selected = self._combine(masks)
+        order = self.order(sort, descending)
+        rows = order if selected is self._all else list(compress(order, map(selected.__getitem__, order)))
+        end = None if limit is None else offset + limit
+        return {
+            'offers': [self.offers[row] for row in rows[offset:end]],
+            'total_offers': len(rows),
+            'facets': self._facets(masks),
+        }
+
+    def page(self, number, size, sort='price', descending=False):
+        """
+        Page `number` (à partir de 1) des offres triées par `sort`, sans filtre ni facette
+
+        Returns:
+            dict: 'offers', 'page', 'pages', 'total_offers'
+        """
+        order = self.order(sort, descending)
+        start = (number - 1) * size
+        return {
+            'offers': [self.offers[row] for row in order[start:start + size]],
+            'page': number,
+            'pages': -(-len(order) // size),
+            'total_offers': len(order),
+        }
+
+    def _cheapest(self, rows, mask):
+        """Première ligne de `rows` (ordre de prix) retenue par `mask` et de prix connu"""
+        return next((row for row in rows if mask[row] and self.price[row] != INF), None)
+
+    def _facets(self, masks):
+        if self._carrier_rows is None:
+            carrier_rows = {}
+            for row in self.order('price'):
+                carrier_rows.setdefault(self.carriers[row], []).append(row)
+            self._carrier_rows = carrier_rows
+
+        mask = self._combine(masks, exclude='carriers')
+        airlines = []
+        for carrier, count in Counter(compress(self.carriers, mask)).most_common():
+            cheapest = self._cheapest(self._carrier_rows[carrier], mask)
+            airlines.append({
+                'code': carrier,
+                'name': self.carrier_names[carrier],
+                'count': count,
+                'min_amount': self.offers[cheapest].get('total_amount') if cheapest is not None else None
+            })
+
+        stop_counts = Counter(compress(self.stops, self._combine(masks, exclude='stops')))
+        stop_counts.pop(INF, None)
+
+        window_counts = Counter(compress(self.windows, self._combine(masks, exclude='departure')))
+
+        mask = self._combine(masks, exclude='price')
+        by_price = self.order('price')
+        cheapest = self._cheapest(by_price, mask)
+        dearest = self._cheapest(reversed(by_price), mask)
+
+        return {
+            'airlines': airlines,
+            'stops': {str(int(stops)): stop_counts[stops] for stops in sorted(stop_counts)},
+            'departure': {name: window_counts[name] for name, _, _ in DEPARTURE_WINDOWS},
+            'price': {
+                'min': self.offers[cheapest].get('total_amount') if cheapest is not None else None,
+                'max': self.offers[dearest].get('total_amount') if dearest is not None else None,
+                'currency': self.currency
+            }
+        }
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return INF
+
+
+def _window(minute):
+    for name, start, end in DEPARTURE_WINDOWS:
+        if start <= minute < end:
+            return name
+    return None
+
+
+def _and(left, right):
+    """ET bit à bit de deux masques de même taille"""
+    size = len(left)
+    return bytearray((int.from_bytes(left, 'little') & int.from_bytes(right, 'little')).to_bytes(size, 'little'))
+
+
+class ResultsStore:
+    """
+    Résultats de recherche interrogeables par search_id
+
+    Les offres brutes sont gardées dans le cache Django (partagé entre workers si
+    Redis) jusqu'au TTL des offres ou à l'expiration de la première ; chaque
+    processus garde en plus les RESULTS_INDEX_SIZE derniers index construits.
+    """
+
+    KEY_PREFIX = 'duffel:results:'
+
+    def __init__(self, duffel_config=None, flight_config=None, metrics=None):
+        duffel_config = duffel_config if duffel_config is not None else getattr(settings, 'DUFFEL_CONFIG', {})
+        flight_config = flight_config if flight_config is not None else getattr(settings, 'FLIGHT_CONFIG', {})
+        self.ttl = duffel_config.get('OFFER_CACHE_TTL', 900)
+        self.alias = duffel_config.get('CACHE_ALIAS', 'default')
+        self.index_size = flight_config.get('RESULTS_INDEX_SIZE', 32)
+        self.default_sort = flight_config.get('RESULTS_DEFAULT_SORT', 'best')
+        self.page_size = flight_config.get('RESULTS_PAGE_SIZE', 50)
+        self.weights = flight_config.get('BEST_SORT_WEIGHTS', BEST_WEIGHTS)
+        self.metrics = metrics or duffel_metrics
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, search_id):
+        return f"{self.KEY_PREFIX}{search_id}"
+
+    def build_index(self, formatted_offers):
+        """Index des offres formatées (poids BEST_SORT_WEIGHTS)"""
+        started = time.perf_counter()
+        index = ResultsIndex(formatted_offers, self.weights)
+        self.metrics.observe('results', 'index_build', time.perf_counter() - started)
+        return index
+
+    def rank(self, results, formatted_offers):
+        """
+        Ordonne les offres d'une page de résultats (tri RESULTS_DEFAULT_SORT) et
+        garde la recherche pour les requêtes suivantes
+
+        Args:
+            results (dict): Résultats de search_flights
+            formatted_offers (list): Offres formatées de ces résultats
+
+        Returns:
+            tuple: (search_id, offres ordonnées)
+        """
+        index = self.build_index(formatted_offers)
+        search_id = self.put(results, index)
+        return search_id, [formatted_offers[row] for row in index.order(self.default_sort)]
+
+    def first_page(self, results, formatted_offers):
+        """
+        Comme rank(), mais ne renvoie que la première page de RESULTS_PAGE_SIZE offres
+
+        Returns:
+            tuple: (search_id, page) ; page : voir ResultsIndex.page
+        """
+        index = self.build_index(formatted_offers)
+        search_id = self.put(results, index)
+        return search_id, index.page(1, self.page_size, self.default_sort)
+
+    def page(self, search_id, number):
+        """
+        Page `number` d'une recherche, dans l'ordre de la première (RESULTS_DEFAULT_SORT)
+
+        Returns:
+            dict | None: Voir ResultsIndex.page, None si la recherche a expiré
+        """
+        index = self.get_index(search_id)
+        if index is None:
+            return None
+        return index.page(number, self.page_size, self.default_sort)
+
+    def put(self, results, index=None):
+        """
+        Garde les offres d'une recherche pour les requêtes suivantes
+
+        Args:
+            results (dict): Résultats de search_flights
+            index (ResultsIndex, optional): Index déjà construit par l'appelant,
+                gardé par ce processus sans relire le cache
+
+        Returns:
+            str | None: search_id, None si les résultats n'en ont pas
+        """
+        search_id = search_id_for(results)
+        if not search_id:
+            return None
+        offers = results.get('offers', [])
+        now = time.time()
+        expires_at = now + self.ttl
+        first_expiry = earliest_expiry(offers)
+        if first_expiry:
+            expires_at = min(expires_at, first_expiry)
+        timeout = int(expires_at - now)
+        if timeout <= 0:
+            return search_id
+        # add : une même recherche affichée plusieurs fois n'est écrite qu'une fois
+        self.cache.add(self.make_key(search_id), {'offers': offers, 'expires_at': expires_at}, timeout)
+        if index is not None:
+            self._remember(search_id, expires_at, index)
+        return search_id
+
+    def _remember(self, search_id, expires_at, index):
+        with self._lock:
+            self._indexes[search_id] = (expires_at, index)
+            self._indexes.move_to_end(search_id)
+            while len(self._indexes) > self.index_size:
+                self._indexes.popitem(last=False)
+
+    def get_index(self, search_id):
+        """
+        Index de la recherche (construit à la première requête du processus)
+
+        Returns:
+            ResultsIndex | None: None si la recherche est inconnue ou expirée
+        """
+        with self._lock:
+            entry = self._indexes.get(search_id)
+            if entry is not None:
+                self._indexes.move_to_end(search_id)
+        if entry is not None and entry[0] > time.time():
+            return entry[1]
+
+        stored = self.cache.get(self.make_key(search_id))
+        if not stored or stored['expires_at'] <= time.time():
+            return None
+        # Même formatage que la première page (offres mal formées écartées) : les pages
+        # servies par un autre worker gardent les mêmes offres, dans le même ordre
+        formatted_offers = [format_valid_offer(offer) for offer in stored['offers']]
+        index = self.build_index([offer for offer in formatted_offers if offer is not None])
+        self._remember(search_id, stored['expires_at'], index)
+        return index
+
+    def query(self, search_id, **params):
+        """
+        Requête sur une recherche (voir ResultsIndex.query)
+
+        Returns:
+            dict | None: Résultat de la requête, None si la recherche a expiré
+        """
+        index = self.get_index(search_id)
+        if index is None:
+            return None
+        started = time.perf_counter()
+        result = index.query(**params)
+        self.metrics.observe('results', 'query_time', time.perf_counter() - started)
+        return result
+
+
+# Instance globale
+results_store = ResultsStore()
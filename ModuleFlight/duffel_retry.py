@@ -0,0 +1,130 @@
+"""
+Nouvelles tentatives des appels Duffel (backoff exponentiel plafonné + jitter)
+Seuls les appels rejouables sont retentés ; Retry-After est respecté
+"""
+
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import logging
+
+from .duffel_deadline import bounded
+from .duffel_metrics import duffel_metrics, endpoint_key
+from .duffel_priority import SEARCH, priority_class
+
+logger = logging.getLogger(__name__)
+
+# Statuts transitoires : limite de débit et indisponibilités passagères
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+
+def parse_retry_after(value):
+    """
+    Délai d'un en-tête Retry-After
+
+    Args:
+        value (str): Secondes ou date HTTP
+
+    Returns:
+        float: Secondes à attendre, None si absent ou illisible
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    """
+    Politique de nouvelles tentatives (DUFFEL_CONFIG)
+
+    MAX_RETRIES tentatives supplémentaires au plus, délai tiré entre 0 et
+    min(RETRY_MAX_DELAY, RETRY_DELAY * 2^n) (full jitter) ou donné par Retry-After,
+    le tout dans RETRY_BUDGET secondes depuis le premier envoi (et dans le budget
+    de la requête utilisateur, voir duffel_deadline).
+
+    Sont rejouables : les méthodes idempotentes (GET offers, orders/{id}...) et les
+    recherches (une offer_request de plus, sans effet de bord). Les autres appels
+    (création et actions sur les commandes) ne sont retentés que si Duffel ne les a
+    pas traités : 429 ou connexion jamais établie.
+    """
+
+    def __init__(self, config=None, metrics=None):
+        config = config or {}
+        self.max_retries = config.get('MAX_RETRIES', 3)
+        self.base_delay = config.get('RETRY_DELAY', 1)
+        self.max_delay = config.get('RETRY_MAX_DELAY', 8)
+        self.budget = config.get('RETRY_BUDGET', 20)
+        self.metrics = metrics or duffel_metrics
+
+    def start(self, method, endpoint):
+        """Suivi des tentatives d'un appel"""
+        return RetryState(self, method, endpoint)
+
+
+class RetryState:
+    """Tentatives d'un appel : nombre, échéance du budget"""
+
+    def __init__(self, policy, method, endpoint):
+        self.policy = policy
+        self.endpoint = endpoint_key(endpoint)
+        self.replayable = method.upper() in IDEMPOTENT_METHODS or priority_class(endpoint) == SEARCH
+        self.attempt = 0
+        # Échéance du budget de tentatives, sans dépasser celle de la requête utilisateur
+        self.deadline = time.monotonic() + bounded(policy.budget)
+
+    def backoff(self, status=None, retry_after=None, not_sent=False):
+        """
+        Délai avant la tentative suivante
+
+        Args:
+            status (int, optional): Statut HTTP reçu (None si erreur de transport)
+            retry_after (str, optional): En-tête Retry-After de la réponse
+            not_sent (bool): La connexion n'a jamais été établie
+
+        Returns:
+            float: Secondes à attendre, None s'il ne faut pas retenter
+        """
+        if status is not None and status not in RETRY_STATUSES:
+            return None
+        if not (self.replayable or status == 429 or not_sent):
+            return None
+
+        policy = self.policy
+        if self.attempt >= policy.max_retries:
+            self._give_up(status)
+            return None
+
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = random.uniform(0, min(policy.max_delay, policy.base_delay * 2 ** self.attempt))
+        if time.monotonic() + delay > self.deadline:
+            self._give_up(status)
+            return None
+
+        self.attempt += 1
+        policy.metrics.incr(self.endpoint, 'retries')
+        policy.metrics.observe(self.endpoint, 'retry_wait', delay)
+        logger.warning(
+            f"Duffel {self.endpoint}: {status or 'erreur de connexion'}, "
+            f"tentative {self.attempt + 1}/{policy.max_retries + 1} dans {delay:.2f}s"
+        )
+        return delay
+
+    def _give_up(self, status):
+        if self.policy.max_retries:
+            self.policy.metrics.incr(self.endpoint, 'retries_exhausted')
+            logger.warning(f"Duffel {self.endpoint}: abandon après {self.attempt + 1} tentatives ({status or 'connexion'})")
@@ -3,14 +3,32 @@ Service pour les appels API Duffel
 Encapsule toutes les interactions avec l'API Duffel
 """
 
+import heapq
+import itertools
 import requests
 import json
-from datetime import datetime, date
-from decimal import Decimal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from decimal import Decimal, InvalidOperation
 from django.conf import settings
 from django.core.exceptions import ValidationError
 import logging
 
+from .duffel_metrics import endpoint_key
+from .duffel_transport import DuffelTransport
+from .duffel_cache import SearchCache, OfferCache
+from .duffel_circuit import CircuitBreaker, CLOSED, HALF_OPEN
+from .duffel_coalesce import SingleFlight
+from .duffel_deadline import deadline, remaining, submit_with_context
+from .duffel_logging import WireSampler, log_call
+from .duffel_offers import format_valid_offer
+from .duffel_priority import PriorityScheduler
+from .duffel_ratelimit import RateLimiter
+from .duffel_retry import RetryPolicy
+from .duffel_stream import StreamedJSON
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,21 +37,87 @@ class DuffelAPIError(Exception):
     pass
 
 
+class DuffelUnavailableError(DuffelAPIError):
+    """Appel refusé sans attendre : disjoncteur ouvert (Duffel en incident)"""
+    pass
+
+
+class DuffelDeadlineError(DuffelAPIError):
+    """Budget de temps de la requête utilisateur épuisé (voir duffel_deadline)"""
+    pass
+
+
+def offer_price(offer):
+    """Montant total d'une offre en Decimal (infini si absent, pour les tris)"""
+    try:
+        return Decimal(offer.get('total_amount'))
+    except (TypeError, InvalidOperation):
+        return Decimal('Infinity')
+
+
+class TopOffers:
+    """
+    Conserve les K meilleures offres (clé la plus basse, prix par défaut) dans un tas borné
+    
+    La mémoire reste proportionnelle à K quel que soit le nombre d'offres parcourues ;
+    à clé égale, la première offre reçue est gardée.
+    """
+    
+    def __init__(self, size, key=offer_price):
+        self.size = size
+        self.key = key
+        self.seen = 0
+        self._heap = []
+        self._order = itertools.count()
+    
+    def push(self, offer):
+        self.seen += 1
+        # Tas min sur (-clé, -ordre) : la racine est la moins bonne offre conservée
+        entry = (-self.key(offer), -next(self._order), offer)
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+    
+    def extend(self, offers):
+        for offer in offers:
+            self.push(offer)
+    
+    def __len__(self):
+        return len(self._heap)
+    
+    def sorted(self):
+        """Offres conservées, de la meilleure à la moins bonne"""
+        return [entry[2] for entry in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+
 class DuffelService:
     """Service pour interagir avec l'API Duffel"""
     
-    def __init__(self):
+    def __init__(self, base_url=None, config=None):
         # Configuration depuis settings
         self.live_mode = getattr(settings, 'DUFFEL_LIVE_MODE', False)
         self.api_key = getattr(settings, 'DUFFEL_API_KEY_LIVE' if self.live_mode else 'DUFFEL_API_KEY', None)
-        self.base_url = getattr(settings, 'DUFFEL_BASE_URL', 'https://api.duffel.com/air')
+        self.base_url = base_url or getattr(settings, 'DUFFEL_BASE_URL', 'https://api.duffel.com/air')
         self.api_version = getattr(settings, 'DUFFEL_API_VERSION', 'v2')
         
         # Configuration avancée
-        self.config = getattr(settings, 'DUFFEL_CONFIG', {})
+        self.config = config if config is not None else getattr(settings, 'DUFFEL_CONFIG', {})
         self.timeout = self.config.get('REQUEST_TIMEOUT', 30)
         self.max_retries = self.config.get('MAX_RETRIES', 3)
         self.retry_delay = self.config.get('RETRY_DELAY', 1)
+        self.search_max_workers = self.config.get('SEARCH_MAX_WORKERS', 7)
+        self.inline_offers = self.config.get('INLINE_OFFERS', True)
+        self.offers_page_size = self.config.get('OFFERS_PAGE_SIZE', 200)
+        self.stream_offers = self.config.get('STREAM_OFFERS', True)
+        self.stream_chunk_size = self.config.get('STREAM_CHUNK_SIZE', 65536)
+        
+        flight_config = getattr(settings, 'FLIGHT_CONFIG', {})
+        self.results_limit = flight_config.get('SEARCH_RESULTS_LIMIT', 50)
+        self.stream_page_size = flight_config.get('STREAM_PAGE_SIZE', 10)
+        self.fetch_all_offers = flight_config.get('FETCH_ALL_OFFERS', False)
+        self.max_offers_scanned = flight_config.get('MAX_OFFERS_SCANNED', 1000)
+        self.multi_city_itineraries = flight_config.get('MULTI_CITY_ITINERARIES', 20)
         
         self.headers = {
             'Authorization': f'Bearer {self.api_key}',
@@ -43,71 +127,169 @@ class DuffelService:
             'User-Agent': 'YXplore-Flight-Module/1.0'
         }
         
+        # Transport HTTP mutualisé (keep-alive + pool de connexions par processus)
+        self.transport = DuffelTransport(self.base_url, self.headers, self.config)
+        
+        # Cache des résultats de recherche (FLIGHT_CONFIG['CACHE_SEARCH_RESULTS'])
+        self.search_cache = SearchCache(self.config)
+        
+        # Stock des offres par ID, partagé par le détail, la réservation et l'API
+        self.offer_cache = OfferCache(self.config)
+        
+        # Budget RATE_LIMIT_PER_MINUTE partagé entre workers (Redis si configuré)
+        self.rate_limiter = RateLimiter(self.config)
+        
+        # Nouvelles tentatives des appels rejouables (MAX_RETRIES, RETRY_DELAY)
+        self.retry_policy = RetryPolicy(self.config)
+        
+        # Coupe les appels pendant un incident Duffel (taux d'erreurs ou de lenteurs)
+        self.circuit = CircuitBreaker('duffel', self.config)
+        self._refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='duffel-refresh')
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        
+        # Traces complètes d'une part des appels (DUFFEL_CONFIG['LOG_WIRE_SAMPLE_RATE'])
+        self.wire_log = WireSampler(self.config)
+        
+        # Réservations > détail d'offre > recherches (places et jetons réservés par classe)
+        self.scheduler = PriorityScheduler(self.rate_limiter, self.config)
+        
+        # Regroupement des recherches et lectures d'offre identiques simultanées
+        self.search_calls = SingleFlight('search', self.config)
+        self.offer_calls = SingleFlight('offer', self.config)
+        
         if not self.api_key:
             logger.warning(f"DUFFEL_API_KEY non configurée pour le mode {'production' if self.live_mode else 'test'}")
             
         logger.info(f"DuffelService initialisé - Mode: {'LIVE' if self.live_mode else 'TEST'}")
     
-    def _make_request(self, method, endpoint, data=None, params=None):
-        """Effectue une requête HTTP vers l'API Duffel"""
-        try:
-            url = f"{self.base_url}/{endpoint}"
-            
-            logger.info(f"=== REQUÊTE DUFFEL DÉTAILLÉE ===")
-            logger.info(f"Méthode: {method}")
-            logger.info(f"URL: {url}")
-            logger.info(f"Headers: {json.dumps(self.headers, indent=2)}")
-            if data:
-                logger.info(f"Body: {json.dumps(data, indent=2)}")
-            if params:
-                logger.info(f"Params: {params}")
-            
-            response = requests.request(
-                method=method,
-                url=url,
-                headers=self.headers,
-                json=data,
-                params=params,
-                timeout=self.timeout
-            )
-            
-            logger.info(f"=== RÉPONSE DUFFEL ===")
-            logger.info(f"Status Code: {response.status_code}")
-            logger.info(f"Response Headers: {dict(response.headers)}")
+    def _make_request(self, method, endpoint, data=None, params=None, stream_path=None, raw=False):
+        """
+        Effectue une requête HTTP vers l'API Duffel (nouvelles tentatives selon retry_policy)
+        
+        Args:
+            stream_path (tuple, optional): Tableau à lire en flux (ex: ('data', 'offers')) ;
+                une réponse en succès est alors rendue sous forme de StreamedJSON
+            raw (bool): Rendre le corps d'une réponse en succès tel quel (bytes, non décodé)
+        """
+        retry = self.retry_policy.start(method, endpoint)
+        while True:
+            timeout = self._call_timeout(endpoint)
+            if not self.circuit.allow():
+                raise DuffelUnavailableError("Duffel est momentanément indisponible, réessayez dans quelques instants")
             
-            if response.status_code >= 400:
-                error_data = {}
-                try:
-                    if response.content:
-                        error_data = response.json()
-                        logger.error(f"Erreur API Duffel: {response.status_code} - {json.dumps(error_data, indent=2)}")
-                    else:
-                        logger.error(f"Erreur API Duffel: {response.status_code} - Pas de contenu")
-                except:
-                    logger.error(f"Erreur API Duffel: {response.status_code} - Contenu non-JSON: {response.text}")
+            with self.scheduler.slot(endpoint) as granted:
+                if not granted:
+                    raise DuffelAPIError("Limite de requêtes Duffel atteinte, réessayez dans quelques instants")
                 
-                # Log du contenu brut pour debug
-                logger.error(f"Contenu brut de la réponse: {response.text}")
+                wire = self.wire_log.sample()
+                if wire:
+                    self.wire_log.log_request(method, f"{self.base_url}/{endpoint}", self.headers, data, params)
                 
-                raise DuffelAPIError(f"Erreur API Duffel: {response.status_code} - {error_data.get('errors', [{}])[0].get('message', 'Erreur inconnue') if error_data.get('errors') else 'Pas de détails'}")
-            
-            # Succès
-            response_data = response.json()
-            logger.info(f"Réponse réussie: {len(response_data.get('data', []))} éléments")
-            logger.info("=== FIN REQUÊTE DUFFEL ===")
+                started = time.monotonic()
+                try:
+                    response = self.transport.request(
+                        method,
+                        endpoint,
+                        json=data,
+                        params=params,
+                        timeout=timeout,
+                        stream=stream_path is not None
+                    )
+                    
+                except requests.exceptions.RequestException as e:
+                    latency = time.monotonic() - started
+                    log_call(method, endpoint_key(endpoint), None, 0, latency, retry.attempt + 1, type(e).__name__)
+                    self.circuit.record(False, latency)
+                    delay = retry.backoff(not_sent=isinstance(e, requests.exceptions.ConnectTimeout))
+                    if delay is None:
+                        logger.error(f"Erreur de connexion Duffel: {str(e)}")
+                        raise DuffelAPIError(f"Erreur de connexion: {str(e)}")
+                else:
+                    latency = time.monotonic() - started
+                    size = self._response_size(response, stream_path is not None)
+                    log_call(method, endpoint_key(endpoint), response.status_code, size, latency, retry.attempt + 1)
+                    if wire:
+                        self.wire_log.log_response(response)
+                    self.circuit.record(response.status_code < 500, latency)
+                    delay = retry.backoff(response.status_code, response.headers.get('Retry-After'))
+                    if delay is None:
+                        if stream_path is not None and response.status_code < 400:
+                            return StreamedJSON(response, stream_path, self.stream_chunk_size)
+                        if raw and response.status_code < 400:
+                            return response.content
+                        return self._handle_response(response)
+                    response.close()
             
-            return response_data
+            # Attente hors de la place réservée par le scheduler
+            time.sleep(delay)
+    
+    @staticmethod
+    def _response_size(response, streamed):
+        """Taille du corps ; celle annoncée (Content-Length) si la réponse est lue en flux"""
+        if streamed:
+            return int(response.headers.get('Content-Length') or 0)
+        return len(response.content)
+    
+    def _call_timeout(self, endpoint):
+        """
+        Timeout d'un appel : REQUEST_TIMEOUT, ramené au budget restant de la requête
+        
+        Raises:
+            DuffelDeadlineError: Budget déjà épuisé (l'appel n'est pas envoyé)
+        """
+        left = remaining()
+        if left is None:
+            return self.timeout
+        if left <= 0:
+            self.transport.metrics.incr(endpoint_key(endpoint), 'deadline_exceeded')
+            raise DuffelDeadlineError("Délai de la requête dépassé, réessayez dans quelques instants")
+        return min(self.timeout, left)
+    
+    def _handle_response(self, response):
+        """
+        Traite une réponse Duffel (requests ou httpx, même interface)
+        
+        Returns:
+            dict: Corps JSON de la réponse
+        
+        Raises:
+            DuffelAPIError: Statut d'erreur ou JSON invalide
+        """
+        if response.status_code >= 400:
+            error_data = {}
+            try:
+                if response.content:
+                    error_data = response.json()
+                    logger.error(f"Erreur API Duffel: {response.status_code} - {json.dumps(error_data, indent=2)}")
+                else:
+                    logger.error(f"Erreur API Duffel: {response.status_code} - Pas de contenu")
+            except:
+                logger.error(f"Erreur API Duffel: {response.status_code} - Contenu non-JSON: {response.text}")
             
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Erreur de connexion Duffel: {str(e)}")
-            raise DuffelAPIError(f"Erreur de connexion: {str(e)}")
+            raise DuffelAPIError(f"Erreur API Duffel: {response.status_code} - {error_data.get('errors', [{}])[0].get('message', 'Erreur inconnue') if error_data.get('errors') else 'Pas de détails'}")
+        
+        # Succès
+        try:
+            response_data = response.json()
         except json.JSONDecodeError as e:
             logger.error(f"Erreur de parsing JSON: {str(e)}")
-            logger.error(f"Contenu reçu: {response.text if 'response' in locals() else 'Pas de réponse'}")
+            logger.error(f"Contenu reçu: {response.text}")
             raise DuffelAPIError("Réponse invalide de l'API Duffel")
+        
+        return response_data
+    
+    def get_stats(self):
+        """
+        Statistiques du transport Duffel pour le processus courant
+        
+        Returns:
+            dict: Requêtes, connexions ouvertes/réutilisées et latences par endpoint
+        """
+        return self.transport.stats()
     
     def search_flights(self, origin, destination, departure_date, return_date=None, 
-                      passengers=1, cabin_class='economy'):
+                      passengers=1, cabin_class='economy', use_cache=True, flex_days=0, legs=None):
         """
         Recherche des vols via l'API Duffel
         
@@ -118,89 +300,515 @@ class DuffelService:
             return_date (date, optional): Date de retour pour aller-retour
             passengers (int): Nombre de passagers
             cabin_class (str): Classe de cabine
+            use_cache (bool): Servir/alimenter le cache des recherches
+            flex_days (int): Recherche aussi les dates à ±N jours (0 = dates exactes)
+            legs (list, optional): Trajets d'un multi-destinations, dicts origin/destination/
+                departure_date (remplacent origin, destination et les dates)
         
         Returns:
             dict: Données de l'offre request et des offres
+            (+ 'offer_requests' et 'flex_summary' en mode dates flexibles,
+            'offer_requests', 'itineraries' et 'multi_city_summary' en multi-destinations)
         """
-        try:
-            logger.info(f"=== DÉBUT RECHERCHE DUFFEL ===")
-            logger.info(f"Origin: {origin}, Destination: {destination}")
-            logger.info(f"Departure: {departure_date} (type: {type(departure_date)})")
-            logger.info(f"Return: {return_date} (type: {type(return_date)})")
-            logger.info(f"Passengers: {passengers}, Cabin: {cabin_class}")
-            
-            # Préparation des données de recherche
-            slices = [
+        if legs:
+            return self._search_multi_city(legs, passengers, cabin_class, use_cache)
+        
+        if flex_days:
+            pairs = self._flex_date_pairs(departure_date, return_date, flex_days)
+            outcomes = self._run_concurrently(self.search_flights, [
                 {
-                    "origin": origin,
-                    "destination": destination,
-                    "departure_date": departure_date.isoformat()
-                }
-            ]
-            
-            # Ajouter le vol retour si spécifié
-            if return_date:
-                slices.append({
-                    "origin": destination,
-                    "destination": origin,
-                    "departure_date": return_date.isoformat()
-                })
-            
-            # Configuration des passagers
-            passenger_config = []
-            for _ in range(passengers):
-                passenger_config.append({
-                    "type": "adult"
-                })
-            
-            search_data = {
-                "data": {
-                    "slices": slices,
-                    "passengers": passenger_config,
-                    "cabin_class": cabin_class
+                    'origin': origin,
+                    'destination': destination,
+                    'departure_date': flex_departure,
+                    'return_date': flex_return,
+                    'passengers': passengers,
+                    'cabin_class': cabin_class,
+                    'use_cache': use_cache,
                 }
+                for flex_departure, flex_return in pairs
+            ])
+            return self._merge_flexible_results(pairs, outcomes, departure_date)
+        
+        cache_params = {
+            'origin': origin,
+            'destination': destination,
+            'departure_date': departure_date,
+            'return_date': return_date,
+            'passengers': passengers,
+            'cabin_class': cabin_class,
+        }
+        return self._search_cached(cache_params, use_cache)
+    
+    def _search_cached(self, cache_params, use_cache):
+        """
+        Recherche d'un jeu de paramètres : cache, regroupement des appels identiques et
+        résultats périmés pendant un incident Duffel
+        
+        Returns:
+            dict: Données de l'offre request et des offres
+        """
+        if use_cache:
+            cached_results = self.search_cache.get(**cache_params)
+            if cached_results is not None:
+                logger.info(
+                    f"Recherche servie depuis le cache: {cache_params['origin']} → {cache_params['destination']} "
+                    f"({cache_params['departure_date']})"
+                )
+                return cached_results
+        
+        # Duffel en incident : dernière recherche connue plutôt qu'une attente vaine
+        if self.circuit.state != CLOSED:
+            stale_results = self._stale_search(cache_params)
+            if stale_results is not None:
+                return stale_results
+        
+        try:
+            return self.search_calls.do(
+                self.search_cache.make_key(**cache_params),
+                lambda: self._search_and_store(cache_params, use_cache)
+            )
+        except DuffelAPIError as e:
+            # Refus du disjoncteur, ou échec qui vient de l'ouvrir
+            stale_results = None
+            if isinstance(e, DuffelUnavailableError) or self.circuit.state != CLOSED:
+                stale_results = self._stale_search(cache_params)
+            if stale_results is None:
+                raise
+            return stale_results
+    
+    def _stale_search(self, cache_params):
+        """
+        Dernière recherche réussie (marquée `stale`) pendant un incident Duffel ;
+        relance la recherche en arrière-plan dès que le disjoncteur est semi-ouvert
+        
+        Returns:
+            dict | None: Résultats périmés ou None s'il n'y en a pas
+        """
+        stale_results = self.search_cache.get_stale(**cache_params)
+        if stale_results is None:
+            return None
+        logger.warning(
+            f"Duffel indisponible, résultats du {stale_results['stale_since']} servis: "
+            f"{cache_params['origin']} → {cache_params['destination']} ({cache_params['departure_date']})"
+        )
+        self.transport.metrics.incr('search', 'stale_served')
+        if self.circuit.state == HALF_OPEN:
+            self._refresh_in_background(cache_params)
+        return stale_results
+    
+    def _refresh_in_background(self, cache_params):
+        """Relance une recherche hors requête (une seule à la fois par jeu de paramètres)"""
+        key = self.search_cache.make_key(**cache_params)
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._refresh_executor.submit(self._refresh_search, key, cache_params)
+    
+    def _refresh_search(self, key, cache_params):
+        try:
+            with deadline(None):  # Hors requête : pas de budget utilisateur
+                self.search_calls.do(key, lambda: self._search_and_store(cache_params, True))
+            logger.info(f"Recherche rafraîchie en arrière-plan: {cache_params['origin']} → {cache_params['destination']}")
+        except DuffelAPIError as e:
+            logger.info(f"Rafraîchissement en arrière-plan sans succès: {str(e)}")
+        finally:
+            with self._refreshing_lock:
+                self._refreshing.discard(key)
+    
+    def _search_and_store(self, cache_params, use_cache):
+        """Exécute la recherche et alimente le stock d'offres et le cache des recherches"""
+        results = self._fetch_search(**cache_params)
+        self.offer_cache.set_many(results.get('offers', []))
+        
+        if use_cache:
+            self.search_cache.set(results, **cache_params)
+        return results
+    
+    def _flex_date_pairs(self, departure_date, return_date, flex_days):
+        """
+        Couples (départ, retour) décalés de -N à +N jours, en conservant la durée du séjour
+        
+        Returns:
+            list: [(date de départ, date de retour ou None)], à partir de demain
+            (même règle que FlightSearchSerializer)
+        """
+        today = date.today()
+        pairs = []
+        for delta in range(-flex_days, flex_days + 1):
+            shift = timedelta(days=delta)
+            if departure_date + shift <= today:
+                continue
+            pairs.append((departure_date + shift, return_date + shift if return_date else None))
+        return pairs
+    
+    def _run_concurrently(self, func, calls):
+        """
+        Exécute func(**kwargs) pour chaque jeu d'arguments dans un pool de threads borné
+        (DUFFEL_CONFIG['SEARCH_MAX_WORKERS'])
+        
+        Returns:
+            list: [(résultat, exception)] dans l'ordre des appels
+        """
+        if not calls:
+            return []
+        max_workers = max(1, min(len(calls), self.search_max_workers))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='duffel-search') as executor:
+            futures = [submit_with_context(executor, func, **kwargs) for kwargs in calls]
+        
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append((future.result(), None))
+            except Exception as e:
+                outcomes.append((None, e))
+        return outcomes
+    
+    def _merge_flexible_results(self, pairs, outcomes, departure_date):
+        """
+        Fusionne les recherches par date en un résultat unique
+        
+        Returns:
+            dict: Offres fusionnées (triées par prix), offer_requests et
+            flex_summary (offre la moins chère par jour)
+        """
+        offers = []
+        offer_requests = []
+        flex_summary = []
+        main_offer_request = None
+        
+        for (flex_departure, flex_return), (results, error) in zip(pairs, outcomes):
+            day = {
+                'departure_date': flex_departure.isoformat(),
+                'return_date': flex_return.isoformat() if flex_return else None,
+                'total_offers': 0,
+                'cheapest_amount': None,
+                'cheapest_currency': None,
+                'cheapest_offer_id': None,
+                'is_cheapest_day': False,
+                'is_selected_date': flex_departure == departure_date,
+                'error': None
             }
+            flex_summary.append(day)
             
-            logger.info(f"Données de recherche: {json.dumps(search_data, indent=2)}")
-            logger.info(f"Headers: {self.headers}")
+            if error:
+                logger.warning(f"Recherche flexible échouée pour le {flex_departure}: {str(error)}")
+                day['error'] = str(error)
+                continue
             
-            # Créer la demande d'offre
-            logger.info("Création de la demande d'offre...")
-            logger.info(f"Endpoint: offer_requests")
-            logger.info(f"URL complète: {self.base_url}/offer_requests")
+            day_offers = results.get('offers', [])
+            offers.extend(day_offers)
+            offer_requests.append(results['offer_request'])
+            if flex_departure == departure_date:
+                main_offer_request = results['offer_request']
             
-            offer_request_response = self._make_request(
-                'POST', 
-                'offer_requests',
-                data=search_data
+            day['total_offers'] = len(day_offers)
+            cheapest = min(day_offers, key=offer_price, default=None)
+            if cheapest:
+                day['cheapest_amount'] = cheapest.get('total_amount')
+                day['cheapest_currency'] = cheapest.get('total_currency')
+                day['cheapest_offer_id'] = cheapest.get('id')
+        
+        if not offer_requests:
+            raise DuffelAPIError("Erreur lors de la recherche: aucune date n'a pu être recherchée")
+        
+        priced_days = [day for day in flex_summary if day['cheapest_amount'] is not None]
+        if priced_days:
+            min(priced_days, key=lambda day: Decimal(day['cheapest_amount']))['is_cheapest_day'] = True
+        
+        offers.sort(key=offer_price)
+        return {
+            'offer_request': main_offer_request or offer_requests[0],
+            'offer_requests': offer_requests,
+            'offers': offers,
+            'flex_summary': flex_summary,
+            'stale': any(results and results.get('stale') for results, _ in outcomes)
+        }
+    
+    def _multi_city_params(self, legs, passengers, cabin_class):
+        """
+        Paramètres des recherches d'un multi-destinations
+        
+        Returns:
+            list: Recherche combinée (toutes les slices dans une offer_request), puis
+            un aller simple par trajet
+        """
+        legs = [
+            {'origin': leg['origin'], 'destination': leg['destination'], 'departure_date': leg['departure_date']}
+            for leg in legs
+        ]
+        combined = {
+            'origin': legs[0]['origin'],
+            'destination': legs[-1]['destination'],
+            'departure_date': legs[0]['departure_date'],
+            'return_date': None,
+            'passengers': passengers,
+            'cabin_class': cabin_class,
+            'legs': legs,
+        }
+        return [combined] + [
+            dict(leg, return_date=None, passengers=passengers, cabin_class=cabin_class)
+            for leg in legs
+        ]
+    
+    def _search_multi_city(self, legs, passengers, cabin_class, use_cache):
+        """
+        Recherche multi-destinations
+        
+        La recherche combinée et les allers simples de chaque trajet partent en parallèle
+        (SEARCH_MAX_WORKERS) : la latence est celle du trajet le plus lent, pas leur somme.
+        """
+        searches = self._multi_city_params(legs, passengers, cabin_class)
+        outcomes = self._run_concurrently(self._search_cached, [
+            {'cache_params': cache_params, 'use_cache': use_cache} for cache_params in searches
+        ])
+        return self._merge_multi_city_results(searches[1:], outcomes)
+    
+    def _merge_multi_city_results(self, legs, outcomes):
+        """
+        Fusionne la recherche combinée et les allers simples par trajet
+        
+        Les allers simples forment des itinéraires combinables (un billet par trajet) :
+        les FLIGHT_CONFIG['MULTI_CITY_ITINERARIES'] combinaisons les moins chères, dans
+        la devise de l'aller simple le moins cher du premier trajet.
+        
+        Args:
+            legs (list): Paramètres des allers simples, dans l'ordre du voyage
+            outcomes (list): [(résultat, exception)] : recherche combinée puis un par trajet
+        
+        Returns:
+            dict: Offres de la recherche combinée (triées par prix), offer_requests,
+            itineraries et multi_city_summary (comparaison billet unique / billets séparés)
+        """
+        (combined, combined_error), leg_outcomes = outcomes[0], outcomes[1:]
+        if combined_error:
+            logger.warning(f"Recherche multi-destinations combinée échouée: {str(combined_error)}")
+        
+        offer_requests = [combined['offer_request']] if combined else []
+        leg_summary = []
+        leg_offers = []
+        for leg, (results, error) in zip(legs, leg_outcomes):
+            summary = {
+                'origin': leg['origin'],
+                'destination': leg['destination'],
+                'departure_date': leg['departure_date'].isoformat(),
+                'total_offers': 0,
+                'cheapest_amount': None,
+                'cheapest_currency': None,
+                'cheapest_offer_id': None,
+                'error': None
+            }
+            leg_summary.append(summary)
+            if error:
+                logger.warning(f"Aller simple {leg['origin']} → {leg['destination']} échoué: {str(error)}")
+                summary['error'] = str(error)
+                leg_offers.append([])
+                continue
+            offers = sorted(results.get('offers', []), key=offer_price)
+            leg_offers.append(offers)
+            offer_requests.append(results['offer_request'])
+            summary['total_offers'] = len(offers)
+            if offers:
+                summary['cheapest_amount'] = offers[0].get('total_amount')
+                summary['cheapest_currency'] = offers[0].get('total_currency')
+                summary['cheapest_offer_id'] = offers[0].get('id')
+        
+        if not offer_requests:
+            raise DuffelAPIError("Erreur lors de la recherche: aucun trajet n'a pu être recherché")
+        
+        itineraries = self._combine_leg_offers(leg_offers)
+        offers = sorted(combined.get('offers', []), key=offer_price) if combined else []
+        
+        combined_cheapest = offers[0] if offers else None
+        separate_cheapest = itineraries[0] if itineraries else None
+        cheapest = None
+        if combined_cheapest and separate_cheapest:
+            same_currency = combined_cheapest.get('total_currency') == separate_cheapest['total_currency']
+            if same_currency and Decimal(separate_cheapest['total_amount']) < offer_price(combined_cheapest):
+                cheapest = 'separate'
+            else:
+                cheapest = 'combined'
+        elif combined_cheapest or separate_cheapest:
+            cheapest = 'combined' if combined_cheapest else 'separate'
+        
+        return {
+            'offer_request': offer_requests[0],
+            'offer_requests': offer_requests,
+            'offers': offers,
+            'itineraries': itineraries,
+            'multi_city_summary': {
+                'legs': leg_summary,
+                'combined_amount': combined_cheapest.get('total_amount') if combined_cheapest else None,
+                'combined_currency': combined_cheapest.get('total_currency') if combined_cheapest else None,
+                'combined_error': str(combined_error) if combined_error else None,
+                'separate_amount': separate_cheapest['total_amount'] if separate_cheapest else None,
+                'separate_currency': separate_cheapest['total_currency'] if separate_cheapest else None,
+                'cheapest': cheapest
+            },
+            'stale': any(results and results.get('stale') for results, _ in outcomes)
+        }
+    
+    def _combine_leg_offers(self, leg_offers):
+        """
+        Combinaisons les moins chères d'un aller simple par trajet
+        
+        Parcours en tas des sommes de prix (chaque trajet trié par prix) : seules les
+        combinaisons candidates sont évaluées, pas le produit cartésien.
+        
+        Args:
+            leg_offers (list): Offres brutes de chaque trajet
+        
+        Returns:
+            list: Itinéraires {total_amount, total_currency, offer_ids, amounts}, du moins cher au plus cher
+        """
+        if not leg_offers or not all(leg_offers):
+            return []
+        currency = leg_offers[0][0].get('total_currency')
+        legs = []
+        for offers in leg_offers:
+            priced = [
+                (offer_price(offer), offer) for offer in offers
+                if offer.get('total_currency') == currency and offer_price(offer).is_finite()
+            ]
+            if not priced:
+                return []
+            legs.append(priced)
+        
+        start = (0,) * len(legs)
+        heap = [(sum(leg[0][0] for leg in legs), start)]
+        seen = {start}
+        itineraries = []
+        while heap and len(itineraries) < self.multi_city_itineraries:
+            total, indexes = heapq.heappop(heap)
+            chosen = [leg[index][1] for leg, index in zip(legs, indexes)]
+            itineraries.append({
+                'total_amount': str(total),
+                'total_currency': currency,
+                'offer_ids': [offer.get('id') for offer in chosen],
+                'amounts': [offer.get('total_amount') for offer in chosen]
+            })
+            for position, leg in enumerate(legs):
+                following = indexes[:position] + (indexes[position] + 1,) + indexes[position + 1:]
+                if following[position] < len(leg) and following not in seen:
+                    seen.add(following)
+                    heapq.heappush(heap, (total - leg[indexes[position]][0] + leg[following[position]][0], following))
+        return itineraries
+    
+    def _build_search_data(self, origin, destination, departure_date, return_date=None,
+                           passengers=1, cabin_class='economy', legs=None):
+        """
+        Construit le corps de la demande d'offre (offer_request)
+        
+        Args:
+            legs (list, optional): Trajets d'un multi-destinations (une slice chacun)
+        
+        Returns:
+            dict: Payload Duffel avec slices, passagers et cabine
+        """
+        # Préparation des données de recherche
+        slices = [
+            {
+                "origin": leg['origin'],
+                "destination": leg['destination'],
+                "departure_date": leg['departure_date'].isoformat()
+            }
+            for leg in legs or [{'origin': origin, 'destination': destination, 'departure_date': departure_date}]
+        ]
+        
+        # Ajouter le vol retour si spécifié
+        if return_date:
+            slices.append({
+                "origin": destination,
+                "destination": origin,
+                "departure_date": return_date.isoformat()
+            })
+        
+        # Configuration des passagers
+        passenger_config = []
+        for _ in range(passengers):
+            passenger_config.append({
+                "type": "adult"
+            })
+        
+        return {
+            "data": {
+                "slices": slices,
+                "passengers": passenger_config,
+                "cabin_class": cabin_class
+            }
+        }
+    
+    def _fetch_search(self, origin, destination, departure_date, return_date=None,
+                      passengers=1, cabin_class='economy', legs=None):
+        """
+        Exécute la recherche auprès de Duffel
+        
+        En mode DUFFEL_CONFIG['INLINE_OFFERS'], les offres sont lues directement dans la
+        réponse de offer_requests (un seul aller-retour) ; sinon, ou si elles en sont
+        absentes, elles sont lues via GET offers. Avec FLIGHT_CONFIG['FETCH_ALL_OFFERS'],
+        toutes les pages sont parcourues (jusqu'à MAX_OFFERS_SCANNED offres) et seules
+        les SEARCH_RESULTS_LIMIT moins chères sont conservées.
+        """
+        try:
+            logger.info(f"Recherche Duffel: {origin} → {destination} ({departure_date}, retour {return_date})")
+            
+            search_data = self._build_search_data(
+                origin, destination, departure_date, return_date, passengers, cabin_class, legs
             )
             
-            logger.info(f"Demande d'offre créée: {offer_request_response['data']['id']}")
+            started = time.perf_counter()
             
-            offer_request_id = offer_request_response['data']['id']
+            # Créer la demande d'offre (offres incluses dans la réponse en mode INLINE_OFFERS)
+            inline = self.inline_offers and not self.fetch_all_offers
+            offer_request_params = {'return_offers': 'true' if inline else 'false'}
+            if inline and self.stream_offers:
+                offer_request_response, inline_offers, received = self._stream_offers(
+                    'POST', 'offer_requests', ('data', 'offers'), data=search_data, params=offer_request_params
+                )
+                offer_request = offer_request_response['data']
+            else:
+                offer_request_response = self._make_request(
+                    'POST', 
+                    'offer_requests',
+                    data=search_data,
+                    params=offer_request_params
+                )
+                offer_request = offer_request_response['data']
+                inline_offers, received = offer_request.pop('offers', None), None
             
-            # Récupérer les offres
-            logger.info("Récupération des offres...")
-            logger.info(f"Endpoint: offers (avec filtrage)")
+            logger.info(f"Demande d'offre créée: {offer_request['id']}")
             
+            if self.fetch_all_offers:
+                top_offers = TopOffers(self.results_limit)
+                for page in self.iter_offer_pages(offer_request['id'], self.max_offers_scanned, self.offers_page_size):
+                    top_offers.extend(page)
+                return self._finish_search(offer_request, top_offers.sorted(), 'all_pages', started, top_offers.seen)
+            
+            if inline and inline_offers is not None:
+                return self._finish_search(offer_request, inline_offers, 'inline', started, received)
+            if self.inline_offers:
+                logger.warning(f"Offres absentes de la demande {offer_request['id']}, lecture via /offers")
+                self.transport.metrics.incr('search', 'inline_fallbacks')
+            
+            # Récupérer les offres
             # Selon la collection Postman, l'endpoint est /offers avec des paramètres
+            if self.stream_offers:
+                _, offers, received = self._stream_offers(
+                    'GET', 'offers', ('data',), params=self._offer_list_params(offer_request['id'])
+                )
+                return self._finish_search(offer_request, offers or [], 'two_step', started, received)
+            
             offers_response = self._make_request(
                 'GET',
                 'offers',
-                params={
-                    'offer_request_id': offer_request_id,
-                    'limit': 50
-                }
+                params=self._offer_list_params(offer_request['id'])
             )
             
-            logger.info(f"Offres récupérées: {len(offers_response['data'])} offres")
-            logger.info("=== FIN RECHERCHE DUFFEL ===")
-            
-            return {
-                'offer_request': offer_request_response['data'],
-                'offers': offers_response['data']
-            }
+            return self._finish_search(offer_request, offers_response['data'], 'two_step', started)
             
+        except DuffelAPIError:
+            # Budget épuisé, disjoncteur ouvert... : le type est gardé pour l'appelant
+            raise
         except Exception as e:
             logger.error(f"Erreur lors de la recherche de vols: {str(e)}")
             logger.error(f"Type d'erreur: {type(e)}")
@@ -208,22 +816,265 @@ class DuffelService:
             logger.error(f"Traceback: {traceback.format_exc()}")
             raise DuffelAPIError(f"Erreur lors de la recherche: {str(e)}")
     
-    def get_offer(self, offer_id):
+    def _stream_offers(self, method, endpoint, path, data=None, params=None):
+        """
+        Lit les offres d'une réponse Duffel au fil de leur réception (DUFFEL_CONFIG['STREAM_OFFERS'])
+        
+        Seules les SEARCH_RESULTS_LIMIT moins chères sont gardées pendant la lecture : ni le
+        corps complet ni l'ensemble des offres décodées ne sont en mémoire à la fois.
+        
+        Args:
+            path (tuple): Chemin du tableau d'offres dans la réponse, ex: ('data', 'offers')
+        
+        Returns:
+            tuple: (reste de la réponse, offres conservées ou None si le tableau est absent,
+                nombre d'offres reçues)
+        """
+        stream = self._make_request(method, endpoint, data=data, params=params, stream_path=path)
+        top_offers = TopOffers(self.results_limit)
+        top_offers.extend(stream)
+        self.transport.metrics.incr(endpoint_key(endpoint), 'streamed_bytes', stream.size)
+        return stream.document, top_offers.sorted() if stream.found else None, top_offers.seen
+    
+    def _offer_list_params(self, offer_request_id):
+        """Paramètres de GET offers pour une recherche en deux temps"""
+        return {
+            'offer_request_id': offer_request_id,
+            'sort': 'total_amount',
+            'limit': min(self.results_limit, self.offers_page_size)
+        }
+    
+    def _finish_search(self, offer_request, offers, path, started, received=None):
+        """
+        Termine une recherche : tri par prix, limite SEARCH_RESULTS_LIMIT et métriques
+        
+        Args:
+            path (str): 'inline' (un aller-retour), 'two_step' (offer_request puis offres)
+                ou 'all_pages' (parcours complet du curseur)
+            started (float): Début de la recherche (time.perf_counter)
+            received (int, optional): Offres parcourues, si différent de len(offers)
+        
+        Returns:
+            dict: Données de l'offre request et des offres
+        """
+        received = len(offers) if received is None else received
+        offers = heapq.nsmallest(self.results_limit, offers, key=offer_price)
+        
+        elapsed = time.perf_counter() - started
+        self.transport.metrics.incr('search', f'{path}_searches')
+        self.transport.metrics.observe('search', f'{path}_latency', elapsed)
+        
+        logger.info(f"Offres récupérées ({path}): {received} reçues, {len(offers)} conservées en {elapsed * 1000:.0f} ms")
+        
+        return {
+            'offer_request': offer_request,
+            'offers': offers
+        }
+    
+    def search_flights_raw(self, origin, destination, departure_date, return_date=None,
+                           passengers=1, cabin_class='economy', legs=None):
+        """
+        Recherche relayée telle quelle (format raw de l'API de recherche)
+        
+        Corps de POST offer_requests, offres incluses, sans décodage : ni tri, ni limite
+        SEARCH_RESULTS_LIMIT, ni cache des recherches ou des offres.
+        
+        Returns:
+            bytes: Réponse JSON de Duffel
+        """
+        try:
+            logger.info(f"Recherche Duffel relayée: {origin} → {destination} ({departure_date}, retour {return_date})")
+            search_data = self._build_search_data(
+                origin, destination, departure_date, return_date, passengers, cabin_class, legs
+            )
+            started = time.perf_counter()
+            body = self._make_request(
+                'POST', 'offer_requests', data=search_data, params={'return_offers': 'true'}, raw=True
+            )
+        except DuffelAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche de vols: {str(e)}")
+            raise DuffelAPIError(f"Erreur lors de la recherche: {str(e)}")
+        
+        return self._finish_raw_search(body, started)
+    
+    def _finish_raw_search(self, body, started):
+        """Métriques d'une recherche relayée (clé `search` : raw_searches, raw_latency)"""
+        elapsed = time.perf_counter() - started
+        self.transport.metrics.incr('search', 'raw_searches')
+        self.transport.metrics.observe('search', 'raw_latency', elapsed)
+        logger.info(f"Recherche relayée: {len(body)} octets en {elapsed * 1000:.0f} ms")
+        return body
+    
+    def iter_search_offers(self, origin, destination, departure_date, return_date=None,
+                           passengers=1, cabin_class='economy', use_cache=True, results=None):
+        """
+        Recherche des vols en renvoyant les offres au fil de leur réception
+        
+        L'offer_request est créée sans offres (return_offers=false), puis les offres
+        sont lues par pages de FLIGHT_CONFIG['STREAM_PAGE_SIZE'], les moins chères
+        d'abord, jusqu'à SEARCH_RESULTS_LIMIT. La recherche complète alimente
+        ensuite les caches comme search_flights.
+        
+        Args:
+            results (dict, optional): Rempli en fin de flux avec 'offer_request' et
+                'offers' (mêmes clés que search_flights, pour results_store.put)
+        
+        Yields:
+            dict: Offres brutes Duffel
+        """
+        cache_params = {
+            'origin': origin,
+            'destination': destination,
+            'departure_date': departure_date,
+            'return_date': return_date,
+            'passengers': passengers,
+            'cabin_class': cabin_class,
+        }
+        if use_cache:
+            cached_results = self.search_cache.get(**cache_params)
+            if cached_results is not None:
+                logger.info(f"Recherche servie depuis le cache: {origin} → {destination} ({departure_date})")
+                yield from cached_results.get('offers', [])
+                if results is not None:
+                    results.update(offer_request=cached_results.get('offer_request'), offers=cached_results.get('offers', []))
+                return
+        
+        try:
+            search_data = self._build_search_data(
+                origin, destination, departure_date, return_date, passengers, cabin_class
+            )
+            offer_request = self._make_request(
+                'POST', 'offer_requests', data=search_data, params={'return_offers': 'false'}
+            )['data']
+        except DuffelAPIError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche de vols: {str(e)}")
+            raise DuffelAPIError(f"Erreur lors de la recherche: {str(e)}")
+        
+        offers = []
+        for page in self.iter_offer_pages(offer_request['id'], self.results_limit, self.stream_page_size):
+            offers.extend(page)
+            yield from page
+        
+        logger.info(f"Offres récupérées en flux: {len(offers)} offres")
+        self.offer_cache.set_many(offers)
+        if use_cache:
+            self.search_cache.set({'offer_request': offer_request, 'offers': offers}, **cache_params)
+        if results is not None:
+            results.update(offer_request=offer_request, offers=offers)
+    
+    def iter_offer_pages(self, offer_request_id, max_offers, page_size):
+        """
+        Parcourt les pages d'offres d'une offer_request via le curseur `after`
+        
+        La page suivante est demandée en tâche de fond pendant que l'appelant traite
+        la page courante ; au plus deux pages sont en mémoire.
+        
+        Args:
+            offer_request_id (str): ID de l'offer_request
+            max_offers (int): Nombre maximal d'offres lues
+            page_size (int): Taille des pages (200 au plus chez Duffel)
+        
+        Yields:
+            list: Offres brutes de chaque page
+        """
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='duffel-pages')
+        try:
+            received = 0
+            params = self._offer_page_params(offer_request_id, received, max_offers, page_size)
+            pending = submit_with_context(executor, self._make_request, 'GET', 'offers', params=params) if params else None
+            while pending is not None:
+                try:
+                    response = pending.result()
+                except DuffelAPIError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Erreur lors de la lecture des offres: {str(e)}")
+                    raise DuffelAPIError(f"Erreur lors de la recherche: {str(e)}")
+                page = response.get('data', [])
+                received += len(page)
+                params = self._offer_page_params(offer_request_id, received, max_offers, page_size, response, page)
+                pending = submit_with_context(executor, self._make_request, 'GET', 'offers', params=params) if params else None
+                self.transport.metrics.incr('offers', 'pages')
+                yield page
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _offer_page_params(self, offer_request_id, received, max_offers, page_size, response=None, page=None):
+        """
+        Paramètres de la page d'offres suivante
+        
+        Returns:
+            dict | None: Paramètres de GET offers, ou None si la lecture est terminée
+        """
+        remaining = max_offers - received
+        if remaining <= 0:
+            return None
+        params = {
+            'offer_request_id': offer_request_id,
+            'sort': 'total_amount',
+            'limit': min(page_size, remaining)
+        }
+        if response is not None:
+            after = (response.get('meta') or {}).get('after')
+            if not after or not page:
+                return None
+            params['after'] = after
+        return params
+    
+    def list_reference_data(self, resource, page_size=200):
+        """
+        Parcourt une liste de référence Duffel, page par page (curseur after)
+        
+        Args:
+            resource (str): 'airports', 'airlines' ou 'aircraft'
+            page_size (int): Éléments par page (200 au plus)
+        
+        Yields:
+            dict: Élément de la liste
+        """
+        params = {'limit': page_size}
+        while True:
+            response = self._make_request('GET', resource, params=params)
+            yield from response.get('data', [])
+            after = (response.get('meta') or {}).get('after')
+            if not after:
+                return
+            params = {'limit': page_size, 'after': after}
+    
+    def get_offer(self, offer_id, use_cache=True):
         """
         Récupère les détails d'une offre spécifique
         
         Args:
             offer_id (str): ID de l'offre Duffel
+            use_cache (bool): Lire d'abord le stock d'offres
         
         Returns:
             dict: Détails de l'offre
         """
+        if use_cache:
+            cached_offer = self.offer_cache.get(offer_id)
+            if cached_offer is not None:
+                logger.info(f"Offre servie depuis le cache: {offer_id}")
+                return cached_offer
+        
+        return self.offer_calls.do(offer_id, lambda: self._fetch_offer(offer_id))
+    
+    def _fetch_offer(self, offer_id):
+        """Lit une offre chez Duffel et la met en stock"""
         try:
             logger.info(f"Récupération de l'offre: {offer_id}")
             
             response = self._make_request('GET', f'offers/{offer_id}')
+            self.offer_cache.set(response['data'])
             return response['data']
             
+        except DuffelAPIError:
+            raise
         except Exception as e:
             logger.error(f"Erreur lors de la récupération de l'offre {offer_id}: {str(e)}")
             raise DuffelAPIError(f"Erreur lors de la récupération de l'offre: {str(e)}")
@@ -254,6 +1105,8 @@ class DuffelService:
             response = self._make_request('POST', 'orders', data=booking_data)
             return response['data']
             
+        except DuffelAPIError:
+            raise
         except Exception as e:
             logger.error(f"Erreur lors de la création de réservation: {str(e)}")
             raise DuffelAPIError(f"Erreur lors de la création de réservation: {str(e)}")
@@ -277,6 +1130,8 @@ class DuffelService:
             )
             return response['data']
             
+        except DuffelAPIError:
+            raise
         except Exception as e:
             logger.error(f"Erreur lors de la confirmation: {str(e)}")
             raise DuffelAPIError(f"Erreur lors de la confirmation: {str(e)}")
@@ -300,6 +1155,8 @@ class DuffelService:
             )
             return response['data']
             
+        except DuffelAPIError:
+            raise
         except Exception as e:
             logger.error(f"Erreur lors de l'annulation: {str(e)}")
             raise DuffelAPIError(f"Erreur lors de l'annulation: {str(e)}")
@@ -320,6 +1177,8 @@ class DuffelService:
             response = self._make_request('GET', f'orders/{booking_id}')
             return response['data']
             
+        except DuffelAPIError:
+            raise
         except Exception as e:
             logger.error(f"Erreur lors de la récupération des détails: {str(e)}")
             raise DuffelAPIError(f"Erreur lors de la récupération: {str(e)}")
@@ -328,200 +1187,31 @@ class DuffelService:
         """
         Formate une offre de l'API Duffel pour l'affichage frontend.
         Exploite toutes les données riches disponibles dans l'API v2.
+        
+        Returns:
+            FormattedOffer: Offre en lecture seule (s'utilise comme un dict), None si invalide
         """
-        try:
-            if not offer or 'id' not in offer:
-                logger.warning("Offre invalide reçue")
-                return None
+        # Un seul passage ; passagers et services calculés à la demande (voir duffel_offers).
+        # Une offre mal formée est écartée sans faire échouer toute la recherche
+        return format_valid_offer(offer)
 
-            # Extraction des informations de base
-            formatted_offer = {
-                'id': offer.get('id'),
-                'total_amount': offer.get('total_amount'),
-                'total_currency': offer.get('total_currency'),
-                'base_amount': offer.get('base_amount'),
-                'tax_amount': offer.get('tax_amount'),
-                'base_currency': offer.get('base_currency'),
-                'tax_currency': offer.get('tax_currency'),
-                'total_emissions_kg': offer.get('total_emissions_kg'),
-                'owner': {
-                    'name': offer.get('owner', {}).get('name', 'Compagnie inconnue'),
-                    'iata_code': offer.get('owner', {}).get('iata_code', ''),
-                    'logo_symbol_url': offer.get('owner', {}).get('logo_symbol_url', ''),
-                    'logo_lockup_url': offer.get('owner', {}).get('logo_lockup_url', ''),
-                    'id': offer.get('owner', {}).get('id', '')
-                },
-                'passenger_identity_documents_required': offer.get('passenger_identity_documents_required', False),
-                'available_seats': 10,  # Valeur par défaut
-                'live_mode': offer.get('live_mode', False),
-                'created_at': offer.get('created_at'),
-                'expires_at': offer.get('expires_at'),
-                'partial': offer.get('partial', False)
-            }
-
-            # Traitement des slices (segments de vol)
-            slices = offer.get('slices', [])
-            if slices:
-                formatted_offer['slices'] = []
-                
-                for slice_idx, slice_data in enumerate(slices):
-                    segments = slice_data.get('segments', [])
-                    
-                    if segments:
-                        # Premier segment du slice
-                        first_segment = segments[0]
-                        
-                        # Informations de vol détaillées
-                        slice_info = {
-                            'id': slice_data.get('id'),
-                            'fare_brand_name': slice_data.get('fare_brand_name'),
-                            'origin': {
-                                'iata_code': first_segment.get('origin', {}).get('iata_code', ''),
-                                'name': first_segment.get('origin', {}).get('name', 'Aéroport inconnu'),
-                                'city_name': first_segment.get('origin', {}).get('city_name', ''),
-                                'terminal': first_segment.get('origin_terminal', ''),
-                                'latitude': first_segment.get('origin', {}).get('latitude'),
-                                'longitude': first_segment.get('origin', {}).get('longitude'),
-                                'time_zone': first_segment.get('origin', {}).get('time_zone')
-                            },
-                            'destination': {
-                                'iata_code': first_segment.get('destination', {}).get('iata_code', ''),
-                                'name': first_segment.get('destination', {}).get('name', 'Aéroport inconnu'),
-                                'city_name': first_segment.get('destination', {}).get('city_name', ''),
-                                'terminal': first_segment.get('destination_terminal', ''),
-                                'latitude': first_segment.get('destination', {}).get('latitude'),
-                                'longitude': first_segment.get('destination', {}).get('longitude'),
-                                'time_zone': first_segment.get('destination', {}).get('time_zone')
-                            },
-                            'segments': [],
-                            'duration': slice_data.get('duration', ''),
-                            'stops': len(segments) - 1,  # Nombre d'escales
-                            'conditions': slice_data.get('conditions', {})
-                        }
-                        
-                        # Traitement de tous les segments du slice
-                        for segment in segments:
-                            segment_info = {
-                                'id': segment.get('id'),
-                                'departing_at': segment.get('departing_at', ''),
-                                'arriving_at': segment.get('arriving_at', ''),
-                                'duration': segment.get('duration', ''),
-                                'distance': segment.get('distance'),
-                                'operating_carrier': {
-                                    'name': segment.get('operating_carrier', {}).get('name', ''),
-                                    'iata_code': segment.get('operating_carrier', {}).get('iata_code', ''),
-                                    'flight_number': segment.get('operating_carrier_flight_number', ''),
-                                    'logo_symbol_url': segment.get('operating_carrier', {}).get('logo_symbol_url', ''),
-                                    'id': segment.get('operating_carrier', {}).get('id', '')
-                                },
-                                'marketing_carrier': {
-                                    'name': segment.get('marketing_carrier', {}).get('name', ''),
-                                    'iata_code': segment.get('marketing_carrier', {}).get('iata_code', ''),
-                                    'flight_number': segment.get('marketing_carrier_flight_number', ''),
-                                    'logo_symbol_url': segment.get('marketing_carrier', {}).get('logo_symbol_url', ''),
-                                    'id': segment.get('marketing_carrier', {}).get('id', '')
-                                },
-                                'stops': segment.get('stops', []),
-                                'origin_terminal': segment.get('origin_terminal'),
-                                'destination_terminal': segment.get('destination_terminal'),
-                                'aircraft': segment.get('aircraft'),
-                                'passengers': segment.get('passengers', [])
-                            }
-                            
-                            slice_info['segments'].append(segment_info)
-                        
-                        formatted_offer['slices'].append(slice_info)
-
-            # Informations de paiement détaillées
-            payment_reqs = offer.get('payment_requirements', {})
-            if payment_reqs:
-                formatted_offer['payment'] = {
-                    'requires_instant_payment': payment_reqs.get('requires_instant_payment', False),
-                    'price_guarantee_expires_at': payment_reqs.get('price_guarantee_expires_at', ''),
-                    'payment_required_by': payment_reqs.get('payment_required_by', '')
-                }
-
-            # Conditions de l'offre détaillées
-            conditions = offer.get('conditions', {})
-            if conditions:
-                formatted_offer['conditions'] = {
-                    'refundable': conditions.get('refund_before_departure', {}).get('allowed', False) if conditions.get('refund_before_departure') else False,
-                    'refund_penalty_amount': conditions.get('refund_before_departure', {}).get('penalty_amount') if conditions.get('refund_before_departure') else None,
-                    'refund_penalty_currency': conditions.get('refund_before_departure', {}).get('penalty_currency') if conditions.get('refund_before_departure') else None,
-                    'changeable': conditions.get('change_before_departure', {}).get('allowed', False) if conditions.get('change_before_departure') else False,
-                    'change_penalty_amount': conditions.get('change_before_departure', {}).get('penalty_amount') if conditions.get('change_before_departure') else None,
-                    'change_penalty_currency': conditions.get('change_before_departure', {}).get('penalty_currency') if conditions.get('change_before_departure') else None
-                }
-            else:
-                formatted_offer['conditions'] = {
-                    'refundable': False,
-                    'refund_penalty_amount': None,
-                    'refund_penalty_currency': None,
-                    'changeable': False,
-                    'change_penalty_amount': None,
-                    'change_penalty_currency': None
-                }
-
-            # Conditions des slices (plus détaillées)
-            if offer.get('slices'):
-                for slice_data in offer['slices']:
-                    slice_conditions = slice_data.get('conditions', {})
-                    if slice_conditions:
-                        # Ajouter les conditions spécifiques au slice
-                        if 'change_before_departure' in slice_conditions:
-                            change_info = slice_conditions['change_before_departure']
-                            if change_info and change_info.get('allowed'):
-                                formatted_offer['slice_conditions'] = {
-                                    'change_before_departure': {
-                                        'allowed': True,
-                                        'penalty_amount': change_info.get('penalty_amount'),
-                                        'penalty_currency': change_info.get('penalty_currency')
-                                    }
-                                }
-
-            # Informations sur les passagers
-            passengers = offer.get('passengers', [])
-            if passengers:
-                formatted_offer['passengers'] = []
-                for passenger in passengers:
-                    passenger_info = {
-                        'id': passenger.get('id'),
-                        'type': passenger.get('type'),
-                        'age': passenger.get('age'),
-                        'family_name': passenger.get('family_name'),
-                        'given_name': passenger.get('given_name'),
-                        'fare_type': passenger.get('fare_type'),
-                        'loyalty_programme_accounts': passenger.get('loyalty_programme_accounts', [])
-                    }
-                    formatted_offer['passengers'].append(passenger_info)
-
-            # Services supportés
-            formatted_offer['supported_passenger_identity_document_types'] = offer.get('supported_passenger_identity_document_types', [])
-            formatted_offer['supported_loyalty_programmes'] = offer.get('supported_loyalty_programmes', [])
-
-            # Services disponibles
-            formatted_offer['available_services'] = offer.get('available_services')
-
-            logger.info(f"Offre formatée: {offer.get('id')} - {formatted_offer['owner']['name']} - {formatted_offer['total_amount']} {formatted_offer['total_currency']}")
-
-            return formatted_offer
-
-        except Exception as e:
-            logger.error(f"Erreur lors du formatage de l'offre: {str(e)}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            return None
-
-    def get_offer_details(self, offer_id):
+    def get_offer_details(self, offer_id, use_cache=True):
         """
         Récupère les détails complets d'une offre via l'endpoint /air/offers/{OFFER_ID}
         
         Args:
             offer_id (str): ID de l'offre (ex: off_0000AxePR1Bp3LJq0ToDYL)
+            use_cache (bool): Lire d'abord le stock d'offres
         
         Returns:
             dict: Détails complets de l'offre
         """
+        if use_cache:
+            cached_offer = self.offer_cache.get(offer_id)
+            if cached_offer is not None:
+                logger.info(f"Détails de l'offre servis depuis le cache: {offer_id}")
+                return cached_offer
+        
         try:
             logger.info(f"Récupération des détails de l'offre: {offer_id}")
             
@@ -529,12 +1219,15 @@ class DuffelService:
             
             if response and 'data' in response:
                 offer_details = response['data']
+                self.offer_cache.set(offer_details)
                 logger.info(f"Détails de l'offre récupérés avec succès: {offer_id}")
                 return offer_details
             else:
                 logger.error(f"Réponse invalide pour l'offre {offer_id}")
                 return None
                 
+        except DuffelAPIError:
+            raise
         except Exception as e:
             logger.error(f"Erreur lors de la récupération des détails de l'offre {offer_id}: {str(e)}")
             raise DuffelAPIError(f"Impossible de récupérer les détails de l'offre: {str(e)}")
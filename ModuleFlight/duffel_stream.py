@@ -0,0 +1,227 @@
+"""
+Lecture incrémentale des réponses JSON de Duffel
+Les éléments d'un tableau (les offres) sont décodés au fil des blocs reçus, sans
+garder en mémoire le corps complet ni l'arbre JSON de toutes les offres
+"""
+
+import codecs
+import json
+
+WHITESPACE = ' \t\n\r'
+DELIMITERS = WHITESPACE + ',:]}'
+
+_decoder = json.JSONDecoder()
+
+
+class JSONArrayStream:
+    """
+    Analyseur JSON incrémental (on lui pousse les blocs reçus)
+
+    Le tableau désigné par `path` (ex: ('data', 'offers')) est rendu élément par
+    élément ; le reste du document est décodé normalement dans `document`, sans ce
+    tableau. Chaque élément est décodé d'un bloc par le décodeur C de json.
+    """
+
+    def __init__(self, path):
+        self.path = tuple(path)
+        self.document = {}
+        self.found = False
+        self.count = 0
+        self._text = ''
+        self._pos = 0
+        self._eof = False
+        self._items = []
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._parser = self._root()
+        next(self._parser)
+
+    def feed(self, chunk):
+        """
+        Ajoute un bloc d'octets
+
+        Returns:
+            list: Éléments du tableau complétés par ce bloc
+        """
+        if self._pos:
+            self._text = self._text[self._pos:]
+            self._pos = 0
+        self._text += self._utf8.decode(chunk)
+        return self._resume()
+
+    def close(self):
+        """
+        Termine le flux
+
+        Returns:
+            list: Derniers éléments du tableau
+
+        Raises:
+            ValueError: Document JSON invalide ou incomplet
+        """
+        self._text = self._text[self._pos:] + self._utf8.decode(b'', final=True)
+        self._pos = 0
+        self._eof = True
+        items = self._resume()
+        if self._parser is not None:
+            raise ValueError("Document JSON incomplet")
+        return items
+
+    def _resume(self):
+        if self._parser is not None:
+            try:
+                next(self._parser)
+            except StopIteration:
+                self._parser = None
+        items, self._items = self._items, []
+        return items
+
+    def _error(self, expected):
+        raise ValueError(f"JSON invalide: {expected} attendu (caractère {self._pos})")
+
+    # Les méthodes suivantes sont des générateurs : un `yield` attend le bloc suivant
+
+    def _root(self):
+        char = yield from self._peek()
+        if char != '{':
+            self._error("objet")
+        yield from self._object(self.document, self.path)
+
+    def _peek(self):
+        """Saute les blancs et renvoie le caractère suivant"""
+        while True:
+            text, pos = self._text, self._pos
+            size = len(text)
+            while pos < size and text[pos] in WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < size:
+                return text[pos]
+            if self._eof:
+                raise ValueError("Document JSON incomplet")
+            yield
+
+    def _expect(self, expected):
+        char = yield from self._peek()
+        if char != expected:
+            self._error(f"'{expected}'")
+        self._pos += 1
+
+    def _value(self):
+        """Décode une valeur complète (attend les blocs nécessaires)"""
+        wanted = 0
+        while True:
+            text, pos = self._text, self._pos
+            available = len(text) - pos
+            if available >= wanted or self._eof:
+                try:
+                    value, end = _decoder.raw_decode(text, pos)
+                except json.JSONDecodeError:
+                    if self._eof:
+                        raise
+                    # Nouvel essai quand le texte disponible a doublé (coût linéaire)
+                    wanted = 2 * available
+                else:
+                    # Un nombre ou un littéral n'est complet que suivi d'un délimiteur
+                    # ("-25" puis ".5" dans le bloc suivant)
+                    if text[pos] in '{["' or self._eof or (end < len(text) and text[end] in DELIMITERS):
+                        self._pos = end
+                        return value
+                    wanted = available + 1
+            yield
+
+    def _object(self, target, path):
+        """Parcourt un objet ; `path` : clés restant à suivre jusqu'au tableau"""
+        self._pos += 1
+        char = yield from self._peek()
+        if char == '}':
+            self._pos += 1
+            return
+        while True:
+            if char != '"':
+                self._error("clé")
+            key = yield from self._value()
+            yield from self._expect(':')
+            char = yield from self._peek()
+            if path and key == path[0] and char == '[' and len(path) == 1:
+                self.found = True
+                yield from self._array()
+            elif path and key == path[0] and char == '{' and len(path) > 1:
+                target[key] = {}
+                yield from self._object(target[key], path[1:])
+            else:
+                target[key] = yield from self._value()
+            char = yield from self._peek()
+            self._pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                self._error("',' ou '}'")
+            char = yield from self._peek()
+
+    def _array(self):
+        """Parcourt le tableau suivi, élément par élément"""
+        self._pos += 1
+        char = yield from self._peek()
+        if char == ']':
+            self._pos += 1
+            return
+        while True:
+            item = yield from self._value()
+            self._items.append(item)
+            self.count += 1
+            char = yield from self._peek()
+            self._pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                self._error("',' ou ']'")
+            yield from self._peek()
+
+
+class StreamedJSON:
+    """
+    Corps de réponse lu en flux (requests ou httpx)
+
+    Itérer (for / async for) rend les éléments du tableau `path` ; une fois le
+    parcours terminé, `document` contient le reste de la réponse et la
+    connexion est rendue au pool.
+    """
+
+    def __init__(self, response, path, chunk_size=65536):
+        self.response = response
+        self.chunk_size = chunk_size
+        self.size = 0
+        self._parser = JSONArrayStream(path)
+
+    @property
+    def document(self):
+        return self._parser.document
+
+    @property
+    def found(self):
+        """True si le tableau suivi était présent dans la réponse"""
+        return self._parser.found
+
+    @property
+    def count(self):
+        return self._parser.count
+
+    def __iter__(self):
+        try:
+            for chunk in self.response.iter_content(self.chunk_size):
+                self.size += len(chunk)
+                yield from self._parser.feed(chunk)
+            yield from self._parser.close()
+        finally:
+            self.response.close()
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self.response.aiter_bytes(self.chunk_size):
+                self.size += len(chunk)
+                for item in self._parser.feed(chunk):
+                    yield item
+            for item in self._parser.close():
+                yield item
+        finally:
+            await self.response.aclose()
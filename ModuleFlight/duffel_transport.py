@@ -0,0 +1,151 @@
+"""
+Transport HTTP pour l'API Duffel
+Session requests mutualisée par processus (pool de connexions keep-alive)
+"""
+
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .duffel_metrics import duffel_metrics, endpoint_key
+
+
+# Nombre de connexions TCP ouvertes par le thread courant (renseigné par les pools)
+_connection_state = threading.local()
+
+
+def _count_new_connection():
+    _connection_state.opened = getattr(_connection_state, 'opened', 0) + 1
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    """Pool HTTP qui signale chaque nouvelle connexion"""
+
+    def _new_conn(self):
+        _count_new_connection()
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    """Pool HTTPS qui signale chaque nouvelle connexion (et donc chaque handshake TLS)"""
+
+    def _new_conn(self):
+        _count_new_connection()
+        return super()._new_conn()
+
+
+class DuffelHTTPAdapter(HTTPAdapter):
+    """Adaptateur requests utilisant les pools instrumentés"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+class DuffelTransport:
+    """
+    Couche de transport HTTP vers Duffel
+
+    Une seule session (et donc un seul pool de connexions) par processus :
+    la session est recréée après un fork (workers gunicorn/daphne).
+    """
+
+    def __init__(self, base_url, headers, config=None, metrics=None):
+        config = config or {}
+        self.base_url = base_url
+        self.headers = dict(headers)
+        self.pool_connections = config.get('POOL_CONNECTIONS', 4)
+        self.pool_maxsize = config.get('POOL_MAXSIZE', 20)
+        self.pool_block = config.get('POOL_BLOCK', False)
+        self.keep_alive = config.get('KEEP_ALIVE', True)
+        self.metrics = metrics or duffel_metrics
+
+        if not self.keep_alive:
+            self.headers['Connection'] = 'close'
+
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+
+    def _build_session(self):
+        """Crée une session requests avec un pool dimensionné selon la configuration"""
+        session = requests.Session()
+        adapter = DuffelHTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=0
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(self.headers)
+        return session
+
+    @property
+    def session(self):
+        """Session du processus courant (recréée après fork)"""
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    self._session = self._build_session()
+                    self._pid = pid
+        return self._session
+
+    def request(self, method, endpoint, **kwargs):
+        """
+        Envoie une requête via la session mutualisée
+
+        Args:
+            method (str): Méthode HTTP
+            endpoint (str): Endpoint relatif à base_url
+            **kwargs: Arguments transmis à requests (json, params, timeout...)
+
+        Returns:
+            requests.Response: Réponse HTTP brute
+        """
+        url = f"{self.base_url}/{endpoint}"
+        key = endpoint_key(endpoint)
+
+        _connection_state.opened = 0
+        started = time.perf_counter()
+        try:
+            return self.session.request(method=method, url=url, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            opened = _connection_state.opened
+            self.metrics.incr(key, 'requests')
+            if opened:
+                self.metrics.incr(key, 'connections_opened', opened)
+            else:
+                self.metrics.incr(key, 'connections_reused')
+            self.metrics.observe(key, 'latency', elapsed)
+
+    def stats(self):
+        """
+        Statistiques de réutilisation des connexions par endpoint
+
+        Returns:
+            dict: Métriques par endpoint, avec le taux de réutilisation
+        """
+        snapshot = self.metrics.snapshot()
+        for entry in snapshot.values():
+            total = entry.get('requests', 0)
+            if total:
+                entry['reuse_ratio'] = round(entry.get('connections_reused', 0) / total, 3)
+        return snapshot
+
+    def close(self):
+        """Ferme les connexions du pool"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._pid = None
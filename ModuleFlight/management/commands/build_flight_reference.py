@@ -0,0 +1,48 @@
+"""
+Construit le référentiel binaire des aéroports, compagnies et appareils
+Lu par tous les workers via ModuleFlight.reference_store (fichier projeté en mémoire)
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ModuleFlight.duffel_service import duffel_service, DuffelAPIError
+from ModuleFlight.reference_store import (
+    TABLES, load_from_duffel, load_snapshot, reference_store, write_reference_file
+)
+
+
+class Command(BaseCommand):
+    help = "Construit le référentiel (aéroports, compagnies, appareils) depuis Duffel ou l'instantané livré"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            choices=['duffel', 'snapshot'],
+            default=settings.FLIGHT_CONFIG.get('REFERENCE_STORE_SOURCE', 'duffel'),
+            help="duffel: listes air/airports, air/airlines et air/aircraft, complétées par "
+                 "l'instantané ; snapshot: fichiers de ModuleFlight/data seuls"
+        )
+        parser.add_argument('--output', default=None, help="Fichier à écrire (REFERENCE_STORE_PATH par défaut)")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        output = options['output'] or reference_store.path
+
+        tables = load_snapshot()
+        if options['source'] == 'duffel':
+            try:
+                fetched = load_from_duffel(duffel_service)
+            except DuffelAPIError as e:
+                raise CommandError(f"Listes Duffel indisponibles, référentiel inchangé: {str(e)}")
+            # Les données Duffel priment ; l'instantané couvre les codes absents
+            for name in TABLES:
+                tables[name].update(fetched[name])
+
+        counts = write_reference_file(output, tables)
+        summary = ', '.join(f"{name}={count}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Référentiel écrit: {output} ({summary}) en {time.monotonic() - started:.1f} s"
+        ))
@@ -0,0 +1,325 @@
+"""
+Référentiel partagé des aéroports, compagnies et appareils
+Fichier binaire en lecture seule projeté en mémoire (mmap) : les workers d'une même
+machine lisent les mêmes pages, sans copie des tables par processus
+"""
+
+import csv
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+Airport = namedtuple('Airport', 'iata_code name city_name iata_country_code latitude longitude time_zone')
+Airline = namedtuple('Airline', 'iata_code name logo_symbol_url logo_lockup_url')
+Aircraft = namedtuple('Aircraft', 'iata_code name')
+
+# Tables du fichier, dans l'ordre d'écriture
+TABLES = {
+    'airports': Airport,
+    'airlines': Airline,
+    'aircraft': Aircraft,
+}
+
+# Format : en-tête, répertoire des tables, puis pour chaque table les codes triés
+# (uint32), les (position, longueur) des enregistrements (uint32) et les
+# enregistrements eux-mêmes (champs UTF-8 séparés par SEPARATOR)
+MAGIC = b'YXREF\x00\x00\x01'
+HEADER = struct.Struct('<8sBxHQ')  # magic, ordre des octets (1 = little-endian), nombre de tables, date de construction
+TABLE = struct.Struct('<16sIQQQ')  # nom, nombre d'enregistrements, positions des codes, des étendues et des données
+SEPARATOR = '\x1f'
+NATIVE_ORDER = 1 if sys.byteorder == 'little' else 0
+
+
+def code_key(code):
+    """Clé entière d'un code IATA (jusqu'à 4 caractères ASCII), ou None"""
+    if not code or len(code) > 4 or not code.isascii():
+        return None
+    return int.from_bytes(code.upper().encode('ascii').ljust(4, b'\x00'), 'little')
+
+
+def _coordinate(value):
+    return float(value) if value not in (None, '') else None
+
+
+def _decode(record_type, code, fields):
+    if record_type is Airport:
+        name, city_name, country, latitude, longitude, time_zone = fields
+        return Airport(code, name, city_name, country, _coordinate(latitude), _coordinate(longitude), time_zone)
+    return record_type(code, *fields)
+
+
+def write_reference_file(path, tables, built_at=None):
+    """
+    Écrit le fichier du référentiel
+
+    Le fichier est écrit à côté puis renommé (remplacement atomique) : les workers
+    gardent l'ancienne projection jusqu'à leur prochaine vérification.
+
+    Args:
+        path (str): Fichier à écrire
+        tables (dict): {'airports': {code: Airport}, 'airlines': {...}, 'aircraft': {...}}
+        built_at (int, optional): Date de construction (timestamp), maintenant par défaut
+
+    Returns:
+        dict: Nombre d'enregistrements par table
+    """
+    counts = {}
+    directory = []
+    sections = []
+    offset = HEADER.size + TABLE.size * len(TABLES)
+    for name, record_type in TABLES.items():
+        records = sorted(
+            (code_key(code), record)
+            for code, record in (tables.get(name) or {}).items()
+            if code_key(code) is not None
+        )
+        codes = array('I', (key for key, _ in records))
+        spans = array('I')
+        data = bytearray()
+        for _, record in records:
+            encoded = SEPARATOR.join('' if value is None else str(value).replace(SEPARATOR, ' ')
+                                     for value in record[1:]).encode('utf-8')
+            spans.extend((len(data), len(encoded)))
+            data += encoded
+        data += b'\x00' * (-len(data) % 4)  # Tables suivantes alignées sur 4 octets
+
+        codes_offset = offset
+        spans_offset = codes_offset + len(codes) * codes.itemsize
+        data_offset = spans_offset + len(spans) * spans.itemsize
+        offset = data_offset + len(data)
+        directory.append(TABLE.pack(name.encode('ascii'), len(records), codes_offset, spans_offset, data_offset))
+        sections += [codes.tobytes(), spans.tobytes(), bytes(data)]
+        counts[name] = len(records)
+
+    directory_path = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory_path, exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, NATIVE_ORDER, len(TABLES), int(built_at or time.time())))
+        for entry in directory:
+            f.write(entry)
+        for section in sections:
+            f.write(section)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+    return counts
+
+
+class _Table:
+    """Table projetée : recherche dichotomique sur la colonne des codes, sans copie"""
+
+    def __init__(self, buffer, record_type, count, codes_offset, spans_offset, data_offset):
+        self.record_type = record_type
+        self.count = count
+        self.codes = buffer[codes_offset:codes_offset + 4 * count].cast('I')
+        self.spans = buffer[spans_offset:spans_offset + 8 * count].cast('I')
+        self.data = buffer[data_offset:]
+
+    def get(self, code):
+        key = code_key(code)
+        if key is None:
+            return None
+        position = bisect_left(self.codes, key)
+        if position == self.count or self.codes[position] != key:
+            return None
+        start = self.spans[2 * position]
+        length = self.spans[2 * position + 1]
+        fields = str(self.data[start:start + length], 'utf-8').split(SEPARATOR)
+        return _decode(self.record_type, code.upper(), fields)
+
+
+class _Mapping:
+    """Projection d'une version du fichier (remplacée en bloc au rechargement)"""
+
+    def __init__(self, path, signature):
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self.mmap)
+        magic, order, table_count, self.built_at = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Fichier de référentiel invalide")
+        if order != NATIVE_ORDER:
+            raise ValueError("Fichier de référentiel construit sur une machine d'un autre boutisme")
+        self.signature = signature
+        # Enregistrements décodés de cette version (codes les plus lus)
+        self.records = {}
+        self.tables = {}
+        for index in range(table_count):
+            raw_name, count, codes_offset, spans_offset, data_offset = TABLE.unpack_from(
+                buffer, HEADER.size + index * TABLE.size
+            )
+            name = raw_name.rstrip(b'\x00').decode('ascii')
+            if name in TABLES:
+                self.tables[name] = _Table(buffer, TABLES[name], count, codes_offset, spans_offset, data_offset)
+
+
+class ReferenceStore:
+    """
+    Lecture du référentiel (aéroports, compagnies, appareils) par code IATA
+
+    Le fichier est projeté en lecture seule : le système garde une seule copie en
+    mémoire pour tous les processus. Son remplacement (commande
+    build_flight_reference, tâche Celery) est vu à la vérification suivante, au
+    plus tous les REFERENCE_STORE_CHECK_INTERVAL secondes. Sans fichier, les
+    recherches renvoient None et les offres gardent les données Duffel.
+    """
+
+    def __init__(self, path=None, check_interval=None, cache_size=None):
+        config = getattr(settings, 'FLIGHT_CONFIG', {})
+        self.path = str(path or config.get('REFERENCE_STORE_PATH') or os.path.join(settings.BASE_DIR, 'data', 'flight_reference.bin'))
+        self.check_interval = config.get('REFERENCE_STORE_CHECK_INTERVAL', 60) if check_interval is None else check_interval
+        # Enregistrements décodés gardés par processus
+        self.cache_size = config.get('REFERENCE_STORE_CACHE_SIZE', 4096) if cache_size is None else cache_size
+        self._lock = threading.Lock()
+        self._mapping = None
+        self._checked_at = None
+        self._missing_logged = False
+
+    def airport(self, code):
+        """Airport du code IATA, ou None"""
+        return self._get('airports', code)
+
+    def airline(self, code):
+        """Airline du code IATA, ou None"""
+        return self._get('airlines', code)
+
+    def aircraft(self, code):
+        """Aircraft du code IATA, ou None"""
+        return self._get('aircraft', code)
+
+    def info(self):
+        """État du référentiel chargé (statistiques)"""
+        mapping = self._current()
+        if mapping is None:
+            return {'path': self.path, 'loaded': False}
+        return {
+            'path': self.path,
+            'loaded': True,
+            'built_at': mapping.built_at,
+            'size': len(mapping.mmap),
+            'tables': {name: table.count for name, table in mapping.tables.items()},
+        }
+
+    def _get(self, table_name, code):
+        if not code:
+            return None
+        mapping = self._current()
+        if mapping is None:
+            return None
+        key = (table_name, code)
+        records = mapping.records
+        try:
+            return records[key]
+        except KeyError:
+            pass
+        table = mapping.tables.get(table_name)
+        record = table.get(code) if table is not None else None
+        if len(records) >= self.cache_size:
+            records.clear()
+        records[key] = record
+        return record
+
+    def _current(self):
+        """Projection courante, rechargée si le fichier a été remplacé"""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._mapping
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self._mapping
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                if not self._missing_logged:
+                    logger.warning(f"Référentiel absent ({self.path}) : lancez manage.py build_flight_reference")
+                    self._missing_logged = True
+                return self._mapping
+            signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if self._mapping is None or self._mapping.signature != signature:
+                try:
+                    mapping = _Mapping(self.path, signature)
+                except (OSError, ValueError, struct.error) as e:
+                    logger.error(f"Lecture du référentiel impossible ({self.path}): {str(e)}")
+                    return self._mapping
+                # L'ancienne projection est libérée quand plus aucun lecteur ne la tient
+                self._mapping = mapping
+                self._missing_logged = False
+                logger.info(f"Référentiel chargé: {self.path} "
+                            f"({', '.join(f'{name}={table.count}' for name, table in mapping.tables.items())})")
+            return self._mapping
+
+
+def load_snapshot(data_dir=DATA_DIR):
+    """
+    Référentiel livré avec le module (ModuleFlight/data)
+
+    Returns:
+        dict: Tables {'airports': {code: Airport}, 'airlines': {...}, 'aircraft': {...}}
+    """
+    def rows(filename):
+        with open(os.path.join(data_dir, filename), encoding='utf-8', newline='') as f:
+            return list(csv.DictReader(f))
+
+    return {
+        'airports': {
+            row['code']: Airport(row['code'], row['name'], row['city'], row['country'],
+                                 _coordinate(row['latitude']), _coordinate(row['longitude']), row['time_zone'])
+            for row in rows('airports.csv')
+        },
+        'airlines': {
+            row['code']: Airline(row['code'], row['name'], row['logo_symbol_url'], row['logo_lockup_url'])
+            for row in rows('airlines.csv')
+        },
+        'aircraft': {
+            row['code']: Aircraft(row['code'], row['name'])
+            for row in rows('aircraft.csv')
+        },
+    }
+
+
+def load_from_duffel(service):
+    """
+    Référentiel lu sur les listes Duffel (air/airports, air/airlines, air/aircraft)
+
+    Args:
+        service (DuffelService): Service utilisé pour les appels
+
+    Returns:
+        dict: Tables (mêmes clés que load_snapshot) ; les entrées sans code IATA sont ignorées
+    """
+    tables = {name: {} for name in TABLES}
+    for item in service.list_reference_data('airports'):
+        code = item.get('iata_code')
+        if code:
+            tables['airports'][code] = Airport(
+                code, item.get('name'), item.get('city_name'), item.get('iata_country_code'),
+                item.get('latitude'), item.get('longitude'), item.get('time_zone')
+            )
+    for item in service.list_reference_data('airlines'):
+        code = item.get('iata_code')
+        if code:
+            tables['airlines'][code] = Airline(code, item.get('name'), item.get('logo_symbol_url'), item.get('logo_lockup_url'))
+    for item in service.list_reference_data('aircraft'):
+        code = item.get('iata_code')
+        if code:
+            tables['aircraft'][code] = Aircraft(code, item.get('name'))
+    return tables
+
+
+# Instance globale (fichier projeté au premier appel)
+reference_store = ReferenceStore()
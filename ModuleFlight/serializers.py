@@ -1,5 +1,8 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import TravelAgency, MerchantAgency, FlightBooking
+from .duffel_offers import FormattedOffer
+from .airport_index import airport_index
 from ModuleProfils.models import ClientProfile, MerchantProfile
 
 
@@ -168,23 +171,89 @@ class FlightBookingCreateSerializer(serializers.Serializer):
         return value
 
 
-class FlightSearchSerializer(serializers.Serializer):
-    """Serializer pour la recherche de vols"""
+def validate_airport_code(value):
+    """
+    Code IATA d'aéroport ou de ville multi-aéroports (ex: PAR), en majuscules
+    
+    Contrôlé contre l'index local des aéroports si FLIGHT_CONFIG['VALIDATE_AIRPORT_CODES']
+    """
+    code = value.strip().upper()
+    if settings.FLIGHT_CONFIG.get('VALIDATE_AIRPORT_CODES', True) and airport_index.get(code) is None:
+        raise serializers.ValidationError(f"Aéroport ou ville inconnu(e): {code}")
+    return code
+
+
+class FlightLegSerializer(serializers.Serializer):
+    """Serializer pour un trajet d'une recherche multi-destinations"""
     
     origin = serializers.CharField(max_length=10, help_text="Code IATA de l'aéroport de départ")
     destination = serializers.CharField(max_length=10, help_text="Code IATA de l'aéroport d'arrivée")
     departure_date = serializers.DateField(help_text="Date de départ (YYYY-MM-DD)")
+    
+    def validate_origin(self, value):
+        return validate_airport_code(value)
+    
+    def validate_destination(self, value):
+        return validate_airport_code(value)
+    
+    def validate(self, data):
+        if data['origin'] == data['destination']:
+            raise serializers.ValidationError("L'origine et la destination d'un trajet doivent être différentes")
+        return data
+
+
+class FlightSearchSerializer(serializers.Serializer):
+    """Serializer pour la recherche de vols"""
+    
+    origin = serializers.CharField(max_length=10, required=False, help_text="Code IATA de l'aéroport de départ")
+    destination = serializers.CharField(max_length=10, required=False, help_text="Code IATA de l'aéroport d'arrivée")
+    departure_date = serializers.DateField(required=False, help_text="Date de départ (YYYY-MM-DD)")
     return_date = serializers.DateField(required=False, help_text="Date de retour (optionnel)")
     passengers = serializers.IntegerField(min_value=1, max_value=9, default=1)
     cabin_class = serializers.ChoiceField(
         choices=['economy', 'premium_economy', 'business', 'first'],
         default='economy'
     )
+    flex_days = serializers.IntegerField(
+        min_value=0,
+        max_value=settings.FLIGHT_CONFIG.get('MAX_FLEX_DAYS', 3),
+        default=0,
+        help_text="Dates flexibles: recherche aussi ±N jours autour des dates"
+    )
+    response_format = serializers.ChoiceField(
+        choices=['full', 'normalized', 'raw'],
+        default='full',
+        help_text="normalized: aéroports, compagnies et appareils partagés, référencés par code ; "
+                  "raw: réponse Duffel relayée telle quelle"
+    )
+    fields = serializers.CharField(
+        required=False,
+        help_text="Champs d'offre à renvoyer, séparés par des virgules (ex: id,total_amount,slices)"
+    )
+    legs = FlightLegSerializer(
+        many=True,
+        required=False,
+        min_length=2,
+        max_length=settings.FLIGHT_CONFIG.get('MULTI_CITY_MAX_LEGS', 6),
+        help_text="Multi-destinations: trajets {origin, destination, departure_date} dans l'ordre du voyage"
+    )
+    bare = serializers.BooleanField(
+        default=False,
+        help_text="Format raw: corps Duffel seul, sans l'enveloppe {success, data}"
+    )
     
     def validate(self, data):
         """Validation des données de recherche"""
         from datetime import date
         
+        legs = data.get('legs')
+        if legs:
+            self._validate_legs(data, legs)
+        else:
+            missing = [name for name in ('origin', 'destination', 'departure_date') if not data.get(name)]
+            if missing:
+                raise serializers.ValidationError({name: ["Ce champ est obligatoire."] for name in missing})
+        
         departure_date = data.get('departure_date')
         return_date = data.get('return_date')
         
@@ -196,15 +265,109 @@ class FlightSearchSerializer(serializers.Serializer):
         if return_date and return_date <= departure_date:
             raise serializers.ValidationError("La date de retour doit être après la date de départ")
         
+        # Le format raw relaie une seule réponse Duffel, sans retouche
+        if data.get('response_format') == 'raw' and (data.get('flex_days') or data.get('fields')):
+            raise serializers.ValidationError("Le format raw ne prend en charge ni flex_days ni fields")
+        
         return data
     
+    def _validate_legs(self, data, legs):
+        """
+        Multi-destinations : dates dans l'ordre du voyage, ni retour ni dates flexibles
+        
+        origin, destination et departure_date reprennent le premier départ et la dernière
+        arrivée (paramètres affichés, cache).
+        """
+        if data.get('return_date') or data.get('flex_days'):
+            raise serializers.ValidationError("Une recherche multi-destinations n'accepte ni return_date ni flex_days")
+        for previous, leg in zip(legs, legs[1:]):
+            if leg['departure_date'] < previous['departure_date']:
+                raise serializers.ValidationError("Les trajets doivent être donnés dans l'ordre chronologique")
+        data['origin'] = legs[0]['origin']
+        data['destination'] = legs[-1]['destination']
+        data['departure_date'] = legs[0]['departure_date']
+    
     def validate_origin(self, value):
-        """Valide le code IATA d'origine"""
-        return value.upper()
+        """Valide le code IATA d'origine (aéroport ou ville)"""
+        return validate_airport_code(value)
     
     def validate_destination(self, value):
-        """Valide le code IATA de destination"""
-        return value.upper()
+        """Valide le code IATA de destination (aéroport ou ville)"""
+        return validate_airport_code(value)
+    
+    def validate_fields(self, value):
+        """Liste de champs d'offre connus, 'id' toujours inclus, dans l'ordre du format complet"""
+        requested = {field.strip() for field in value.split(',') if field.strip()}
+        unknown = requested - set(FormattedOffer.KEYS)
+        if unknown:
+            raise serializers.ValidationError(f"Champs inconnus: {', '.join(sorted(unknown))}")
+        requested.add('id')
+        return [field for field in FormattedOffer.KEYS if field in requested]
+
+
+class AirportSearchQuerySerializer(serializers.Serializer):
+    """Serializer pour l'autocomplétion des aéroports et villes"""
+    
+    q = serializers.CharField(max_length=64, trim_whitespace=True, help_text="Saisie partielle: code IATA, ville ou nom d'aéroport")
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.FLIGHT_CONFIG.get('AIRPORT_SUGGESTIONS_MAX', 20),
+        default=settings.FLIGHT_CONFIG.get('AIRPORT_SUGGESTIONS', 8)
+    )
+
+
+class SearchResultsQuerySerializer(serializers.Serializer):
+    """Serializer pour les filtres, tris et pages sur les résultats d'une recherche"""
+    
+    sort = serializers.ChoiceField(
+        choices=['best', 'price', 'duration', 'stops', 'emissions', 'departure'],
+        default=settings.FLIGHT_CONFIG.get('RESULTS_DEFAULT_SORT', 'best')
+    )
+    order = serializers.ChoiceField(choices=['asc', 'desc'], default='asc')
+    carriers = serializers.CharField(required=False, help_text="Codes IATA des compagnies, séparés par des virgules")
+    stops = serializers.CharField(required=False, help_text="Nombres d'escales acceptés, séparés par des virgules (ex: 0,1)")
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    max_duration = serializers.IntegerField(min_value=0, required=False, help_text="Durée totale maximale en minutes")
+    max_emissions = serializers.IntegerField(min_value=0, required=False, help_text="Émissions maximales en kg de CO2")
+    depart_after = serializers.TimeField(required=False, help_text="Premier départ au plus tôt (HH:MM)")
+    depart_before = serializers.TimeField(required=False, help_text="Premier départ au plus tard (HH:MM)")
+    offset = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=500,
+        default=settings.FLIGHT_CONFIG.get('RESULTS_PAGE_SIZE', 50)
+    )
+    
+    def validate_carriers(self, value):
+        """Liste de codes compagnie en majuscules"""
+        return [code.strip().upper() for code in value.split(',') if code.strip()]
+    
+    def validate_stops(self, value):
+        """Liste de nombres d'escales"""
+        try:
+            return [int(stop) for stop in value.split(',') if stop.strip()]
+        except ValueError:
+            raise serializers.ValidationError("Nombres d'escales invalides")
+    
+    def to_query(self):
+        """Paramètres de ResultsIndex.query (heures en minutes depuis minuit)"""
+        data = self.validated_data
+        query = {
+            'sort': data['sort'],
+            'descending': data['order'] == 'desc',
+            'offset': data['offset'],
+            'limit': data['limit'],
+            'carriers': data.get('carriers'),
+            'stops': data.get('stops'),
+            'max_duration': data.get('max_duration'),
+            'max_emissions': data.get('max_emissions'),
+        }
+        if data.get('max_price') is not None:
+            query['max_price'] = float(data['max_price'])
+        for name in ('depart_after', 'depart_before'):
+            if data.get(name) is not None:
+                query[name] = data[name].hour * 60 + data[name].minute
+        return query
 
 
 class FlightOfferSerializer(serializers.Serializer):
@@ -0,0 +1,25 @@
+"""
+Tâches Celery du module Flight
+"""
+
+import logging
+
+from celery import shared_task
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def refresh_reference_store(source=None):
+    """
+    Reconstruit le référentiel des aéroports, compagnies et appareils (CELERY_BEAT_SCHEDULE)
+
+    En cas d'échec, le fichier en place reste servi aux workers.
+    """
+    options = {'source': source} if source else {}
+    try:
+        call_command('build_flight_reference', **options)
+    except CommandError as e:
+        logger.error(f"Rafraîchissement du référentiel impossible: {str(e)}")
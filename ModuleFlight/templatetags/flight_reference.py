@@ -0,0 +1,16 @@
+"""
+Filtres de gabarit : noms lus dans le référentiel partagé à partir des codes IATA
+"""
+
+from django import template
+
+from ModuleFlight.reference_store import reference_store
+
+register = template.Library()
+
+
+@register.filter
+def airport_name(code):
+    """Nom de l'aéroport, ou le code s'il est inconnu"""
+    airport = reference_store.airport(code)
+    return airport.name if airport and airport.name else (code or '')
@@ -1,3 +1,784 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ModuleProfils.models import MerchantProfile
+
+from .airport_index import AirportIndex, fold
+from .api_views import FlightBookingViewSet
+from .duffel_cache import SearchCache, parse_expires_at
+from .duffel_circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from .duffel_coalesce import SingleFlight
+from .duffel_async import AsyncDuffelService
+from .duffel_deadline import deadline, remaining
+from .duffel_offers import format_offer
+from .duffel_priority import ORDER, OFFER, SEARCH, PriorityScheduler, priority_class
+from .duffel_ratelimit import RateLimiter
+from .duffel_retry import RetryPolicy, parse_retry_after
+from .duffel_results import ResultsIndex, ResultsStore
+from .duffel_stream import JSONArrayStream, StreamedJSON
+from .duffel_service import DuffelService, duffel_service, DuffelDeadlineError, DuffelUnavailableError
+from .models import FlightBooking, FlightUserManager, TravelAgency
+from .serializers import FlightSearchSerializer
+from .views import ClientProfile, FlightView, stream_search_events
+
+
+class BookingDeadlineTests(TestCase):
+    """Réservation quand le budget de la requête est épuisé avant l'appel Duffel"""
+
+    def setUp(self):
+        payload = {
+            'offer_id': 'off_deadline_test',
+            'total_amount': '120.00',
+            'total_currency': 'EUR',
+            'passengers': [{
+                'type': 'adult', 'title': 'mr', 'given_name': 'Jean', 'family_name': 'Kabila',
+                'gender': 'm', 'date_of_birth': '1990-01-01', 'nationality': 'CD',
+            }],
+        }
+        self.request = RequestFactory().post('/flights/book/', data=json.dumps(payload),
+                                             content_type='application/json')
+        self.request.user = AnonymousUser()
+
+    def test_expired_deadline_returns_504_without_booking(self):
+        merchants = mock.Mock()
+        merchants.filter.return_value.first.return_value = mock.Mock()
+        with mock.patch.object(TravelAgency, 'get_default_agency', return_value=mock.Mock()), \
+                mock.patch.object(ClientProfile.objects, 'get', return_value=mock.Mock()), \
+                mock.patch.object(MerchantProfile, 'objects', merchants), \
+                deadline(0.0):
+            response = FlightView().ajax_create_booking(self.request)
+
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(json.loads(response.content)['resultat'], 'FAIL')
+        self.assertFalse(FlightBooking.objects.exists())
+
+    def test_api_expired_deadline_returns_504_without_booking(self):
+        agency = TravelAgency.objects.create(name='Agence test', country='CD', city='Kinshasa')
+        request = APIRequestFactory().post('/flights/api/bookings/', {
+            'duffel_offer_id': 'off_deadline_api_test',
+            'agency_uuid': str(agency.uuid),
+        }, format='json')
+        force_authenticate(request, user=mock.Mock(is_authenticated=True))
+        merchants = mock.Mock()
+        merchants.exists.return_value = True
+        with mock.patch.object(FlightUserManager, 'user_is_client', return_value=True), \
+                mock.patch.object(TravelAgency, 'get_responsible_merchants', return_value=merchants), \
+                deadline(0.0):
+            response = FlightBookingViewSet.as_view({'post': 'create'})(request)
+
+        self.assertEqual(response.status_code, 504)
+        self.assertFalse(response.data['success'])
+        self.assertFalse(FlightBooking.objects.exists())
+
+
+class DuffelErrorTypeTests(TestCase):
+    """Les erreurs Duffel (budget, disjoncteur) gardent leur type jusqu'aux vues"""
+
+    def test_offer_and_booking_calls_keep_error_type(self):
+        calls = (
+            lambda: duffel_service.get_offer('off_error_type_test', use_cache=False),
+            lambda: duffel_service.create_booking('off_error_type_test', [], {}),
+            lambda: duffel_service.confirm_booking('ord_error_type_test'),
+            lambda: duffel_service.cancel_booking('ord_error_type_test'),
+            lambda: duffel_service.get_booking_details('ord_error_type_test'),
+        )
+        for error in (DuffelDeadlineError('budget'), DuffelUnavailableError('disjoncteur')):
+            with mock.patch.object(duffel_service, '_make_request', side_effect=error):
+                for call in calls:
+                    with self.assertRaises(type(error)):
+                        call()
+
+
+class SharedLimitsTests(TestCase):
+    """Services synchrone et asynchrone d'un processus : un seul budget, un seul disjoncteur"""
+
+    CONFIG = {
+        'RATE_LIMIT_PER_MINUTE': 1,
+        'RATE_LIMIT_BURST': 2,
+        'RATE_LIMIT_MAX_WAIT': 0,
+        'CIRCUIT_MIN_CALLS': 2,
+        'CIRCUIT_OPEN_SECONDS': 60,
+    }
+
+    def setUp(self):
+        self.sync_service = DuffelService(base_url='http://127.0.0.1:9', config=self.CONFIG)
+        self.async_service = AsyncDuffelService(base_url='http://127.0.0.1:9', config=self.CONFIG,
+                                                sync_service=self.sync_service)
+
+    def test_rate_budget_is_shared(self):
+        self.assertTrue(self.sync_service.rate_limiter.acquire('offer_requests', max_wait=0))
+        self.assertTrue(self.sync_service.rate_limiter.acquire('offer_requests', max_wait=0))
+
+        granted = asyncio.run(self.async_service.rate_limiter.aacquire('offer_requests', max_wait=0))
+
+        self.assertFalse(granted)
+
+    def test_open_circuit_is_seen_by_both_services(self):
+        for _ in range(2):
+            self.sync_service.circuit.record(False, 0.1)
+
+        self.assertFalse(self.async_service.circuit.allow())
+        self.assertIs(self.async_service.scheduler, self.sync_service.scheduler)
+
+
+class ResultsLimitTests(TestCase):
+    """SEARCH_RESULTS_LIMIT plafonne les offres gardées, RESULTS_PAGE_SIZE découpe les pages"""
+
+    @override_settings(FLIGHT_CONFIG={'SEARCH_RESULTS_LIMIT': 120, 'RESULTS_PAGE_SIZE': 20})
+    def test_cap_and_page_size_are_separate_settings(self):
+        self.assertEqual(DuffelService(base_url='http://127.0.0.1:9').results_limit, 120)
+        self.assertEqual(ResultsStore().page_size, 20)
+
+
+class MalformedOfferTests(TestCase):
+    """Offres Duffel mal formées : écartées sans faire échouer la recherche"""
+
+    def make_offer(self, offer_id, slices):
+        return {
+            'id': offer_id,
+            'total_amount': '120.00',
+            'total_currency': 'EUR',
+            'owner': {'iata_code': 'AF', 'name': 'Air France'},
+            'slices': slices,
+        }
+
+    def make_slice(self):
+        return {
+            'id': 'sli_0',
+            'segments': [{
+                'id': 'seg_0',
+                'origin': {'iata_code': 'FIH'},
+                'destination': {'iata_code': 'CDG'},
+                'departing_at': '2030-01-10T08:00:00',
+                'arriving_at': '2030-01-10T16:00:00',
+            }],
+        }
+
+    def test_null_slices_and_segments_are_skipped(self):
+        offer = self.make_offer('off_partial', [None, {'segments': [None]}, self.make_slice()])
+
+        formatted = format_offer(offer)
+
+        self.assertEqual(len(formatted['slices']), 1)
+        self.assertEqual(formatted['slices'][0]['destination']['iata_code'], 'CDG')
+
+    def test_malformed_offers_are_dropped(self):
+        offers = [
+            self.make_offer('off_null_slice', [None]),
+            dict(self.make_offer('off_bad_owner', [self.make_slice()]), owner='AF'),
+            self.make_offer('off_valid', [self.make_slice()]),
+        ]
+
+        formatted = [duffel_service.format_offer_for_frontend(offer) for offer in offers]
+
+        self.assertIsNone(formatted[0])
+        self.assertIsNone(formatted[1])
+        self.assertEqual(formatted[2]['id'], 'off_valid')
+
+    def test_index_rebuilt_by_another_worker_matches_first_page(self):
+        offers = [
+            dict(self.make_offer('off_rebuild_a', [self.make_slice()]), total_amount='300.00'),
+            self.make_offer('off_rebuild_bad', [None]),
+            dict(self.make_offer('off_rebuild_b', [self.make_slice()]), total_amount='100.00'),
+            dict(self.make_offer('off_rebuild_c', [self.make_slice()]), total_amount='200.00'),
+        ]
+        results = {'offer_request': {'id': 'orq_rebuild_test'}, 'offers': offers}
+        formatted = [offer for offer in map(duffel_service.format_offer_for_frontend, offers) if offer]
+        search_id, first_page = ResultsStore().first_page(results, formatted)
+
+        # Autre worker : index reconstruit depuis le cache
+        rebuilt_page = ResultsStore().page(search_id, 1)
+
+        self.assertEqual([offer['id'] for offer in rebuilt_page['offers']],
+                         [offer['id'] for offer in first_page['offers']])
+        self.assertEqual(rebuilt_page['total_offers'], 3)
+
+
+class SearchCacheTests(TestCase):
+    """Clés de cache des recherches et durée de conservation bornée par les offres"""
+
+    PARAMS = {'origin': 'FIH', 'destination': 'CDG', 'departure_date': '2030-01-10', 'cabin_class': 'economy'}
+
+    def setUp(self):
+        cache.clear()
+        self.search_cache = SearchCache(duffel_config={'OFFER_CACHE_TTL': 900},
+                                        flight_config={'CACHE_SEARCH_RESULTS': True, 'STALE_RESULTS_TTL': 0})
+
+    def results(self, *expires_in):
+        offers = [
+            {'id': f'off_{n}', 'expires_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() + delay))}
+            for n, delay in enumerate(expires_in)
+        ]
+        return {'offer_request': {'id': 'orq_cache_test'}, 'offers': offers}
+
+    def test_key_ignores_case_whitespace_and_order(self):
+        key = self.search_cache.make_key(**self.PARAMS)
+
+        self.assertEqual(key, self.search_cache.make_key(cabin_class='ECONOMY ', departure_date='2030-01-10',
+                                                         destination='cdg', origin=' fih'))
+        self.assertNotEqual(key, self.search_cache.make_key(**dict(self.PARAMS, destination='ORY')))
+
+    def test_timeout_is_bounded_by_first_offer_expiry(self):
+        self.assertEqual(self.search_cache.set(self.results(3600), **self.PARAMS), 900)
+        self.assertLessEqual(self.search_cache.set(self.results(3600, 120), **self.PARAMS), 120)
+        self.assertIsNotNone(self.search_cache.get(**self.PARAMS))
+
+    def test_expired_offers_are_not_cached(self):
+        self.assertEqual(self.search_cache.set(self.results(-60), **self.PARAMS), 0)
+        self.assertIsNone(self.search_cache.get(**self.PARAMS))
+
+    def test_entry_past_expires_at_is_not_served(self):
+        self.search_cache.set(self.results(120), **self.PARAMS)
+
+        with mock.patch('ModuleFlight.duffel_cache.time.time', return_value=time.time() + 180):
+            self.assertIsNone(self.search_cache.get(**self.PARAMS))
+
+    def test_parse_expires_at(self):
+        self.assertEqual(parse_expires_at('2030-01-10T08:00:00Z'), 1894262400.0)
+        self.assertIsNone(parse_expires_at('demain'))
+        self.assertIsNone(parse_expires_at(None))
+
+
+class FlexibleDatesTests(TestCase):
+    """Dates flexibles : validation de flex_days et dates recherchées"""
+
+    def search(self, **data):
+        departure = date.today() + timedelta(days=30)
+        serializer = FlightSearchSerializer(data={
+            'origin': 'FIH', 'destination': 'CDG', 'departure_date': departure.isoformat(), **data,
+        })
+        serializer.is_valid()
+        return serializer
+
+    def test_flex_days_is_bounded(self):
+        self.assertTrue(self.search(flex_days=3).is_valid())
+        self.assertIn('flex_days', self.search(flex_days=4).errors)
+        self.assertIn('flex_days', self.search(flex_days=-1).errors)
+
+    def test_raw_format_refuses_flex_days(self):
+        self.assertFalse(self.search(flex_days=2, response_format='raw').is_valid())
+
+    def test_date_pairs_keep_stay_length_and_skip_past_dates(self):
+        tomorrow = date.today() + timedelta(days=1)
+
+        pairs = duffel_service._flex_date_pairs(tomorrow, tomorrow + timedelta(days=7), 2)
+
+        self.assertEqual([departure for departure, _ in pairs],
+                         [tomorrow, tomorrow + timedelta(days=1), tomorrow + timedelta(days=2)])
+        self.assertTrue(all(back - departure == timedelta(days=7) for departure, back in pairs))
+
+
+class SingleFlightTests(TestCase):
+    """Appels identiques simultanés : un seul appel amont, résultat ou erreur partagés"""
+
+    def setUp(self):
+        self.flight = SingleFlight('test', config={'COALESCE_TIMEOUT': 5}, metrics=mock.Mock())
+        self.release = threading.Event()
+        self.calls = 0
+
+    def slow_call(self, outcome):
+        def call():
+            self.calls += 1
+            self.release.wait(5)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return call
+
+    def run_threads(self, key, func, count=4):
+        outcomes = []
+
+        def worker():
+            try:
+                outcomes.append(self.flight.do(key, func))
+            except Exception as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        # Laisser les suiveurs rejoindre l'appel en cours avant de le terminer
+        waited_until = time.monotonic() + 5
+        while self.flight.metrics.incr.call_count < count - 1 and time.monotonic() < waited_until:
+            time.sleep(0.01)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        return outcomes
+
+    def test_concurrent_calls_share_one_upstream_call(self):
+        outcomes = self.run_threads('search', self.slow_call({'offers': []}))
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(outcomes, [{'offers': []}] * 4)
+
+    def test_error_is_shared_with_waiting_calls(self):
+        error = ValueError('Duffel')
+
+        outcomes = self.run_threads('search', self.slow_call(error))
+
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(outcome is error for outcome in outcomes))
+
+    def test_async_calls_share_one_upstream_call(self):
+        async def search():
+            self.calls += 1
+            await asyncio.sleep(0.01)
+            return {'offers': []}
+
+        async def run():
+            return await asyncio.gather(*(self.flight.ado('search', search) for _ in range(4)))
+
+        self.assertEqual(asyncio.run(run()), [{'offers': []}] * 4)
+        self.assertEqual(self.calls, 1)
+
+    def test_disabled_coalescing_calls_every_time(self):
+        flight = SingleFlight('test', config={'COALESCE_REQUESTS': False}, metrics=mock.Mock())
+        search = mock.Mock(return_value={'offers': []})
+
+        for _ in range(2):
+            flight.do('search', search)
+
+        self.assertEqual(search.call_count, 2)
+
+
+class RateLimiterTests(TestCase):
+    """Seau à jetons local : rafale, recharge et plancher réservé"""
+
+    def limiter(self, **config):
+        return RateLimiter(config={'RATE_LIMIT_MAX_WAIT': 0, **config}, metrics=mock.Mock())
+
+    def test_burst_then_rejection(self):
+        limiter = self.limiter(RATE_LIMIT_PER_MINUTE=60, RATE_LIMIT_BURST=3)
+
+        granted = [limiter.acquire('offer_requests') for _ in range(4)]
+
+        self.assertEqual(granted, [True, True, True, False])
+        limiter.metrics.incr.assert_called_with('offer_requests', 'rate_limit_rejections')
+
+    def test_waits_for_refill_within_max_wait(self):
+        limiter = self.limiter(RATE_LIMIT_PER_MINUTE=6000, RATE_LIMIT_BURST=1)
+        limiter.acquire('offer_requests')
+
+        self.assertTrue(limiter.acquire('offer_requests', max_wait=1))
+        self.assertTrue(asyncio.run(limiter.aacquire('offer_requests', max_wait=1)))
+
+    def test_floor_keeps_tokens_for_priority_calls(self):
+        limiter = self.limiter(RATE_LIMIT_PER_MINUTE=60, RATE_LIMIT_BURST=3)
+
+        self.assertTrue(limiter.acquire('offer_requests', floor=2))
+        self.assertFalse(limiter.acquire('offer_requests', floor=2))
+        self.assertTrue(limiter.acquire('orders', floor=0))
+
+    def test_disabled_without_rate(self):
+        limiter = self.limiter()
+
+        self.assertTrue(all(limiter.acquire('offer_requests') for _ in range(100)))
+
+
+class PrioritySchedulerTests(TestCase):
+    """Réservations avant détail d'offre avant recherches"""
+
+    def scheduler(self, **config):
+        limiter = RateLimiter(config={'RATE_LIMIT_PER_MINUTE': 60, 'RATE_LIMIT_BURST': 3}, metrics=mock.Mock())
+        return PriorityScheduler(limiter, config={'RATE_LIMIT_MAX_WAIT': 0, **config}, metrics=mock.Mock())
+
+    def test_priority_class(self):
+        self.assertEqual(priority_class('orders/ord_123/actions/confirm'), ORDER)
+        self.assertEqual(priority_class('payments'), ORDER)
+        self.assertEqual(priority_class('offers/off_0000AgFcR5Dk'), OFFER)
+        self.assertEqual(priority_class('offer_requests'), SEARCH)
+        self.assertEqual(priority_class('offers'), SEARCH)
+
+    def test_searches_leave_reserved_tokens_to_orders(self):
+        scheduler = self.scheduler(PRIORITY_RESERVED_TOKENS={SEARCH: 2})
+
+        with scheduler.slot('offer_requests') as first_search:
+            self.assertTrue(first_search)
+        with scheduler.slot('offer_requests') as second_search:
+            self.assertFalse(second_search)
+        with scheduler.slot('orders') as order:
+            self.assertTrue(order)
+
+    def test_concurrency_is_counted_per_class(self):
+        scheduler = self.scheduler(PRIORITY_CONCURRENCY={SEARCH: 1})
+
+        with scheduler.slot('offer_requests') as first_search:
+            with scheduler.slot('offer_requests') as second_search, scheduler.slot('orders') as order:
+                self.assertTrue(first_search)
+                self.assertFalse(second_search)
+                self.assertTrue(order)
+
+    def test_async_slot(self):
+        scheduler = self.scheduler()
+
+        async def take():
+            async with scheduler.aslot('orders') as granted:
+                return granted
+
+        self.assertTrue(asyncio.run(take()))
+
+
+class RetryPolicyTests(TestCase):
+    """Nouvelles tentatives : appels rejouables, plafond, Retry-After et budget"""
+
+    def policy(self, **config):
+        return RetryPolicy(config={'MAX_RETRIES': 2, 'RETRY_DELAY': 1, 'RETRY_MAX_DELAY': 8,
+                                   'RETRY_BUDGET': 20, **config}, metrics=mock.Mock())
+
+    def test_searches_retry_until_max_retries(self):
+        state = self.policy().start('POST', 'offer_requests')
+
+        delays = [state.backoff(status=503) for _ in range(3)]
+
+        self.assertTrue(0 <= delays[0] <= 1)
+        self.assertTrue(0 <= delays[1] <= 2)
+        self.assertIsNone(delays[2])
+
+    def test_orders_retry_only_when_not_processed(self):
+        policy = self.policy()
+
+        self.assertIsNone(policy.start('POST', 'orders').backoff(status=503))
+        self.assertIsNotNone(policy.start('POST', 'orders').backoff(status=429))
+        self.assertIsNotNone(policy.start('POST', 'orders').backoff(not_sent=True))
+
+    def test_non_transient_status_is_not_retried(self):
+        self.assertIsNone(self.policy().start('GET', 'offers/off_0000AgFcR5Dk').backoff(status=422))
+
+    def test_retry_after_is_used_within_budget(self):
+        policy = self.policy(RETRY_BUDGET=5)
+
+        self.assertEqual(policy.start('GET', 'offers').backoff(status=429, retry_after='3'), 3.0)
+        self.assertIsNone(policy.start('GET', 'offers').backoff(status=429, retry_after='30'))
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('2'), 2.0)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+        self.assertIsNone(parse_retry_after('bientôt'))
+        self.assertIsNone(parse_retry_after(None))
+
+
+class CircuitBreakerTests(TestCase):
+    """Disjoncteur : ouverture sur erreurs ou lenteur, appel d'essai, refermeture"""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('ModuleFlight.duffel_circuit.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.circuit = CircuitBreaker('test', config={
+            'CIRCUIT_MIN_CALLS': 4, 'CIRCUIT_ERROR_RATE': 0.5, 'CIRCUIT_SLOW_CALL': 5,
+            'CIRCUIT_SLOW_RATE': 0.5, 'CIRCUIT_OPEN_SECONDS': 30, 'CIRCUIT_WINDOW': 30,
+        }, metrics=mock.Mock())
+
+    def record(self, *outcomes):
+        for ok, latency in outcomes:
+            self.circuit.record(ok, latency)
+
+    def test_opens_on_error_rate_after_min_calls(self):
+        self.record((False, 0.1), (False, 0.1), (True, 0.1))
+        self.assertEqual(self.circuit.state, CLOSED)
+
+        self.record((True, 0.1))
+
+        self.assertEqual(self.circuit.state, OPEN)
+        self.assertFalse(self.circuit.allow())
+
+    def test_opens_on_slow_calls(self):
+        self.record((True, 6), (True, 6), (True, 0.1), (True, 0.1))
+
+        self.assertEqual(self.circuit.state, OPEN)
+
+    def test_old_calls_leave_the_window(self):
+        self.record((False, 0.1), (False, 0.1))
+        self.now += 31
+        self.record((True, 0.1), (True, 0.1), (False, 0.1))
+
+        self.assertEqual(self.circuit.state, CLOSED)
+
+    def test_single_probe_then_close_or_reopen(self):
+        self.record(*[(False, 0.1)] * 4)
+        self.now += 30
+
+        self.assertEqual(self.circuit.state, HALF_OPEN)
+        self.assertTrue(self.circuit.allow())
+        self.assertFalse(self.circuit.allow())
+
+        self.record((False, 0.1))
+        self.assertEqual(self.circuit.state, OPEN)
+
+        self.now += 30
+        self.assertTrue(self.circuit.allow())
+        self.record((True, 0.1))
+        self.assertEqual(self.circuit.state, CLOSED)
+        self.assertTrue(self.circuit.allow())
+
+
+def formatted_offer(offer_id, amount, carrier, departing_at, duration='PT8H', stops=0, emissions=None):
+    """Offre au format de format_offer, réduite aux champs indexés par ResultsIndex"""
+    return {
+        'id': offer_id,
+        'total_amount': amount,
+        'total_currency': 'EUR',
+        'total_emissions_kg': emissions,
+        'owner': {'iata_code': carrier, 'name': carrier},
+        'slices': [{'duration': duration, 'stops': stops, 'segments': [{'departing_at': departing_at}]}],
+    }
+
+
+class ResultsIndexTests(TestCase):
+    """Filtres, tris et facettes sur les offres d'une recherche"""
+
+    def setUp(self):
+        self.index = ResultsIndex([
+            formatted_offer('off_af_morning', '300.00', 'AF', '2030-01-10T08:00:00', stops=0),
+            formatted_offer('off_kl_evening', '200.00', 'KL', '2030-01-10T19:30:00', stops=1),
+            formatted_offer('off_af_night', '100.00', 'AF', '2030-01-10T02:15:00', stops=2),
+            formatted_offer('off_et_unknown', None, 'ET', '2030-01-10T13:00:00', duration='', stops=1),
+        ])
+
+    def ids(self, result):
+        return [offer['id'] for offer in result['offers']]
+
+    def test_sort_puts_unknown_values_last(self):
+        self.assertEqual(self.ids(self.index.query(sort='price')),
+                         ['off_af_night', 'off_kl_evening', 'off_af_morning', 'off_et_unknown'])
+        self.assertEqual(self.ids(self.index.query(sort='price', descending=True))[-1], 'off_et_unknown')
+        self.assertEqual(self.ids(self.index.query(sort='departure'))[0], 'off_af_night')
+
+    def test_filters_combine(self):
+        result = self.index.query(carriers=['AF'], max_price=250)
+
+        self.assertEqual(self.ids(result), ['off_af_night'])
+        self.assertEqual(result['total_offers'], 1)
+
+        self.assertEqual(self.ids(self.index.query(stops=[1])), ['off_kl_evening', 'off_et_unknown'])
+        self.assertEqual(self.ids(self.index.query(depart_after=6 * 60, depart_before=12 * 60)),
+                         ['off_af_morning'])
+
+    def test_facets_ignore_their_own_filter(self):
+        facets = self.index.query(carriers=['AF'], stops=[0])['facets']
+
+        self.assertEqual({airline['code']: airline['count'] for airline in facets['airlines']}, {'AF': 1})
+        self.assertEqual(facets['stops'], {'0': 1, '2': 1})
+        self.assertEqual(facets['price'], {'min': '300.00', 'max': '300.00', 'currency': 'EUR'})
+
+    def test_pagination(self):
+        result = self.index.query(sort='price', offset=1, limit=2)
+
+        self.assertEqual(self.ids(result), ['off_kl_evening', 'off_af_morning'])
+        self.assertEqual(result['total_offers'], 4)
+        self.assertEqual(self.index.page(2, 3)['offers'][0]['id'], 'off_et_unknown')
+
+
+class BestScoreTests(TestCase):
+    """Score « meilleur » : critères ramenés à [0, 1] et pondérés"""
+
+    def index(self, weights=None):
+        return ResultsIndex([
+            formatted_offer('off_cheap_slow', '100.00', 'AF', '2030-01-10T08:00:00', duration='PT20H', stops=2),
+            formatted_offer('off_dear_fast', '400.00', 'AF', '2030-01-10T08:00:00', duration='PT8H', stops=0),
+            formatted_offer('off_middle', '200.00', 'AF', '2030-01-10T08:00:00', duration='PT10H', stops=0),
+        ], weights=weights)
+
+    def test_scores_are_normalized_per_criterion(self):
+        scores = self.index({'price': 1}).scores()
+
+        self.assertAlmostEqual(scores[0], 0.0)
+        self.assertAlmostEqual(scores[1], 1.0)
+        self.assertAlmostEqual(scores[2], 1 / 3)
+
+    def test_weights_are_relative(self):
+        scores = self.index({'price': 2, 'duration': 2}).scores()
+
+        self.assertAlmostEqual(scores[0], 0.5)
+        self.assertAlmostEqual(scores[1], 0.5)
+
+    def test_unknown_value_scores_as_worst(self):
+        index = ResultsIndex([
+            formatted_offer('off_known', '100.00', 'AF', '2030-01-10T08:00:00', emissions='90'),
+            formatted_offer('off_unknown', '100.00', 'AF', '2030-01-10T08:00:00'),
+        ], weights={'emissions': 1})
+
+        self.assertEqual(index.scores().tolist(), [0.0, 1.0])
+
+    def test_best_order_balances_criteria(self):
+        index = self.index()
+
+        # Poids par défaut : 0.27 (middle), 0.5 (cheap_slow), 0.55 (dear_fast)
+        self.assertEqual([index.offers[row]['id'] for row in index.order('best')],
+                         ['off_middle', 'off_cheap_slow', 'off_dear_fast'])
+
+
+class JSONArrayStreamTests(TestCase):
+    """Décodage incrémental : même résultat quelle que soit la découpe des blocs"""
+
+    DOCUMENT = {
+        'data': {
+            'id': 'orq_stream_test',
+            'offers': [
+                {'id': 'off_1', 'total_amount': '-25.5', 'total_emissions_kg': 1234,
+                 'owner': {'name': 'Aéro Kinshasa'}},
+                {'id': 'off_2', 'conditions': None, 'live_mode': False, 'slices': [[], {}]},
+                {'id': 'off_3', 'tags': ['vol « direct »', '✈'], 'passengers': 12345678901234567890},
+            ],
+            'passengers': [{'id': 'pas_1', 'age': 30}],
+        },
+        'meta': {'after': None, 'limit': 50},
+    }
+
+    def parse(self, body, size):
+        stream = JSONArrayStream(('data', 'offers'))
+        items = []
+        for start in range(0, len(body), size):
+            items.extend(stream.feed(body[start:start + size]))
+        items.extend(stream.close())
+        return stream, items
+
+    def test_any_chunk_boundary_gives_the_same_result(self):
+        body = json.dumps(self.DOCUMENT, ensure_ascii=False, indent=1).encode()
+        expected_document = json.loads(body)
+        expected_offers = expected_document['data'].pop('offers')
+
+        for size in range(1, 40):
+            stream, items = self.parse(body, size)
+            self.assertEqual(items, expected_offers, f"blocs de {size} octets")
+            self.assertEqual(stream.document, expected_document, f"blocs de {size} octets")
+            self.assertTrue(stream.found)
+            self.assertEqual(stream.count, 3)
+
+    def test_number_split_across_chunks_is_not_cut(self):
+        _, items = self.parse(b'{"data": {"offers": [-25, 1.5e3, 7]}}', 23)
+
+        self.assertEqual(items, [-25, 1500.0, 7])
+
+    def test_missing_array_is_reported(self):
+        stream, items = self.parse(b'{"data": {"id": "orq_1"}}', 5)
+
+        self.assertEqual(items, [])
+        self.assertFalse(stream.found)
+        self.assertEqual(stream.document, {'data': {'id': 'orq_1'}})
+
+    def test_truncated_or_invalid_document_raises(self):
+        for body in (b'{"data": {"offers": [{"id": "off_1"}', b'{"data": {"offers": [1 2]}}', b'[1, 2]'):
+            with self.assertRaises(ValueError):
+                self.parse(body, 4)
+
+    def test_streamed_response_closes_connection(self):
+        body = b'{"data": {"offers": [{"id": "off_1"}, {"id": "off_2"}]}}'
+        response = mock.Mock()
+        response.iter_content.return_value = (body[start:start + 7] for start in range(0, len(body), 7))
+        streamed = StreamedJSON(response, ('data', 'offers'), chunk_size=7)
+
+        self.assertEqual([offer['id'] for offer in streamed], ['off_1', 'off_2'])
+        self.assertEqual(streamed.size, len(body))
+        response.close.assert_called_once_with()
+
+
+class MultiCitySearchTests(TestCase):
+    """Recherche multi-destinations : validation des trajets"""
+
+    def leg(self, origin, destination, days):
+        return {'origin': origin, 'destination': destination,
+                'departure_date': (date.today() + timedelta(days=days)).isoformat()}
+
+    def search(self, legs, **data):
+        serializer = FlightSearchSerializer(data={'legs': legs, **data})
+        serializer.is_valid()
+        return serializer
+
+    def test_legs_fill_origin_destination_and_date(self):
+        serializer = self.search([self.leg('fih', 'CDG', 10), self.leg('CDG', 'JFK', 15)])
+
+        self.assertEqual(serializer.errors, {})
+        self.assertEqual(serializer.validated_data['origin'], 'FIH')
+        self.assertEqual(serializer.validated_data['destination'], 'JFK')
+        self.assertEqual(serializer.validated_data['departure_date'], date.today() + timedelta(days=10))
+
+    def test_legs_must_be_in_travel_order(self):
+        serializer = self.search([self.leg('FIH', 'CDG', 15), self.leg('CDG', 'JFK', 10)])
+
+        self.assertIn('non_field_errors', serializer.errors)
+
+    def test_return_date_and_flex_days_are_refused(self):
+        legs = [self.leg('FIH', 'CDG', 10), self.leg('CDG', 'JFK', 15)]
+        return_date = (date.today() + timedelta(days=20)).isoformat()
+
+        self.assertFalse(self.search(legs, return_date=return_date).is_valid())
+        self.assertFalse(self.search(legs, flex_days=1).is_valid())
+
+    def test_leg_count_and_airports_are_checked(self):
+        self.assertIn('legs', self.search([self.leg('FIH', 'CDG', 10)]).errors)
+        self.assertIn('legs', self.search([self.leg('FIH', 'CDG', 10), self.leg('CDG', 'CDG', 15)]).errors)
+        self.assertIn('legs', self.search([self.leg('FIH', 'CDG', 10), self.leg('CDG', 'QQQ', 15)]).errors)
+
+
+class AirportIndexTests(TestCase):
+    """Index local des aéroports : codes, préfixes, fautes de frappe"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.index = AirportIndex()
+
+    def codes(self, query, limit=5):
+        return [suggestion['code'] for suggestion in self.index.search(query, limit=limit)]
+
+    def test_get_airport_and_city(self):
+        self.assertEqual(self.index.get('cdg').city_code, 'PAR')
+        self.assertIn('CDG', self.index.get('PAR').airports)
+        self.assertIsNone(self.index.get('QQQ'))
+        self.assertIsNone(self.index.get(None))
+
+    def test_exact_code_first_then_city_airports(self):
+        self.assertEqual(self.codes('CDG', limit=1), ['CDG'])
+        self.assertEqual(self.codes('par')[:3], ['PAR', 'CDG', 'ORY'])
+
+    def test_prefix_of_city_name(self):
+        self.assertEqual(self.codes('lond')[0], 'LON')
+        self.assertEqual(self.codes('kinshasa')[0], 'FIH')
+
+    def test_typos_and_accents(self):
+        self.assertEqual(self.codes('kinshsa')[0], 'FIH')
+        self.assertEqual(self.codes('São')[0], 'SAO')
+        self.assertEqual(fold('São Paulo-Guarulhos'), 'sao paulo guarulhos')
+
+    def test_no_suggestion(self):
+        self.assertEqual(self.index.search('zzzzzz'), [])
+        self.assertEqual(self.index.search('  -  '), [])
+        self.assertEqual(len(self.index.search('a', limit=3)), 3)
+
+
+class StreamDeadlineTests(TestCase):
+    """Le flux SSE, lu après le retour de la vue, a son propre budget"""
+
+    @override_settings(FLIGHT_CONFIG={**settings.FLIGHT_CONFIG, 'REQUEST_DEADLINE': 20})
+    def test_search_runs_under_request_budget(self):
+        budgets = []
+
+        async def iter_search_offers(results, **search):
+            budgets.append(remaining())
+            results.update({'offer_request': {'id': 'orq_sse_deadline'}, 'offers': []})
+            return
+            yield
+
+        async def read_events():
+            search_query = {'params': {}, 'search': {'origin': 'FIH', 'destination': 'CDG'}}
+            return [event async for event in stream_search_events(search_query)]
+
+        with mock.patch('ModuleFlight.views.async_duffel_service.iter_search_offers', iter_search_offers):
+            events = asyncio.run(read_events())
+
+        self.assertTrue(events[-1].startswith('event: summary'))
+        self.assertIsNotNone(budgets[0])
+        self.assertTrue(0 < budgets[0] <= 20)
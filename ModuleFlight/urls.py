@@ -1,16 +1,22 @@
 # ModuleFlight/urls.py
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import FlightView
+from .views import FlightView, AsyncFlightResultsView
 
 app_name = 'module_flight'  # Changé pour éviter le conflit de namespace
 
+# Vues de recherche asynchrones (servies par Daphne/ASGI) si activées
+ASYNC_SEARCH_VIEWS = getattr(settings, 'FLIGHT_CONFIG', {}).get('ASYNC_SEARCH_VIEWS', False)
+
 urlpatterns = [
     # Pages principales du module Flight
     path('', FlightView.as_view(), {'param': 'search'}, name='search_flight'),
     path('search/', FlightView.as_view(), {'param': 'search'}, name='flight_search'),
-    path('results/', FlightView.as_view(), {'param': 'results'}, name='flight_results'),
+    path('results/', (AsyncFlightResultsView if ASYNC_SEARCH_VIEWS else FlightView).as_view(), {'param': 'results'}, name='flight_results'),
+    path('results/stream/', FlightView.as_view(), {'param': 'results_stream'}, name='flight_results_stream'),
+    path('results/<str:search_id>/pages/<int:page>/', FlightView.as_view(), {'param': 'results_page'}, name='flight_results_page'),
     path('detail/<str:offer_id>/', FlightView.as_view(), {'param': 'flight_detail'}, name='flight_detail'),
     
     # Actions AJAX
@@ -28,7 +34,11 @@ try:
         TravelAgencyViewSet, 
         MerchantAgencyViewSet, 
         FlightBookingViewSet,
-        FlightSearchAPIView
+        FlightSearchAPIView,
+        AsyncFlightSearchAPIView,
+        SearchResultsAPIView,
+        AirportAutocompleteAPIView,
+        DuffelStatsAPIView
     )
     
     router = DefaultRouter()
@@ -39,7 +49,10 @@ try:
     # Ajouter les routes API
     urlpatterns += [
         path('api/', include(router.urls)),
-        path('api/search/', FlightSearchAPIView.as_view(), name='api_flight_search'),
+        path('api/search/', (AsyncFlightSearchAPIView if ASYNC_SEARCH_VIEWS else FlightSearchAPIView).as_view(), name='api_flight_search'),
+        path('api/search/<str:search_id>/results/', SearchResultsAPIView.as_view(), name='api_search_results'),
+        path('api/airports/', AirportAutocompleteAPIView.as_view(), name='api_airport_search'),
+        path('api/duffel/stats/', DuffelStatsAPIView.as_view(), name='api_duffel_stats'),
     ]
 except ImportError:
     # Si les API views ne sont pas disponibles, continuer sans elles
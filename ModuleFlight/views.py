@@ -1,27 +1,313 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
 from django.views import View
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.core.exceptions import ValidationError
 from django.db import transaction
+from asgiref.sync import sync_to_async
 from datetime import datetime, date
 from decimal import Decimal
 import json
 import logging
 
 from .models import TravelAgency, MerchantAgency, FlightBooking, FlightUserManager, Passenger, FlightBookingDetail
-from .duffel_service import duffel_service, DuffelAPIError
+from .duffel_service import duffel_service, DuffelAPIError, DuffelDeadlineError
+from .duffel_deadline import deadline, request_budget, with_deadline
+from .duffel_async import async_duffel_service
+from .duffel_results import results_store
+from .airport_index import airport_index
 from ModuleProfils.models import ClientProfile, MerchantProfile
 
 logger = logging.getLogger(__name__)
 
+# Formats de date acceptés dans les paramètres de recherche (ISO, Flatpickr, saisie libre)
+SEARCH_DATE_FORMATS = ['%Y-%m-%d', '%d %b %Y', '%d %B %Y', '%d/%m/%Y', '%d-%m-%Y']
+
+
+def parse_search_date(value):
+    """
+    Convertit une date de recherche saisie dans l'un des formats acceptés
+    
+    Returns:
+        date | None: Date convertie, ou None si aucun format ne correspond
+    """
+    for date_format in SEARCH_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_search_query(query):
+    """
+    Lit les paramètres de recherche de la page de résultats
+    
+    Args:
+        query (QueryDict): Paramètres GET de la requête
+    
+    Returns:
+        tuple: (search_query, error_context) - search_query contient les arguments
+        de search_flights ('search') et les paramètres affichés ('params') ;
+        error_context est le contexte d'erreur à afficher, ou None
+    """
+    origin = query.get('origin', '').upper()
+    destination = query.get('destination', '').upper()
+    departure_date = query.get('departure_date')
+    return_date = query.get('return_date')
+    passengers = int(query.get('passengers', 1))
+    cabin_class = query.get('cabin_class', 'economy')
+    
+    # Dates flexibles (±N jours), bornées par FLIGHT_CONFIG['MAX_FLEX_DAYS']
+    try:
+        flex_days = int(query.get('flex_days') or 0)
+    except ValueError:
+        flex_days = 0
+    flex_days = max(0, min(flex_days, settings.FLIGHT_CONFIG.get('MAX_FLEX_DAYS', 3)))
+    
+    # Multi-destinations : champs leg_origin, leg_destination et leg_date répétés, un par trajet
+    if query.get('leg_origin'):
+        return parse_multi_city_query(query, passengers, cabin_class)
+    
+    # Validation des paramètres
+    if not all([origin, destination, departure_date]):
+        return None, {
+            'title': 'Résultats de recherche',
+            'error': 'Paramètres de recherche manquants'
+        }
+    
+    # Conversion des dates (format Flatpickr "27+Nov+2025" -> "27 Nov 2025")
+    error = None
+    departure_date = departure_date.replace('+', ' ')
+    departure_date_obj = parse_search_date(departure_date)
+    return_date_obj = None
+    
+    if not departure_date_obj:
+        error = f"Impossible de parser la date: {departure_date}"
+    elif return_date and return_date.strip():  # Vérifier que return_date n'est pas vide
+        return_date = return_date.replace('+', ' ')
+        return_date_obj = parse_search_date(return_date)
+        if not return_date_obj:
+            error = f"Impossible de parser la date de retour: {return_date}"
+    
+    if error:
+        return None, {
+            'title': 'Résultats de recherche',
+            'error': f'Format de date invalide: {error}',
+            'error_type': 'date_format'
+        }
+    
+    return {
+        'search': {
+            'origin': origin,
+            'destination': destination,
+            'departure_date': departure_date_obj,
+            'return_date': return_date_obj,
+            'passengers': passengers,
+            'cabin_class': cabin_class,
+            'flex_days': flex_days
+        },
+        'params': {
+            'origin': origin,
+            'destination': destination,
+            'departure_date': departure_date,
+            'return_date': return_date,
+            'passengers': passengers,
+            'cabin_class': cabin_class,
+            'flex_days': flex_days
+        }
+    }, None
+
+
+def parse_multi_city_query(query, passengers, cabin_class):
+    """
+    Lit les trajets d'une recherche multi-destinations (voir parse_search_query)
+    
+    Returns:
+        tuple: (search_query, error_context) ; search_query['search']['legs'] contient
+        les trajets, origin/destination/departure_date le premier départ et la dernière arrivée
+    """
+    rows = list(zip(query.getlist('leg_origin'), query.getlist('leg_destination'), query.getlist('leg_date')))
+    max_legs = settings.FLIGHT_CONFIG.get('MULTI_CITY_MAX_LEGS', 6)
+    if not 2 <= len(rows) <= max_legs or not all(all(row) for row in rows):
+        return None, {
+            'title': 'Résultats de recherche',
+            'error': f'Une recherche multi-destinations comporte de 2 à {max_legs} trajets complets'
+        }
+    
+    legs = []
+    for leg_origin, leg_destination, leg_date in rows:
+        leg_date = leg_date.replace('+', ' ')
+        leg_date_obj = parse_search_date(leg_date)
+        if not leg_date_obj:
+            return None, {
+                'title': 'Résultats de recherche',
+                'error': f'Format de date invalide: Impossible de parser la date: {leg_date}',
+                'error_type': 'date_format'
+            }
+        legs.append({
+            'origin': leg_origin.upper(),
+            'destination': leg_destination.upper(),
+            'departure_date': leg_date_obj
+        })
+    
+    return {
+        'search': {
+            'origin': legs[0]['origin'],
+            'destination': legs[-1]['destination'],
+            'departure_date': legs[0]['departure_date'],
+            'passengers': passengers,
+            'cabin_class': cabin_class,
+            'legs': legs
+        },
+        'params': {
+            'origin': legs[0]['origin'],
+            'destination': legs[-1]['destination'],
+            'departure_date': legs[0]['departure_date'].isoformat(),
+            'return_date': None,
+            'passengers': passengers,
+            'cabin_class': cabin_class,
+            'flex_days': 0,
+            'legs': [dict(leg, departure_date=leg['departure_date'].isoformat()) for leg in legs]
+        }
+    }, None
+
+
+def results_page_url(search_id, page):
+    """URL d'une page de résultats (fragment HTML des cartes d'offres)"""
+    return reverse('module_flight:flight_results_page', args=[search_id, page])
+
+
+def build_results_context(search_results, search_params):
+    """
+    Formate les offres d'une recherche pour flight-list.html
+    
+    Seule la première page (RESULTS_PAGE_SIZE offres) est rendue ; les suivantes
+    sont chargées à la demande via results_page_url.
+    
+    Returns:
+        dict: Contexte du template de résultats
+    """
+    # Formatage des offres pour l'affichage
+    formatted_offers = []
+    for offer in search_results.get('offers', []):
+        formatted_offer = duffel_service.format_offer_for_frontend(offer)
+        if formatted_offer:
+            formatted_offers.append(formatted_offer)
+    
+    # Classement (tri « meilleur » par défaut) ; la recherche reste interrogeable par search_id
+    search_id, page = results_store.first_page(search_results, formatted_offers)
+    
+    return {
+        'title': 'Résultats de recherche',
+        'offers': page['offers'],
+        'search_params': search_params,
+        'search_id': search_id,
+        'total_offers': page['total_offers'],
+        'page': page['page'],
+        'pages': page['pages'],
+        'next_page_url': results_page_url(search_id, 2) if search_id and page['pages'] > 1 else None,
+        'flex_summary': search_results.get('flex_summary', []),
+        'itineraries': search_results.get('itineraries', []),
+        'multi_city_summary': search_results.get('multi_city_summary'),
+        'stale': search_results.get('stale', False),
+        'stale_since': search_results.get('stale_since')
+    }
+
+
+def use_streaming(search_query):
+    """Mode flux activé (FLIGHT_CONFIG['STREAM_RESULTS']) et applicable à cette recherche"""
+    return (
+        settings.FLIGHT_CONFIG.get('STREAM_RESULTS', False)
+        and not search_query['search'].get('flex_days')
+        and not search_query['search'].get('legs')
+    )
+
+
+def build_stream_context(request, search_query):
+    """
+    Contexte de la page de résultats en mode flux : la page s'affiche tout de suite,
+    les offres arrivent ensuite par Server-Sent Events
+    
+    Returns:
+        dict: Contexte du template de résultats (sans offres, avec stream_url)
+    """
+    return {
+        'title': 'Résultats de recherche',
+        'offers': [],
+        'search_params': search_query['params'],
+        'stream_url': f"{reverse('module_flight:flight_results_stream')}?{request.GET.urlencode()}"
+    }
+
+
+def format_sse_event(event, data):
+    """Encode un événement Server-Sent Events (données JSON)"""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def stream_search_events(search_query):
+    """
+    Flux SSE d'une recherche : 'start', un 'offer' par offre (carte HTML rendue)
+    dès sa réception, puis 'summary' (search_id, total et facettes) ou 'search_error'
+    
+    La recherche complète est gardée par results_store, comme une page de
+    résultats : search_id sert ensuite api/search/<search_id>/results/.
+    
+    Le générateur est parcouru après le retour de la vue, hors de son
+    with_deadline : il ouvre donc lui-même le budget REQUEST_DEADLINE.
+    
+    Yields:
+        str: Événements Server-Sent Events
+    """
+    yield format_sse_event('start', search_query['params'])
+    
+    search = dict(search_query['search'])
+    search.pop('flex_days', None)
+    formatted_offers = []
+    results = {}
+    with deadline(request_budget()):
+        try:
+            async for offer in async_duffel_service.iter_search_offers(**search, results=results):
+                formatted_offer = duffel_service.format_offer_for_frontend(offer)
+                if not formatted_offer:
+                    continue
+                formatted_offers.append(formatted_offer)
+                yield format_sse_event('offer', {
+                    'id': formatted_offer['id'],
+                    'html': render_to_string('ModuleFlight/shared/offer-card.html', {'offer': formatted_offer})
+                })
+        except DuffelAPIError as e:
+            logger.error(f"Erreur API Duffel: {str(e)}")
+            yield format_sse_event('search_error', {'message': f'Erreur API Duffel: {str(e)}'})
+            return
+        
+        index = results_store.build_index(formatted_offers)
+        search_id = await sync_to_async(results_store.put, thread_sensitive=False)(results, index)
+    summary = index.query(limit=0)
+    yield format_sse_event('summary', {
+        'search_id': search_id,
+        'total_offers': summary['total_offers'],
+        'facets': summary['facets']
+    })
+
+
+async def stream_error_events(message):
+    """Flux SSE réduit à une erreur (paramètres invalides)"""
+    yield format_sse_event('search_error', {'message': message})
+
 
 @method_decorator(login_required, name='dispatch')
 class FlightView(View):
     """Vue principale pour le module Flight avec gestion par paramètres"""
     
+    @with_deadline()
     def get(self, request, param=None, **kwargs):
         """Gestion des requêtes GET selon le paramètre"""
         
@@ -29,6 +315,10 @@ class FlightView(View):
             return self.search_flights(request)
         elif param == "results":
             return self.flight_results(request)
+        elif param == "results_stream":
+            return self.flight_results_stream(request)
+        elif param == "results_page":
+            return self.flight_results_page(request, kwargs.get('search_id'), kwargs.get('page'))
         elif param == "detail" or param == "flight_detail":
             offer_id = kwargs.get('offer_id')
             return self.flight_detail(request, offer_id)
@@ -37,6 +327,7 @@ class FlightView(View):
         else:
             return self.search_flights(request)  # Par défaut
     
+    @with_deadline()
     def post(self, request, param=None, **kwargs):
         """Gestion des requêtes POST selon le paramètre"""
         
@@ -106,99 +397,22 @@ class FlightView(View):
     def flight_results(self, request):
         """Affiche les résultats de recherche de vols"""
         try:
-            # Récupération des paramètres de recherche
-            origin = request.GET.get('origin', '').upper()
-            destination = request.GET.get('destination', '').upper()
-            departure_date = request.GET.get('departure_date')
-            return_date = request.GET.get('return_date')
-            passengers = int(request.GET.get('passengers', 1))
-            cabin_class = request.GET.get('cabin_class', 'economy')
-            
-            # Validation des paramètres
-            if not all([origin, destination, departure_date]):
-                context = {
-                    'title': 'Résultats de recherche',
-                    'error': 'Paramètres de recherche manquants'
-                }
-                return render(request, "ModuleFlight/flight-list.html", context)
+            # Récupération et validation des paramètres de recherche
+            search_query, error_context = parse_search_query(request.GET)
+            if error_context:
+                return render(request, "ModuleFlight/flight-list.html", error_context)
             
-            # Conversion des dates
-            try:
-                # Gestion du format "27+Nov+2025" (Flatpickr)
-                if '+' in departure_date:
-                    # Format: "27+Nov+2025" -> "27 Nov 2025"
-                    departure_date = departure_date.replace('+', ' ')
-                
-                # Essayer différents formats de date
-                departure_date_obj = None
-                date_formats = ['%Y-%m-%d', '%d %b %Y', '%d %B %Y', '%d/%m/%Y', '%d-%m-%Y']
-                
-                for date_format in date_formats:
-                    try:
-                        departure_date_obj = datetime.strptime(departure_date, date_format).date()
-                        break
-                    except ValueError:
-                        continue
-                
-                if not departure_date_obj:
-                    raise ValueError(f"Impossible de parser la date: {departure_date}")
-                
-                return_date_obj = None
-                if return_date and return_date.strip():  # Vérifier que return_date n'est pas vide
-                    if '+' in return_date:
-                        return_date = return_date.replace('+', ' ')
-                    
-                    for date_format in date_formats:
-                        try:
-                            return_date_obj = datetime.strptime(return_date, date_format).date()
-                            break
-                        except ValueError:
-                            continue
-                    
-                    if not return_date_obj:
-                        raise ValueError(f"Impossible de parser la date de retour: {return_date}")
-                        
-            except ValueError as e:
-                context = {
-                    'title': 'Résultats de recherche',
-                    'error': f'Format de date invalide: {str(e)}',
-                    'error_type': 'date_format'
-                }
-                return render(request, "ModuleFlight/flight-list.html", context)
+            # Mode flux : la page s'affiche sans attendre Duffel
+            if use_streaming(search_query):
+                return render(request, "ModuleFlight/flight-list.html", build_stream_context(request, search_query))
             
             # Recherche via l'API Duffel
             try:
                 # Réactivation de l'API Duffel réelle
                 logger.info("Tentative de connexion à l'API Duffel réelle")
-                search_results = duffel_service.search_flights(
-                    origin=origin,
-                    destination=destination,
-                    departure_date=departure_date_obj,
-                    return_date=return_date_obj,
-                    passengers=passengers,
-                    cabin_class=cabin_class
-                )
+                search_results = duffel_service.search_flights(**search_query['search'])
                 
-                # Formatage des offres pour l'affichage
-                formatted_offers = []
-                for offer in search_results.get('offers', []):
-                    formatted_offer = duffel_service.format_offer_for_frontend(offer)
-                    if formatted_offer:
-                        formatted_offers.append(formatted_offer)
-                
-                context = {
-                    'title': 'Résultats de recherche',
-                    'offers': formatted_offers,
-                    'search_params': {
-                        'origin': origin,
-                        'destination': destination,
-                        'departure_date': departure_date,
-                        'return_date': return_date,
-                        'passengers': passengers,
-                        'cabin_class': cabin_class
-                    },
-                    'total_offers': len(formatted_offers)
-                }
+                context = build_results_context(search_results, search_query['params'])
                 
                 return render(request, "ModuleFlight/flight-list.html", context)
                 
@@ -256,6 +470,63 @@ class FlightView(View):
             }
             return render(request, "ModuleFlight/flight-list.html", context)
     
+    def flight_results_stream(self, request):
+        """
+        Flux SSE des résultats de recherche (voir stream_search_events)
+        
+        Le flux est un générateur asynchrone : servi par Daphne, chaque offre part
+        dès qu'elle est formatée.
+        """
+        search_query, error_context = parse_search_query(request.GET)
+        if error_context:
+            events = stream_error_events(error_context['error'])
+        elif search_query['search'].get('legs'):
+            events = stream_error_events('Recherche multi-destinations non disponible en flux')
+        else:
+            events = stream_search_events(search_query)
+        
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Pas de mise en tampon côté nginx
+        return response
+    
+    def flight_results_page(self, request, search_id, page):
+        """
+        Page suivante des résultats d'une recherche déjà affichée
+        
+        Renvoie les cartes d'offres en fragment HTML (suivi du bouton de la page
+        d'après), ou les offres en JSON avec ?format=json.
+        """
+        result = results_store.page(search_id, page)
+        if result is None:
+            return JsonResponse({
+                'success': False,
+                'message': 'Recherche expirée, relancez la recherche'
+            }, status=404)
+        if not 1 <= page <= result['pages']:
+            return JsonResponse({
+                'success': False,
+                'message': 'Page introuvable'
+            }, status=404)
+        
+        next_page_url = results_page_url(search_id, page + 1) if page < result['pages'] else None
+        if request.GET.get('format') == 'json':
+            return JsonResponse({
+                'success': True,
+                'data': {
+                    'search_id': search_id,
+                    'offers': result['offers'],
+                    'page': page,
+                    'pages': result['pages'],
+                    'total_offers': result['total_offers'],
+                    'next_page_url': next_page_url
+                }
+            })
+        return render(request, "ModuleFlight/shared/offer-page.html", {
+            'offers': result['offers'],
+            'next_page_url': next_page_url
+        })
+    
     def flight_detail(self, request, offer_id):
         """
         Affiche les détails complets d'une offre de vol
@@ -454,7 +725,8 @@ class FlightView(View):
                 'departure_date': request.POST.get('departure_date'),
                 'return_date': request.POST.get('return_date'),
                 'passengers': request.POST.get('passengers', '1'),
-                'cabin_class': request.POST.get('cabin_class', 'economy')
+                'cabin_class': request.POST.get('cabin_class', 'economy'),
+                'flex_days': request.POST.get('flex_days', '0')
             }
             
             # Validation côté serveur
@@ -464,9 +736,18 @@ class FlightView(View):
                     'message': 'Veuillez remplir tous les champs obligatoires'
                 })
             
+            # Codes inconnus de l'index local des aéroports et villes
+            if settings.FLIGHT_CONFIG.get('VALIDATE_AIRPORT_CODES', True):
+                unknown = [code for code in (search_params['origin'], search_params['destination']) if airport_index.get(code) is None]
+                if unknown:
+                    return JsonResponse({
+                        'resultat': 'FAIL',
+                        'message': f"Aéroport ou ville inconnu(e): {', '.join(unknown)}"
+                    })
+            
             # Construction de l'URL de redirection
             from urllib.parse import urlencode
-            query_params = {k: v for k, v in search_params.items() if v}
+            query_params = {k: v for k, v in search_params.items() if v and v != '0'}
             redirect_url = f"/flights/results/?{urlencode(query_params)}"
             
             return JsonResponse({
@@ -565,6 +846,8 @@ class FlightView(View):
                         offer_details = duffel_service.get_offer_details(offer_id)
                         if not offer_details:
                             logger.warning(f"Impossible de récupérer les détails de l'offre Duffel: {offer_id}")
+                    except DuffelDeadlineError:
+                        raise  # Budget épuisé : pas de réservation créée sans les données de l'offre
                     except Exception as e:
                         logger.warning(f"Erreur lors de la récupération des détails Duffel: {e}")
                         offer_details = None
@@ -638,6 +921,12 @@ class FlightView(View):
                     'booking_reference': booking.booking_reference
                 })
 
+            except DuffelDeadlineError as e:
+                logger.warning(f"Réservation abandonnée, délai dépassé pour l'offre {offer_id}")
+                return JsonResponse({
+                    'resultat': 'FAIL',
+                    'message': str(e)
+                }, status=504)
             except Exception as e:
                 logger.error(f"Erreur lors de la création de la réservation: {str(e)}")
                 return JsonResponse({
@@ -793,4 +1082,56 @@ class FlightView(View):
             return JsonResponse({
                 'resultat': 'FAIL',
                 'message': 'Erreur lors de la récupération des détails'
-            })
\ No newline at end of file
+            })
+
+
+class AsyncFlightResultsView(View):
+    """
+    Résultats de recherche en mode asynchrone (Daphne/ASGI)
+    
+    Même rendu que FlightView.flight_results, mais l'appel Duffel ne bloque pas
+    de thread : un processus peut garder des centaines de recherches en cours.
+    """
+    
+    @with_deadline()
+    async def get(self, request, *args, **kwargs):
+        """Affiche les résultats de recherche de vols"""
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        
+        try:
+            # Récupération et validation des paramètres de recherche
+            search_query, error_context = parse_search_query(request.GET)
+            if error_context:
+                return await sync_to_async(render)(request, "ModuleFlight/flight-list.html", error_context)
+            
+            # Mode flux : la page s'affiche sans attendre Duffel
+            if use_streaming(search_query):
+                context = build_stream_context(request, search_query)
+                return await sync_to_async(render)(request, "ModuleFlight/flight-list.html", context)
+            
+            try:
+                search_results = await async_duffel_service.search_flights(**search_query['search'])
+                context = await sync_to_async(build_results_context, thread_sensitive=False)(
+                    search_results, search_query['params']
+                )
+                
+            except DuffelAPIError as e:
+                logger.error(f"Erreur API Duffel: {str(e)}")
+                context = {
+                    'title': 'Erreur de recherche',
+                    'error': f'Erreur API Duffel: {str(e)}',
+                    'error_type': 'duffel_api'
+                }
+            
+            return await sync_to_async(render)(request, "ModuleFlight/flight-list.html", context)
+            
+        except Exception as e:
+            logger.error(f"Erreur dans AsyncFlightResultsView: {str(e)}")
+            context = {
+                'title': 'Résultats de recherche',
+                'error': f'Erreur interne lors de la recherche: {str(e)}',
+                'error_type': 'internal_error'
+            }
+            return await sync_to_async(render)(request, "ModuleFlight/flight-list.html", context)
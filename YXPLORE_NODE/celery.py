@@ -0,0 +1,21 @@
+"""
+Application Celery du projet (tâches planifiées par django-celery-beat)
+
+Worker et planificateur :
+    celery -A YXPLORE_NODE worker -l info
+    celery -A YXPLORE_NODE beat -l info
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'YXPLORE_NODE.settings')
+
+app = Celery('YXPLORE_NODE')
+
+# Configuration lue dans settings.py (clés CELERY_*)
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# Tâches des applications (modules tasks.py)
+app.autodiscover_tasks()
@@ -192,10 +192,46 @@ DUFFEL_LIVE_MODE = False  # False = test, True = production
 # Configuration des timeouts et rate limits
 DUFFEL_CONFIG = {
     'REQUEST_TIMEOUT': 30,  # Timeout des requêtes en secondes
-    'RATE_LIMIT_PER_MINUTE': 60,  # Limite de requêtes par minute
+    'RATE_LIMIT_PER_MINUTE': 60,  # Limite de requêtes par minute (seau à jetons, None = désactivée)
+    'RATE_LIMIT_BURST': None,  # Requêtes possibles d'un coup (défaut: RATE_LIMIT_PER_MINUTE)
+    'RATE_LIMIT_MAX_WAIT': 10,  # Attente maximale d'un jeton avant refus, en secondes
+    'PRIORITY_CONCURRENCY': {'order': 4, 'offer': 8, 'search': 16},  # Appels simultanés par classe et par processus
+    'PRIORITY_RESERVED_TOKENS': {'order': 0, 'offer': 5, 'search': 15},  # Jetons que la classe laisse aux classes supérieures
     'OFFER_CACHE_TTL': 900,  # Cache des offres en secondes (15 min)
+    'CACHE_ALIAS': 'default',  # Alias du cache Django utilisé pour les recherches
     'MAX_RETRIES': 3,  # Nombre de tentatives en cas d'échec
     'RETRY_DELAY': 1,  # Délai entre les tentatives en secondes
+    'RETRY_MAX_DELAY': 8,  # Plafond du backoff exponentiel (hors Retry-After), en secondes
+    'RETRY_BUDGET': 20,  # Durée totale maximale d'un appel avec ses tentatives, en secondes
+
+    # Disjoncteur (incident Duffel : échec immédiat, recherches servies depuis la dernière copie)
+    'CIRCUIT_BREAKER': True,
+    'CIRCUIT_WINDOW': 30,  # Fenêtre d'observation des appels, en secondes
+    'CIRCUIT_MIN_CALLS': 10,  # Appels minimum dans la fenêtre avant de pouvoir s'ouvrir
+    'CIRCUIT_ERROR_RATE': 0.5,  # Part d'appels en erreur (connexion, 5xx) qui ouvre le disjoncteur
+    'CIRCUIT_SLOW_CALL': 10,  # Durée au-delà de laquelle un appel est lent, en secondes
+    'CIRCUIT_SLOW_RATE': 0.5,  # Part d'appels lents qui ouvre le disjoncteur
+    'CIRCUIT_OPEN_SECONDS': 30,  # Durée d'ouverture avant l'appel d'essai
+
+    # Journalisation (une ligne par appel via le logger ModuleFlight.duffel.calls)
+    'LOG_WIRE_SAMPLE_RATE': 0,  # Part des appels dont requête et réponse sont tracées en entier (0 = aucun, 0.01 = 1 %)
+
+    # Transport HTTP (session mutualisée par processus)
+    'KEEP_ALIVE': True,  # Réutilisation des connexions TCP/TLS
+    'POOL_CONNECTIONS': 4,  # Nombre de pools (hôtes) conservés
+    'POOL_MAXSIZE': 20,  # Connexions simultanées par hôte
+    'POOL_BLOCK': False,  # Attendre une connexion libre plutôt qu'en ouvrir une en plus
+    'ASYNC_MAX_CONNECTIONS': 200,  # Connexions simultanées du client asyncio (httpx)
+    'INLINE_OFFERS': True,  # Offres lues dans la réponse de offer_requests (un seul aller-retour)
+    'OFFERS_PAGE_SIZE': 200,  # Taille des pages de GET offers (maximum Duffel)
+    'STREAM_OFFERS': True,  # Offres décodées au fil de la réponse (seules les SEARCH_RESULTS_LIMIT moins chères restent en mémoire)
+    'STREAM_CHUNK_SIZE': 65536,  # Taille des blocs lus sur la connexion en mode STREAM_OFFERS (octets)
+    'SEARCH_MAX_WORKERS': 7,  # Recherches Duffel parallèles par requête (dates flexibles...)
+
+    # Coordination entre workers (facultatif)
+    'REDIS_URL': None,  # ex: 'redis://localhost:6379/2' (regroupement et limite de débit entre processus)
+    'COALESCE_REQUESTS': True,  # Un seul appel Duffel pour les recherches/offres identiques simultanées
+    'COALESCE_TIMEOUT': 35,  # Attente maximale d'un appel en cours (et durée du verrou Redis)
 }
 
 # Types de paiement supportés par Duffel
@@ -210,10 +246,39 @@ FLIGHT_CONFIG = {
     'MAX_PASSENGERS_PER_BOOKING': 9,  # Limite Duffel
     'BOOKING_EXPIRY_HOURS': 24,  # Expiration des réservations en heures
     'CURRENCY_DEFAULT': 'EUR',
-    'SEARCH_RESULTS_LIMIT': 50,
+    'SEARCH_RESULTS_LIMIT': 200,  # Offres conservées par recherche (les moins chères), affichées par pages
+    'RESULTS_PAGE_SIZE': 50,  # Offres par page de résultats (page de flight-list.html, API de résultats)
     'OFFER_EXPIRY_BUFFER': 300,  # Buffer avant expiration offre (5 min)
     'AUTO_CONFIRM_BOOKINGS': True,  # Confirmation automatique des réservations
     'CACHE_SEARCH_RESULTS': True,  # Cache des résultats de recherche
+    'CACHE_OFFERS': True,  # Stock des offres par ID (détail, réservation, API)
+    'ASYNC_SEARCH_VIEWS': False,  # Résultats et API de recherche en vues async (Daphne/ASGI)
+    'MAX_FLEX_DAYS': 3,  # Amplitude maximale des dates flexibles (±N jours)
+    'MULTI_CITY_MAX_LEGS': 6,  # Trajets d'une recherche multi-destinations (recherche combinée + un aller simple par trajet, en parallèle)
+    'MULTI_CITY_ITINERARIES': 20,  # Itinéraires en billets séparés proposés (combinaisons d'allers simples les moins chères)
+    'VALIDATE_AIRPORT_CODES': True,  # Refuser les codes IATA absents de l'index local (ModuleFlight/data)
+    'AIRPORT_SUGGESTIONS': 8,  # Suggestions par défaut de l'autocomplétion des aéroports
+    'AIRPORT_SUGGESTIONS_MAX': 20,  # Plafond du paramètre limit de l'autocomplétion
+    'AIRPORT_SUGGESTIONS_CACHE_TTL': 86400,  # Cache navigateur des suggestions (Cache-Control), en secondes
+    'REFERENCE_STORE_PATH': str(BASE_DIR / 'data' / 'flight_reference.bin'),  # Référentiel aéroports/compagnies/appareils (manage.py build_flight_reference)
+    'REFERENCE_STORE_SOURCE': 'duffel',  # Source du référentiel : listes Duffel (complétées par l'instantané) ou 'snapshot'
+    'REFERENCE_STORE_CHECK_INTERVAL': 60,  # Vérification du remplacement du fichier par les workers, en secondes
+    'REFERENCE_STORE_CACHE_SIZE': 4096,  # Enregistrements décodés gardés par processus
+    'STREAM_RESULTS': False,  # Page de résultats alimentée en flux (Server-Sent Events)
+    'FETCH_ALL_OFFERS': False,  # Parcourir toutes les pages d'offres (garder les SEARCH_RESULTS_LIMIT moins chères)
+    'MAX_OFFERS_SCANNED': 1000,  # Plafond d'offres parcourues en mode FETCH_ALL_OFFERS
+    'STREAM_PAGE_SIZE': 10,  # Offres lues par page en mode flux (la 1re page s'affiche dès réception)
+    'REQUEST_DEADLINE': 25,  # Budget de temps d'une page/API pour l'ensemble de ses appels Duffel, en secondes
+    'STALE_RESULTS_TTL': 21600,  # Copie de secours des recherches servie pendant un incident Duffel (6 h, 0 = désactivée)
+    'RESULTS_INDEX_SIZE': 32,  # Recherches dont l'index de filtre/tri reste en mémoire, par processus
+    'RESULTS_DEFAULT_SORT': 'best',  # Ordre des offres de la page de résultats et de l'API (best, price, duration...)
+    # Poids relatifs du tri « meilleur » (0 = critère ignoré)
+    'BEST_SORT_WEIGHTS': {
+        'price': 0.5,
+        'duration': 0.3,
+        'stops': 0.15,
+        'emissions': 0.05
+    },
     
     # Classes de cabine supportées par Duffel
     'CABIN_CLASSES': {
@@ -245,6 +310,12 @@ LOGGING = {
             'level': 'DEBUG',
             'class': 'logging.StreamHandler',
         },
+        # Appels Duffel : une ligne JSON par appel, écrite hors du thread de la requête
+        'duffel_queue': {
+            'level': 'DEBUG',
+            'class': 'ModuleFlight.duffel_logging.QueueHandler',
+            'queue_size': 10000,
+        },
     },
     'loggers': {
         'ModuleFlight': {
@@ -252,5 +323,29 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'ModuleFlight.duffel': {
+            'handlers': ['duffel_queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        # Traces complètes échantillonnées (DUFFEL_CONFIG['LOG_WIRE_SAMPLE_RATE'])
+        'ModuleFlight.duffel.wire': {
+            'level': 'DEBUG',
+        },
+    },
+}
+
+# Celery (tâches planifiées, voir YXPLORE_NODE/celery.py)
+from celery.schedules import crontab
+
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = 'django-db'  # django_celery_results
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    # Référentiel des aéroports, compagnies et appareils (fichier partagé par les workers)
+    'flight-refresh-reference-store': {
+        'task': 'ModuleFlight.tasks.refresh_reference_store',
+        'schedule': crontab(hour=3, minute=30),
     },
 }
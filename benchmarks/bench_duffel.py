@@ -0,0 +1,1068 @@
+#!/usr/bin/env python3
+"""
+Benchmarks du service Duffel contre un serveur local simulant l'API
+
+Usage (depuis la racine du projet):
+    python benchmarks/bench_duffel.py pool [--iterations 50] [--handshake-ms 30] [--latency-ms 20]
+    python benchmarks/bench_duffel.py async [--concurrency 200] [--workers 8] [--latency-ms 500]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import django
+
+# Configuration Django (le projet est le dossier parent de benchmarks/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'YXPLORE_NODE.settings')
+django.setup()
+
+from django.conf import settings
+
+from ModuleFlight.duffel_service import DuffelService, DuffelAPIError
+from ModuleFlight.duffel_async import AsyncDuffelService
+from ModuleFlight.duffel_deadline import deadline
+from ModuleFlight.duffel_logging import QueueHandler
+from ModuleFlight.duffel_offers import format_offer, normalize_offers, select_fields
+from ModuleFlight.duffel_results import ResultsStore
+
+
+# ===== SERVEUR LOCAL SIMULANT DUFFEL =====
+
+CARRIERS = [
+    ('AF', 'Air France'), ('KQ', 'Kenya Airways'), ('ET', 'Ethiopian Airlines'),
+    ('SN', 'Brussels Airlines'), ('TK', 'Turkish Airlines'), ('EK', 'Emirates'),
+]
+
+
+def make_offer(index, origin, destination, departure_date, offers_ttl=1800):
+    """Génère une offre au format Duffel v2 (champs utilisés par le formatage)"""
+    rng = random.Random(index)
+    code, name = CARRIERS[index % len(CARRIERS)]
+    stops = rng.choice([0, 0, 1, 1, 2])
+    departing = datetime.fromisoformat(f"{departure_date}T06:00:00") + timedelta(minutes=rng.randint(0, 960))
+    segments = []
+    cursor = departing
+    airports = [origin] + [f"X{chr(65 + index % 26)}{chr(65 + stop)}" for stop in range(stops)] + [destination]
+    for leg in range(stops + 1):
+        minutes = rng.randint(60, 420)
+        arriving = cursor + timedelta(minutes=minutes)
+        segments.append({
+            'id': f"seg_{index}_{leg}",
+            'origin': {'iata_code': airports[leg], 'name': f"Aéroport {airports[leg]}", 'city_name': airports[leg],
+                       'latitude': 0.0, 'longitude': 0.0, 'time_zone': 'Africa/Kinshasa'},
+            'destination': {'iata_code': airports[leg + 1], 'name': f"Aéroport {airports[leg + 1]}",
+                            'city_name': airports[leg + 1], 'latitude': 0.0, 'longitude': 0.0,
+                            'time_zone': 'Europe/Paris'},
+            'origin_terminal': '1',
+            'destination_terminal': '2',
+            'departing_at': cursor.isoformat(),
+            'arriving_at': arriving.isoformat(),
+            'duration': f"PT{minutes // 60}H{minutes % 60}M",
+            'distance': str(rng.randint(300, 6000)),
+            'operating_carrier': {'id': f"arl_{code}", 'name': name, 'iata_code': code,
+                                  'logo_symbol_url': f"https://assets.duffel.com/img/airlines/{code}.svg"},
+            'marketing_carrier': {'id': f"arl_{code}", 'name': name, 'iata_code': code,
+                                  'logo_symbol_url': f"https://assets.duffel.com/img/airlines/{code}.svg"},
+            'operating_carrier_flight_number': str(100 + index),
+            'marketing_carrier_flight_number': str(100 + index),
+            'stops': [],
+            'aircraft': {'iata_code': '359', 'name': 'Airbus A350-900', 'id': 'arc_359'},
+            'passengers': [{'passenger_id': 'pas_0', 'cabin_class': 'economy', 'baggages': []}],
+        })
+        cursor = arriving + timedelta(minutes=rng.randint(45, 180))
+    total = (cursor - departing).total_seconds() // 60
+    amount = round(rng.uniform(150, 2500), 2)
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=offers_ttl)
+    return {
+        'id': f"off_{uuid.uuid4().hex[:22]}",
+        'total_amount': f"{amount:.2f}",
+        'total_currency': 'EUR',
+        'base_amount': f"{amount * 0.8:.2f}",
+        'base_currency': 'EUR',
+        'tax_amount': f"{amount * 0.2:.2f}",
+        'tax_currency': 'EUR',
+        'total_emissions_kg': str(rng.randint(80, 900)),
+        'owner': {'id': f"arl_{code}", 'name': name, 'iata_code': code,
+                  'logo_symbol_url': f"https://assets.duffel.com/img/airlines/{code}.svg",
+                  'logo_lockup_url': f"https://assets.duffel.com/img/airlines/{code}-lockup.svg"},
+        'passenger_identity_documents_required': False,
+        'live_mode': False,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'expires_at': expires_at.isoformat().replace('+00:00', 'Z'),
+        'partial': False,
+        'slices': [{
+            'id': f"sli_{index}",
+            'fare_brand_name': 'Basic',
+            'duration': f"PT{int(total // 60)}H{int(total % 60)}M",
+            'segments': segments,
+            'conditions': {'change_before_departure': {'allowed': True, 'penalty_amount': '50.00',
+                                                       'penalty_currency': 'EUR'}},
+        }],
+        'payment_requirements': {'requires_instant_payment': False,
+                                 'price_guarantee_expires_at': None,
+                                 'payment_required_by': None},
+        'conditions': {'refund_before_departure': {'allowed': False},
+                       'change_before_departure': {'allowed': True, 'penalty_amount': '50.00',
+                                                   'penalty_currency': 'EUR'}},
+        'passengers': [{'id': 'pas_0', 'type': 'adult', 'age': None, 'family_name': None, 'given_name': None,
+                        'fare_type': None, 'loyalty_programme_accounts': []}],
+        'supported_passenger_identity_document_types': ['passport'],
+        'supported_loyalty_programmes': [],
+        'available_services': [],
+    }
+
+
+class _StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # Accepter des centaines de connexions simultanées
+
+    def handle_error(self, request, client_address):
+        # Client parti avant la réponse (timeout simulé) : sans intérêt pour le benchmark
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class DuffelStandIn:
+    """
+    Serveur HTTP/1.1 local imitant les endpoints Duffel utilisés par le service
+
+    handshake_ms simule le coût d'établissement d'une connexion (TCP + TLS),
+    latency_ms le temps de traitement de chaque requête, per_offer_ms le coût
+    (sérialisation + transfert) de chaque offre renvoyée, fail_rate la part des
+    requêtes répondues en 503 (indisponibilité passagère).
+    """
+
+    def __init__(self, offers=50, handshake_ms=0, latency_ms=0, per_offer_ms=0, fail_rate=0):
+        self.offers = offers
+        self.fail_rate = fail_rate
+        self.failures = 0
+        self.handshake_ms = handshake_ms
+        self.latency_ms = latency_ms
+        self.per_offer_ms = per_offer_ms
+        self.offer_requests = {}
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.server = _StandInServer(('127.0.0.1', 0), self._handler_class())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/air"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # En-têtes et corps envoyés sans attendre l'ACK retardé du client
+
+            def setup(self):
+                super().setup()
+                with stand_in.lock:
+                    stand_in.connections += 1
+                if stand_in.handshake_ms:
+                    time.sleep(stand_in.handshake_ms / 1000)
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, offers=0):
+                if offers and stand_in.per_offer_ms:
+                    time.sleep(offers * stand_in.per_offer_ms / 1000)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _fail(self):
+                """Répond 503 à une part fail_rate des requêtes"""
+                if not stand_in.fail_rate or random.random() >= stand_in.fail_rate:
+                    return False
+                with stand_in.lock:
+                    stand_in.failures += 1
+                self._send(503, {'errors': [{'message': 'Service temporarily unavailable'}]})
+                return True
+
+            def _body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b'{}')
+
+            def do_POST(self):
+                if stand_in.latency_ms:
+                    time.sleep(stand_in.latency_ms / 1000)
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                body = self._body()
+                if self._fail():
+                    return None
+                if url.path.endswith('/offer_requests'):
+                    data = body['data']
+                    first = data['slices'][0]
+                    offers = [make_offer(i, first['origin'], first['destination'], first['departure_date'])
+                              for i in range(stand_in.offers)]
+                    request_id = f"orq_{uuid.uuid4().hex[:22]}"
+                    with stand_in.lock:
+                        stand_in.offer_requests[request_id] = offers
+                    payload = {
+                        'id': request_id,
+                        'slices': data['slices'],
+                        'passengers': [{'id': f"pas_{i}", 'type': p.get('type', 'adult')}
+                                       for i, p in enumerate(data['passengers'])],
+                        'cabin_class': data.get('cabin_class'),
+                    }
+                    if query.get('return_offers', ['true'])[0] != 'false':
+                        payload['offers'] = offers
+                    return self._send(201, {'data': payload}, len(payload.get('offers', [])))
+                if url.path.endswith('/orders'):
+                    return self._send(201, {'data': {'id': f"ord_{uuid.uuid4().hex[:22]}"}})
+                return self._send(404, {'errors': [{'message': 'Not found'}]})
+
+            def do_GET(self):
+                if stand_in.latency_ms:
+                    time.sleep(stand_in.latency_ms / 1000)
+                if self._fail():
+                    return None
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path.endswith('/offers'):
+                    with stand_in.lock:
+                        offers = stand_in.offer_requests.get(query.get('offer_request_id', [''])[0], [])
+                    limit = int(query.get('limit', ['50'])[0])
+                    start = int(query.get('after', ['0'])[0])
+                    page = offers[start:start + limit]
+                    after = str(start + limit) if start + limit < len(offers) else None
+                    return self._send(200, {'data': page, 'meta': {'limit': limit, 'after': after, 'before': None}},
+                                      len(page))
+                if '/offers/' in url.path:
+                    offer_id = url.path.rsplit('/', 1)[-1]
+                    with stand_in.lock:
+                        for offers in stand_in.offer_requests.values():
+                            for offer in offers:
+                                if offer['id'] == offer_id:
+                                    return self._send(200, {'data': offer})
+                    return self._send(404, {'errors': [{'message': 'Offer not found'}]})
+                return self._send(404, {'errors': [{'message': 'Not found'}]})
+
+        return Handler
+
+
+# ===== OUTILS =====
+
+def percentile(values, pct):
+    """Percentile simple (valeurs triées, interpolation au plus proche)"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def print_latencies(label, values):
+    print(f"   {label:<28} p50={percentile(values, 50) * 1000:8.2f} ms   "
+          f"p95={percentile(values, 95) * 1000:8.2f} ms   moy={statistics.mean(values) * 1000:8.2f} ms")
+
+
+def make_service(base_url, service_class=DuffelService, **overrides):
+    """DuffelService pointant vers le serveur local (sans regroupement ni limite de débit, sauf demande)"""
+    config = dict(getattr(settings, 'DUFFEL_CONFIG', {}), COALESCE_REQUESTS=False, RATE_LIMIT_PER_MINUTE=None)
+    config.update(overrides)
+    return service_class(base_url=base_url, config=config)
+
+
+SEARCH_PARAMS = {
+    'origin': 'FIH',
+    'destination': 'CDG',
+    'departure_date': date.today() + timedelta(days=30),
+    'passengers': 1,
+    'cabin_class': 'economy',
+}
+
+
+def search_once(service):
+    service.search_flights(use_cache=False, **SEARCH_PARAMS)
+
+
+# ===== SCÉNARIOS =====
+
+def bench_pool(args):
+    """Latence de recherche : connexion par requête vs session keep-alive mutualisée"""
+    print(f"🔌 Pool de connexions ({args.iterations} recherches, handshake simulé {args.handshake_ms} ms, "
+          f"latence {args.latency_ms} ms)")
+    with DuffelStandIn(offers=args.offers, handshake_ms=args.handshake_ms, latency_ms=args.latency_ms) as stand_in:
+        for label, keep_alive in (('sans keep-alive', False), ('session mutualisée', True)):
+            service = make_service(stand_in.base_url, KEEP_ALIVE=keep_alive)
+            search_once(service)  # Préchauffage
+            stand_in.connections = 0
+            timings = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                search_once(service)
+                timings.append(time.perf_counter() - started)
+            print_latencies(label, timings)
+            print(f"   {'':<28} connexions ouvertes côté serveur: {stand_in.connections}")
+            service.transport.close()
+
+
+def bench_async(args):
+    """Débit de recherches concurrentes : threads bloquants vs client asyncio"""
+    print(f"⚡ Sync vs async ({args.concurrency} recherches simultanées, latence {args.latency_ms} ms, "
+          f"{args.workers} threads côté sync)")
+    with DuffelStandIn(offers=args.offers, latency_ms=args.latency_ms) as stand_in:
+        service = make_service(stand_in.base_url)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            list(pool.map(lambda _: search_once(service), range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        print(f"   {'sync (threads)':<28} {elapsed:7.2f} s   {args.concurrency / elapsed:8.1f} recherches/s")
+        service.transport.close()
+
+        async_service = make_service(stand_in.base_url, AsyncDuffelService)
+
+        async def run_async():
+            await asyncio.gather(*(
+                async_service.search_flights(use_cache=False, **SEARCH_PARAMS)
+                for _ in range(args.concurrency)
+            ))
+            await async_service.async_transport.aclose()
+
+        started = time.perf_counter()
+        asyncio.run(run_async())
+        elapsed = time.perf_counter() - started
+        print(f"   {'async (une boucle)':<28} {elapsed:7.2f} s   {args.concurrency / elapsed:8.1f} recherches/s")
+
+
+def bench_flex(args):
+    """Recherche à dates flexibles : dates l'une après l'autre vs fan-out parallèle"""
+    print(f"📅 Dates flexibles (±{args.flex_days} jours, latence {args.latency_ms} ms, "
+          f"{args.iterations} recherches)")
+    with DuffelStandIn(offers=args.offers, latency_ms=args.latency_ms) as stand_in:
+        service = make_service(stand_in.base_url, SEARCH_MAX_WORKERS=args.workers)
+        search_once(service)  # Préchauffage
+
+        def sequential():
+            for delta in range(-args.flex_days, args.flex_days + 1):
+                params = dict(SEARCH_PARAMS, departure_date=SEARCH_PARAMS['departure_date'] + timedelta(days=delta))
+                service.search_flights(use_cache=False, **params)
+
+        def fan_out():
+            service.search_flights(use_cache=False, flex_days=args.flex_days, **SEARCH_PARAMS)
+
+        for label, run in (('séquentiel', sequential), (f'parallèle ({args.workers} workers)', fan_out)):
+            timings = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - started)
+            print_latencies(label, timings)
+        service.transport.close()
+
+
+def bench_multicity(args):
+    """Multi-destinations : recherche combinée et allers simples l'un après l'autre vs en parallèle"""
+    airports = ['FIH', 'CDG', 'JFK', 'LOS', 'NBO', 'DXB', 'FIH']
+    legs = [
+        {'origin': origin, 'destination': destination,
+         'departure_date': SEARCH_PARAMS['departure_date'] + timedelta(days=3 * index)}
+        for index, (origin, destination) in enumerate(zip(airports, airports[1:args.legs + 1]))
+    ]
+    print(f"🗺️  Multi-destinations ({len(legs)} trajets, latence {args.latency_ms} ms, {args.offers} offres, "
+          f"{args.iterations} recherches)")
+    with DuffelStandIn(offers=args.offers, latency_ms=args.latency_ms) as stand_in:
+        for label, workers in (('séquentiel', 1), (f'parallèle ({args.workers} workers)', args.workers)):
+            service = make_service(stand_in.base_url, SEARCH_MAX_WORKERS=workers)
+            service.search_flights(use_cache=False, legs=legs, **SEARCH_PARAMS)  # Préchauffage
+            timings = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                results = service.search_flights(use_cache=False, legs=legs, **SEARCH_PARAMS)
+                timings.append(time.perf_counter() - started)
+            print_latencies(label, timings)
+            summary = results['multi_city_summary']
+            print(f"   {'':<28} billet unique: {summary['combined_amount']}   billets séparés: "
+                  f"{summary['separate_amount']}   itinéraires: {len(results['itineraries'])}")
+            service.transport.close()
+
+
+def bench_stream(args):
+    """Délai avant la première offre : recherche complète vs lecture en flux"""
+    print(f"🌊 Flux des résultats ({args.iterations} recherches, {args.offers} offres, latence {args.latency_ms} ms, "
+          f"{args.per_offer_ms} ms par offre)")
+    with DuffelStandIn(offers=args.offers, latency_ms=args.latency_ms, per_offer_ms=args.per_offer_ms) as stand_in:
+        service = make_service(stand_in.base_url)
+        search_once(service)  # Préchauffage
+
+        full, first, stream_total = [], [], []
+        for _ in range(args.iterations):
+            started = time.perf_counter()
+            search_once(service)
+            full.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            for index, _offer in enumerate(service.iter_search_offers(use_cache=False, **SEARCH_PARAMS)):
+                if index == 0:
+                    first.append(time.perf_counter() - started)
+            stream_total.append(time.perf_counter() - started)
+
+        print_latencies('recherche complète', full)
+        print_latencies('flux: première offre', first)
+        print_latencies('flux: dernière offre', stream_total)
+        service.transport.close()
+
+
+def bench_inline(args):
+    """Latence de recherche : offres incluses dans offer_requests vs offer_request puis /offers"""
+    print(f"🎯 Offres inline ({args.iterations} recherches, {args.offers} offres, latence {args.latency_ms} ms, "
+          f"{args.per_offer_ms} ms par offre)")
+    with DuffelStandIn(offers=args.offers, latency_ms=args.latency_ms, per_offer_ms=args.per_offer_ms) as stand_in:
+        for label, inline in (('deux temps', False), ('un aller-retour', True)):
+            service = make_service(stand_in.base_url, INLINE_OFFERS=inline)
+            search_once(service)  # Préchauffage
+            timings = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                search_once(service)
+                timings.append(time.perf_counter() - started)
+            print_latencies(label, timings)
+            service.transport.close()
+
+
+def bench_pages(args):
+    """Parcours complet du curseur (tas des K moins chères) vs première page seulement"""
+    print(f"📚 Toutes les pages ({args.offers} offres, pages de {args.page_size}, latence {args.latency_ms} ms, "
+          f"{args.per_offer_ms} ms par offre)")
+    with DuffelStandIn(offers=args.offers, latency_ms=args.latency_ms, per_offer_ms=args.per_offer_ms) as stand_in:
+        for label, fetch_all in (('première page', False), ('toutes les pages', True)):
+            service = make_service(stand_in.base_url, INLINE_OFFERS=False, OFFERS_PAGE_SIZE=args.page_size)
+            service.fetch_all_offers = fetch_all
+            service.max_offers_scanned = args.offers
+            search_once(service)  # Préchauffage
+            timings = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                search_once(service)
+                timings.append(time.perf_counter() - started)
+            results = service.search_flights(use_cache=False, **SEARCH_PARAMS)
+
+            print_latencies(label, timings)
+            print(f"   {'':<28} offre la moins chère: {results['offers'][0]['total_amount']} EUR   "
+                  f"offres conservées: {len(results['offers'])}")
+            service.transport.close()
+
+
+def bench_coalesce(args):
+    """Recherches identiques simultanées : un appel amont chacune vs regroupées"""
+    print(f"🤝 Regroupement ({args.concurrency} recherches identiques simultanées, {args.workers} threads, "
+          f"latence {args.latency_ms} ms)")
+    with DuffelStandIn(offers=args.offers, latency_ms=args.latency_ms) as stand_in:
+        for label, coalesce in (('sans regroupement', False), ('regroupées', True)):
+            service = make_service(stand_in.base_url, COALESCE_REQUESTS=coalesce)
+            with stand_in.lock:
+                stand_in.offer_requests.clear()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                list(pool.map(lambda _: search_once(service), range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+            print(f"   {label:<28} {elapsed:7.2f} s   offer_requests créées: {len(stand_in.offer_requests)}")
+            service.transport.close()
+
+
+def bench_ratelimit(args):
+    """Rafale de recherches face au seau à jetons : attente en file plutôt qu'erreurs"""
+    per_minute = args.rate_per_minute
+    print(f"🚦 Limite de débit ({args.concurrency} recherches, {per_minute} req/min, rafale {args.burst}, "
+          f"attente max {args.max_wait} s)")
+    with DuffelStandIn(offers=args.offers, latency_ms=args.latency_ms) as stand_in:
+        service = make_service(stand_in.base_url, RATE_LIMIT_PER_MINUTE=per_minute,
+                               RATE_LIMIT_BURST=args.burst, RATE_LIMIT_MAX_WAIT=args.max_wait)
+        outcomes = []
+
+        def run(_):
+            started = time.perf_counter()
+            try:
+                search_once(service)
+                outcomes.append(('ok', time.perf_counter() - started))
+            except DuffelAPIError:
+                outcomes.append(('refusée', time.perf_counter() - started))
+
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            list(pool.map(run, range(args.concurrency)))
+        for status in ('ok', 'refusée'):
+            timings = [elapsed for outcome, elapsed in outcomes if outcome == status]
+            if timings:
+                print_latencies(f"{status} ({len(timings)})", timings)
+        service.transport.close()
+
+
+def bench_priority(args):
+    """Réservations pendant une rafale de recherches, avec et sans priorités"""
+    per_minute = args.rate_per_minute
+    print(f"🎫 Priorités ({args.concurrency} recherches sur {args.workers} threads, {args.iterations} réservations, "
+          f"{per_minute} req/min, rafale {args.burst}, attente max {args.max_wait} s)")
+    with DuffelStandIn(offers=args.offers, latency_ms=args.latency_ms) as stand_in:
+        for label, reserved in (('sans priorité', {'order': 0, 'offer': 0, 'search': 0}),
+                                ('avec priorités', {'order': 0, 'offer': args.burst // 4, 'search': args.burst // 2})):
+            service = make_service(stand_in.base_url, RATE_LIMIT_PER_MINUTE=per_minute, RATE_LIMIT_BURST=args.burst,
+                                   RATE_LIMIT_MAX_WAIT=args.max_wait, PRIORITY_RESERVED_TOKENS=reserved,
+                                   PRIORITY_CONCURRENCY={'search': args.workers})
+            bookings = {'ok': [], 'refusée': []}
+
+            def search(_):
+                try:
+                    search_once(service)
+                except DuffelAPIError:
+                    pass
+
+            def book():
+                for _ in range(args.iterations):
+                    time.sleep(0.05)
+                    started = time.perf_counter()
+                    try:
+                        service._make_request('POST', 'orders', data={'data': {}})
+                        bookings['ok'].append(time.perf_counter() - started)
+                    except DuffelAPIError:
+                        bookings['refusée'].append(time.perf_counter() - started)
+
+            with ThreadPoolExecutor(max_workers=args.workers + 1) as pool:
+                booker = pool.submit(book)
+                list(pool.map(search, range(args.concurrency)))
+                booker.result()
+            for status, timings in bookings.items():
+                if timings:
+                    print_latencies(f"{label} {status} ({len(timings)})", timings)
+            service.transport.close()
+
+
+def bench_retry(args):
+    """Recherches face à des 503 passagers : sans nouvelles tentatives vs backoff + jitter"""
+    print(f"🔁 Nouvelles tentatives ({args.iterations} recherches, {args.fail_rate:.0%} de 503, "
+          f"latence {args.latency_ms} ms)")
+    with DuffelStandIn(offers=args.offers, latency_ms=args.latency_ms, fail_rate=args.fail_rate) as stand_in:
+        for label, retries in (('sans nouvelle tentative', 0), (f'{args.max_retries} tentatives max', args.max_retries)):
+            service = make_service(stand_in.base_url, MAX_RETRIES=retries, RETRY_DELAY=0.05, RETRY_MAX_DELAY=0.5)
+            timings, failed = [], 0
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                try:
+                    search_once(service)
+                    timings.append(time.perf_counter() - started)
+                except DuffelAPIError:
+                    failed += 1
+            if timings:
+                print_latencies(label, timings)
+            print(f"   {'':<28} recherches en échec: {failed}/{args.iterations}")
+            service.transport.close()
+
+
+def bench_circuit(args):
+    """Incident Duffel (réponses plus lentes que le timeout) : sans disjoncteur vs disjoncteur + résultats périmés"""
+    outage_ms = args.outage_ms
+    print(f"🔌 Disjoncteur ({args.iterations} recherches pendant un incident à {outage_ms} ms, timeout {args.timeout} s)")
+    with DuffelStandIn(offers=args.offers, latency_ms=args.latency_ms) as stand_in:
+        for label, breaker in (('sans disjoncteur', False), ('avec disjoncteur', True)):
+            service = make_service(stand_in.base_url, CIRCUIT_BREAKER=breaker, CIRCUIT_MIN_CALLS=5,
+                                   CIRCUIT_OPEN_SECONDS=1, REQUEST_TIMEOUT=args.timeout, MAX_RETRIES=0)
+            service.search_cache.enabled = False  # Seule la copie de secours est utilisée
+            service.search_cache.delete(**SEARCH_PARAMS)
+            service.search_flights(**SEARCH_PARAMS)
+
+            stand_in.latency_ms = outage_ms
+            timings, stale, failed = [], 0, 0
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                try:
+                    stale += bool(service.search_flights(**SEARCH_PARAMS).get('stale'))
+                except DuffelAPIError:
+                    failed += 1
+                timings.append(time.perf_counter() - started)
+            print_latencies(label, timings)
+            print(f"   {'':<28} périmées: {stale}   en échec: {failed}   "
+                  f"temps total: {sum(timings):.1f} s")
+
+            stand_in.latency_ms = args.latency_ms
+            if breaker:
+                time.sleep(service.circuit.open_seconds)
+                service.search_flights(**SEARCH_PARAMS)  # Semi-ouvert : périmé + rafraîchissement en arrière-plan
+                time.sleep(0.5)
+                results = service.search_flights(**SEARCH_PARAMS)
+                print(f"   {'':<28} après l'incident: disjoncteur {service.circuit.state}, "
+                      f"résultats {'périmés' if results.get('stale') else 'frais'}")
+            service.transport.close()
+
+
+def bench_deadline(args):
+    """Action enchaînant plusieurs appels Duffel lents : sans budget vs budget de requête"""
+    print(f"⏱️  Budget de requête (recherche + 2 lectures d'offre, latence {args.latency_ms} ms, "
+          f"timeout {args.timeout} s, budget {args.deadline} s)")
+    with DuffelStandIn(offers=args.offers, latency_ms=args.latency_ms) as stand_in:
+        for label, budget in (('sans budget', None), (f'budget {args.deadline} s', args.deadline)):
+            service = make_service(stand_in.base_url, REQUEST_TIMEOUT=args.timeout, MAX_RETRIES=0,
+                                   CIRCUIT_BREAKER=False)
+            service.search_cache.enabled = False
+            service.offer_cache.enabled = False
+            timings, failed = [], 0
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                try:
+                    with deadline(budget):
+                        offers = service.search_flights(**SEARCH_PARAMS)['offers']
+                        service.get_offer_details(offers[0]['id'])
+                        service.get_offer_details(offers[1]['id'])
+                except DuffelAPIError:
+                    failed += 1
+                timings.append(time.perf_counter() - started)
+            print_latencies(label, timings)
+            print(f"   {'':<28} max={max(timings) * 1000:8.2f} ms   abandonnées: {failed}/{args.iterations}")
+            service.transport.close()
+
+
+CARD_FIELDS = ('id', 'total_amount', 'total_currency', 'base_amount', 'base_currency', 'tax_amount', 'tax_currency',
+               'total_emissions_kg', 'available_seats', 'passenger_identity_documents_required')
+
+
+def read_offer_card(offer):
+    """Lit les champs affichés par shared/offer-card.html"""
+    for field in CARD_FIELDS:
+        offer[field]
+    offer['owner']['name']
+    offer['conditions']['refundable']
+    offer.get('payment')
+    first_slice = offer['slices'][0]
+    first_slice['origin']['iata_code'], first_slice['destination']['iata_code'], first_slice['stops']
+    first_slice['segments'][0]['departing_at']
+
+
+def bench_format(args):
+    """Débit du formatage des offres : formatage seul, lecture par la carte d'offre, JSON complet"""
+    service = make_service('http://127.0.0.1:9')
+    print(f"🧾 Formatage des offres ({args.iterations} passes par taille)")
+    for size in (int(value) for value in args.sizes.split(',')):
+        offers = [make_offer(index, 'FIH', 'CDG', SEARCH_PARAMS['departure_date']) for index in range(size)]
+        cases = (
+            ('formatage seul', lambda offer: service.format_offer_for_frontend(offer)),
+            ('carte d\'offre', lambda offer: read_offer_card(service.format_offer_for_frontend(offer))),
+            ('JSON complet (API)', lambda offer: json.dumps(service.format_offer_for_frontend(offer))),
+        )
+        for label, format_one in cases:
+            timings = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                for offer in offers:
+                    format_one(offer)
+                timings.append(time.perf_counter() - started)
+            best = min(timings)
+            print(f"   {size:>5} offres, {label:<20} {best * 1000:8.2f} ms   {size / best:>10,.0f} offres/s")
+
+
+def bench_query(args):
+    """Requêtes sur des résultats en cache : index, score « meilleur », puis filtres, tris et facettes"""
+    offers = [make_offer(index, 'FIH', 'CDG', SEARCH_PARAMS['departure_date']) for index in range(args.offers)]
+    formatted_offers = [format_offer(offer) for offer in offers]
+    print(f"🔎 Requêtes sur les résultats ({args.offers} offres, {args.iterations} requêtes par cas)")
+
+    # Index reconstruit par un autre worker (relecture du cache)
+    store = ResultsStore()
+    search_id = store.put({'offer_request': {'id': f"orq_bench_{uuid.uuid4().hex[:12]}"}, 'offers': offers})
+    started = time.perf_counter()
+    store.get_index(search_id)
+    print(f"   {'index (depuis le cache)':<28} {(time.perf_counter() - started) * 1000:8.2f} ms")
+
+    # Page de résultats : index des offres formatées et classement par défaut
+    store = ResultsStore()
+    started = time.perf_counter()
+    search_id, _ = store.rank({'offer_request': {'id': f"orq_bench_{uuid.uuid4().hex[:12]}"}, 'offers': offers},
+                              formatted_offers)
+    print(f"   {'index + classement (page)':<28} {(time.perf_counter() - started) * 1000:8.2f} ms")
+    index = store.get_index(search_id)
+
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        index.scores()
+    print(f"   {'score meilleur (NumPy)':<28} {(time.perf_counter() - started) / args.iterations * 1000:8.2f} ms")
+
+    carriers = [code for code, _ in CARRIERS[:2]]
+    cases = (
+        ('tri meilleur', {'sort': 'best'}),
+        ('tri prix', {'sort': 'price'}),
+        ('tri durée', {'sort': 'duration'}),
+        ('escales 0,1 + tri départ', {'stops': [0, 1], 'sort': 'departure'}),
+        ('compagnies + prix max', {'carriers': carriers, 'max_price': 1200.0}),
+        ('tous filtres', {'carriers': carriers, 'stops': [0, 1], 'max_price': 1500.0, 'max_duration': 900,
+                          'depart_after': 8 * 60, 'depart_before': 20 * 60, 'sort': 'emissions'}),
+    )
+    for label, params in cases:
+        timings = []
+        for _ in range(args.iterations):
+            started = time.perf_counter()
+            result = store.query(search_id, limit=50, **params)
+            timings.append(time.perf_counter() - started)
+        print_latencies(label, timings)
+        print(f"   {'':<28} offres retenues: {result['total_offers']} / {len(index)}")
+
+
+def bench_render(args):
+    """Rendu des cartes d'offres de la page de résultats : toutes les offres vs première page"""
+    from django.template.loader import render_to_string
+    from ModuleFlight.views import build_results_context
+
+    print(f"🖼️  Rendu des résultats ({args.iterations} passes par taille)")
+    for size in (int(value) for value in args.sizes.split(',')):
+        offers = [make_offer(index, 'FIH', 'CDG', SEARCH_PARAMS['departure_date']) for index in range(size)]
+        formatted_offers = [format_offer(offer) for offer in offers]
+        results = {'offer_request': {'id': f"orq_bench_{uuid.uuid4().hex[:12]}"}, 'offers': offers}
+        context = build_results_context(results, {})
+        cases = (
+            ('rendu, toutes', lambda: render_to_string('ModuleFlight/shared/offer-page.html',
+                                                       {'offers': formatted_offers})),
+            ('rendu, page 1', lambda: render_to_string('ModuleFlight/shared/offer-page.html', context)),
+            ('contexte (page 1)', lambda: build_results_context(results, {})),
+        )
+        for label, run in cases:
+            timings = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                output = run()
+                timings.append(time.perf_counter() - started)
+            weight = f"{len(output) / 1024:9.0f} Ko" if isinstance(output, str) else ''
+            print(f"   {size:>5} offres, {label:<18} {min(timings) * 1000:9.2f} ms   {weight}")
+
+
+LIST_FIELDS = ['id', 'total_amount', 'total_currency', 'owner', 'slices']
+
+
+def bench_payload(args):
+    """Réponse de l'API de recherche : format complet vs normalisé, avec ou sans sélection de champs"""
+    from rest_framework.renderers import JSONRenderer
+
+    renderer = JSONRenderer()
+    offers = [make_offer(index, 'FIH', 'CDG', SEARCH_PARAMS['departure_date']) for index in range(args.offers)]
+    formatted_offers = [format_offer(offer) for offer in offers]
+    print(f"📦 Réponse de recherche ({args.offers} offres, {args.iterations} passes, champs: {','.join(LIST_FIELDS)})")
+    cases = (
+        ('complet', lambda: {'offers': formatted_offers}),
+        ('complet + champs', lambda: {'offers': select_fields(formatted_offers, LIST_FIELDS)}),
+        ('normalisé', lambda: normalize_offers(formatted_offers)),
+        ('normalisé + champs', lambda: normalize_offers(formatted_offers, LIST_FIELDS)),
+    )
+    for label, build in cases:
+        timings = []
+        for _ in range(args.iterations):
+            started = time.perf_counter()
+            body = renderer.render(build())
+            timings.append(time.perf_counter() - started)
+        print(f"   {label:<20} {len(body) / 1024:9.1f} Ko   {min(timings) * 1000:8.2f} ms")
+
+
+def bench_raw(args):
+    """API de recherche : offres décodées, formatées et réencodées vs corps Duffel relayé (format raw)"""
+    from rest_framework.renderers import JSONRenderer
+    from ModuleFlight.api_views import format_search_response, raw_search_response
+
+    renderer = JSONRenderer()
+    validated_data = dict(SEARCH_PARAMS, return_date=None, flex_days=0)
+    print(f"📨 Format raw ({args.offers} offres, {args.iterations} recherches)")
+    with DuffelStandIn(offers=args.offers) as stand_in:
+        service = make_service(stand_in.base_url)
+        cases = (
+            ('formaté (full)', lambda: renderer.render({
+                'success': True,
+                'data': format_search_response(service.search_flights(use_cache=False, **SEARCH_PARAMS), validated_data)
+            })),
+            ('relayé (raw)', lambda: raw_search_response(service.search_flights_raw(**SEARCH_PARAMS), validated_data).content),
+        )
+        for label, search in cases:
+            search()  # Préchauffage
+            timings, cpu = [], []
+            for _ in range(args.iterations):
+                started, cpu_started = time.perf_counter(), time.thread_time()
+                body = search()
+                timings.append(time.perf_counter() - started)
+                cpu.append(time.thread_time() - cpu_started)
+            print_latencies(label, timings)
+            print(f"   {'':<28} CPU du thread: {statistics.mean(cpu) * 1000:8.2f} ms   corps: {len(body) / 1024:.0f} Ko")
+        service.transport.close()
+
+
+def bench_airports(args):
+    """Autocomplétion des aéroports : une requête par frappe, index seul puis vue API complète"""
+    from django.test import RequestFactory
+    from ModuleFlight.airport_index import AirportIndex
+    from ModuleFlight.api_views import AirportAutocompleteAPIView
+
+    words = ('kinshasa', 'paris', 'londn', 'franfurt', 'new york', 'sao paulo', 'nairobi', 'lagos')
+    keystrokes = [word[:size] for word in words for size in range(2, len(word) + 1)]
+    print(f"🛫 Autocomplétion des aéroports ({len(keystrokes)} frappes, {args.iterations} passes)")
+
+    index = AirportIndex()
+    started = time.perf_counter()
+    index.search('pa')
+    print(f"   {'chargement (1er appel)':<28} {(time.perf_counter() - started) * 1000:8.2f} ms")
+
+    factory = RequestFactory()
+    view = AirportAutocompleteAPIView.as_view()
+    cases = (
+        ('index (search)', lambda term: index.search(term, limit=8)),
+        ('vue API (api/airports/)', lambda term: view(factory.get('/flights/api/airports/', {'q': term})).render()),
+    )
+    for label, lookup in cases:
+        timings = []
+        for _ in range(args.iterations):
+            for term in keystrokes:
+                started = time.perf_counter()
+                lookup(term)
+                timings.append(time.perf_counter() - started)
+        print_latencies(label, timings)
+
+
+def _private_memory_kb():
+    """Mémoire privée du processus (Private_Clean + Private_Dirty, Linux)"""
+    with open('/proc/self/smaps_rollup') as f:
+        return sum(int(line.split()[1]) for line in f if line.startswith(('Private_Clean', 'Private_Dirty')))
+
+
+def _reference_worker(mode, path, codes, connection):
+    """Processus lecteur : mémoire privée ajoutée par le chargement et la lecture de tous les codes"""
+    from ModuleFlight.reference_store import ReferenceStore, load_snapshot
+    before = _private_memory_kb()
+    if mode == 'mmap':
+        store = ReferenceStore(path, check_interval=3600, cache_size=0)
+        for code in codes:
+            store.airport(code)
+    else:
+        airports = load_snapshot()['airports']
+        for code in codes:
+            airports.get(code)
+    connection.send(_private_memory_kb() - before)
+    connection.close()
+
+
+def bench_reference(args):
+    """Référentiel partagé : construction, recherche par code, formatage avec/sans référentiel, mémoire par processus"""
+    import ModuleFlight.duffel_offers as duffel_offers
+    from ModuleFlight.reference_store import ReferenceStore, load_snapshot, write_reference_file
+
+    print(f"📚 Référentiel partagé ({args.iterations} passes, {args.workers} processus lecteurs)")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'flight_reference.bin')
+        started = time.perf_counter()
+        tables = load_snapshot()
+        counts = write_reference_file(path, tables)
+        print(f"   {'construction (snapshot)':<28} {(time.perf_counter() - started) * 1000:8.2f} ms   "
+              f"{os.path.getsize(path) / 1024:,.0f} Ko   {counts}")
+
+        codes = list(tables['airports'])
+        random.Random(0).shuffle(codes)
+        # Les offres citent surtout quelques centaines d'aéroports : le cache les garde décodés
+        hot_codes = codes[:500] * (len(codes) // 500)
+        cases = (
+            ('recherche (cache, 500 codes)', ReferenceStore(path, check_interval=3600), hot_codes),
+            ('recherche (sans cache)', ReferenceStore(path, check_interval=3600, cache_size=0), codes),
+        )
+        for label, store, lookups in cases:
+            timings = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                for code in lookups:
+                    store.airport(code)
+                timings.append(time.perf_counter() - started)
+            best = min(timings)
+            print(f"   {label:<28} {best / len(lookups) * 1e6:8.2f} µs/code")
+
+        offers = [make_offer(index, 'FIH', 'CDG', SEARCH_PARAMS['departure_date']) for index in range(args.offers)]
+        original_store = duffel_offers.reference_store
+        try:
+            for label, store in (('formatage sans référentiel', ReferenceStore(os.path.join(directory, 'absent.bin'))),
+                                 ('formatage avec référentiel', ReferenceStore(path, check_interval=3600))):
+                duffel_offers.reference_store = store
+                timings = []
+                for _ in range(args.iterations):
+                    started = time.perf_counter()
+                    for offer in offers:
+                        format_offer(offer)
+                    timings.append(time.perf_counter() - started)
+                best = min(timings)
+                print(f"   {label:<28} {best * 1000:8.2f} ms   {args.offers / best:>10,.0f} offres/s")
+        finally:
+            duffel_offers.reference_store = original_store
+
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            print("   mémoire par processus : /proc/self/smaps_rollup indisponible")
+            return
+        context = multiprocessing.get_context('fork')
+        for mode, label in (('dict', 'copie par processus (dict)'), ('mmap', 'fichier projeté (mmap)')):
+            workers = []
+            for _ in range(args.workers):
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=_reference_worker, args=(mode, path, codes, sender))
+                process.start()
+                workers.append((process, receiver))
+            private = []
+            for process, receiver in workers:
+                private.append(receiver.recv())
+                process.join()
+            print(f"   {label:<28} {statistics.mean(private) / 1024:8.2f} Mo privés/processus   "
+                  f"{sum(private) / 1024:8.2f} Mo pour {args.workers} processus")
+
+
+def bench_memory(args):
+    """Pic mémoire d'une recherche inline : corps JSON complet vs lecture des offres en flux"""
+    sizes = [int(size) for size in args.sizes.split(',')]
+    print(f"🧠 Mémoire de la recherche ({','.join(map(str, sizes))} offres, pic tracemalloc, "
+          f"{args.iterations} recherches chronométrées)")
+    for size in sizes:
+        with DuffelStandIn(offers=size) as stand_in:
+            # Serveur dans un processus à part : ses allocations ne comptent pas dans le pic
+            stand_in.server.shutdown()
+            server = multiprocessing.get_context('fork').Process(target=stand_in.server.serve_forever, daemon=True)
+            server.start()
+            try:
+                for label, stream in (('corps complet', False), ('en flux', True)):
+                    service = make_service(stand_in.base_url, STREAM_OFFERS=stream)
+                    service._fetch_search(**SEARCH_PARAMS)  # Préchauffage
+                    timings = []
+                    for _ in range(args.iterations):
+                        started = time.perf_counter()
+                        service._fetch_search(**SEARCH_PARAMS)
+                        timings.append(time.perf_counter() - started)
+                    tracemalloc.start()
+                    results = service._fetch_search(**SEARCH_PARAMS)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    print(f"   {size:>5} offres {label:<14} pic={peak / 1024 / 1024:7.1f} Mo   "
+                          f"p50={percentile(timings, 50) * 1000:8.1f} ms   conservées: {len(results['offers'])}")
+                    service.transport.close()
+            finally:
+                server.terminate()
+                server.join()
+
+
+class SlowStream:
+    """Sortie de logs lente (pipe saturé, disque chargé) : chaque écriture prend `write_ms`"""
+
+    def __init__(self, write_ms):
+        self.write_ms = write_ms
+        self.lines = 0
+
+    def write(self, text):
+        time.sleep(self.write_ms / 1000)
+        self.lines += 1
+
+    def flush(self):
+        pass
+
+
+def bench_logging(args):
+    """Journalisation vers une sortie lente : handler synchrone vs file d'attente + listener"""
+    print(f"📝 Journalisation ({args.iterations} recherches, écriture de log à {args.sink_ms} ms, "
+          f"latence {args.latency_ms} ms)")
+    root = logging.getLogger('ModuleFlight')
+    duffel = logging.getLogger('ModuleFlight.duffel')
+    saved = (root.handlers, root.level, root.propagate, duffel.handlers, duffel.propagate)
+    with DuffelStandIn(offers=args.offers, latency_ms=args.latency_ms) as stand_in:
+        for label, handler_class in (('handler synchrone', logging.StreamHandler), ('file + listener', QueueHandler)):
+            stream = SlowStream(args.sink_ms)
+            handler = handler_class(stream=stream)
+            root.handlers, root.level, root.propagate = [handler], logging.INFO, False
+            duffel.handlers, duffel.propagate = [], True
+            service = make_service(stand_in.base_url)
+            search_once(service)  # Préchauffage
+            stream.lines = 0
+            timings = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                search_once(service)
+                timings.append(time.perf_counter() - started)
+            handler.close()
+            print_latencies(label, timings)
+            print(f"   {'':<28} lignes par recherche: {stream.lines / args.iterations:.1f}")
+            service.transport.close()
+    root.handlers, root.level, root.propagate, duffel.handlers, duffel.propagate = saved
+
+
+SCENARIOS = {
+    'pool': bench_pool,
+    'async': bench_async,
+    'flex': bench_flex,
+    'multicity': bench_multicity,
+    'stream': bench_stream,
+    'inline': bench_inline,
+    'pages': bench_pages,
+    'coalesce': bench_coalesce,
+    'ratelimit': bench_ratelimit,
+    'priority': bench_priority,
+    'retry': bench_retry,
+    'circuit': bench_circuit,
+    'deadline': bench_deadline,
+    'logging': bench_logging,
+    'format': bench_format,
+    'query': bench_query,
+    'render': bench_render,
+    'payload': bench_payload,
+    'memory': bench_memory,
+    'raw': bench_raw,
+    'airports': bench_airports,
+    'reference': bench_reference,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks du service Duffel")
+    parser.add_argument('scenario', choices=sorted(SCENARIOS))
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--offers', type=int, default=50)
+    parser.add_argument('--handshake-ms', type=float, default=30)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--flex-days', type=int, default=3)
+    parser.add_argument('--legs', type=int, default=4)
+    parser.add_argument('--per-offer-ms', type=float, default=0)
+    parser.add_argument('--page-size', type=int, default=200)
+    parser.add_argument('--rate-per-minute', type=int, default=600)
+    parser.add_argument('--burst', type=int, default=10)
+    parser.add_argument('--max-wait', type=float, default=2)
+    parser.add_argument('--fail-rate', type=float, default=0.2)
+    parser.add_argument('--max-retries', type=int, default=3)
+    parser.add_argument('--outage-ms', type=float, default=1500)
+    parser.add_argument('--timeout', type=float, default=1)
+    parser.add_argument('--deadline', type=float, default=2)
+    parser.add_argument('--sink-ms', type=float, default=5)
+    parser.add_argument('--sizes', default='50,500,5000')
+    args = parser.parse_args()
+
+    print("🚀 Benchmark du service Duffel")
+    print("=" * 50)
+    SCENARIOS[args.scenario](args)
+    print("=" * 50)
+    print("🏁 Benchmark terminé")
+
+
+if __name__ == "__main__":
+    logging.getLogger('ModuleFlight').setLevel(os.environ.get('BENCH_LOG_LEVEL', 'WARNING'))
+    sys.exit(main())
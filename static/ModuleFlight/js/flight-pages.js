@@ -0,0 +1,32 @@
+/**
+ * ModuleFlight - Pages suivantes des résultats de recherche
+ * Le bouton « Voir plus de vols » est remplacé par la page suivante (cartes rendues côté serveur)
+ */
+
+$(document).ready(function() {
+    const FlightPages = {
+        init: function() {
+            $(document).on('click', '[data-next-page-url]', this.handleNextPage.bind(this));
+        },
+
+        handleNextPage: function(e) {
+            const $button = $(e.currentTarget);
+            const $container = $button.closest('.offer-next-page');
+            $container.find('.text-danger').remove();
+            $button.prop('disabled', true).text('Chargement...');
+
+            $.get($button.data('next-page-url'))
+                .done(function(html) {
+                    $container.replaceWith(html);
+                })
+                .fail(function(xhr) {
+                    const message = (xhr.responseJSON && xhr.responseJSON.message) || 'Impossible de charger la suite des résultats';
+                    $button.prop('disabled', false).text('Voir plus de vols');
+                    $container.append($('<p class="text-danger small mt-2 mb-0">').text(message));
+                });
+        }
+    };
+
+    FlightPages.init();
+    window.FlightPages = FlightPages;
+});
@@ -44,7 +44,8 @@ $(document).ready(function() {
                 departure_date: $('#departure_date').val(),
                 return_date: $('#return_date').val(),
                 passengers: $('#passengers').val(),
-                cabin_class: $('#cabin_class').val()
+                cabin_class: $('#cabin_class').val(),
+                flex_days: $('#flex_days').val() || '0'
             };
             
             // Validation côté client
@@ -242,35 +243,42 @@ $(document).ready(function() {
         },
 
         setupAirportValidation: function() {
-            // Autocomplete basique pour les aéroports courants
-            const commonAirports = [
-                { code: 'CDG', name: 'Paris Charles de Gaulle', city: 'Paris' },
-                { code: 'ORY', name: 'Paris Orly', city: 'Paris' },
-                { code: 'LHR', name: 'London Heathrow', city: 'London' },
-                { code: 'JFK', name: 'John F. Kennedy', city: 'New York' },
-                { code: 'LAX', name: 'Los Angeles International', city: 'Los Angeles' },
-                { code: 'DXB', name: 'Dubai International', city: 'Dubai' },
-                { code: 'NRT', name: 'Narita International', city: 'Tokyo' },
-                { code: 'SIN', name: 'Singapore Changi', city: 'Singapore' }
-            ];
+            // Autocomplétion servie par l'index local des aéroports (API /api/airports/)
+            const self = this;
+            const $airports = $('#origin, #destination');
+            const url = $airports.first().data('autocomplete-url') || '/flights/api/airports/';
 
-            // Si jQuery UI est disponible, setup autocomplete
+            // Listes Choices.js : recherche côté serveur à chaque frappe (avec un court délai)
+            if (window.Choices) {
+                $('.js-airport-choice').each(function() {
+                    const choices = new Choices(this, {
+                        searchEnabled: true,
+                        searchChoices: false,
+                        searchFloor: 2,
+                        shouldSort: false,
+                        itemSelectText: '',
+                        noResultsText: 'Aucun aéroport trouvé'
+                    });
+                    let timer = null;
+                    this.addEventListener('search', function(event) {
+                        clearTimeout(timer);
+                        timer = setTimeout(function() {
+                            self.fetchAirports(url, event.detail.value, function(items) {
+                                choices.setChoices(items, 'value', 'label', true);
+                            });
+                        }, 120);
+                    });
+                });
+            }
+
+            // Champs texte : jQuery UI si disponible
             if ($.fn.autocomplete) {
-                $('#origin, #destination').autocomplete({
+                $airports.filter('input').autocomplete({
                     source: function(request, response) {
-                        const term = request.term.toLowerCase();
-                        const matches = commonAirports.filter(airport => 
-                            airport.code.toLowerCase().includes(term) ||
-                            airport.name.toLowerCase().includes(term) ||
-                            airport.city.toLowerCase().includes(term)
-                        );
-                        
-                        response(matches.map(airport => ({
-                            label: `${airport.code} - ${airport.name} (${airport.city})`,
-                            value: airport.code
-                        })));
+                        self.fetchAirports(url, request.term, response);
                     },
                     minLength: 2,
+                    delay: 120,
                     select: function(event, ui) {
                         $(this).val(ui.item.value);
                         return false;
@@ -279,6 +287,27 @@ $(document).ready(function() {
             }
         },
 
+        fetchAirports: function(url, term, callback) {
+            // Les requêtes dépassées par une frappe plus récente sont abandonnées
+            if (this.airportRequest) {
+                this.airportRequest.abort();
+            }
+            this.airportRequest = $.getJSON(url, { q: term })
+                .done(function(data) {
+                    callback((data.data ? data.data.results : []).map(airport => ({
+                        value: airport.code,
+                        label: airport.type === 'city'
+                            ? `${airport.city} - tous les aéroports (${airport.code})`
+                            : `${airport.city ? airport.city + ' - ' : ''}${airport.name} (${airport.code})`
+                    })));
+                })
+                .fail(function(xhr, textStatus) {
+                    if (textStatus !== 'abort') {
+                        callback([]);
+                    }
+                });
+        },
+
         validateIATACode: function(code) {
             return /^[A-Z]{3}$/.test(code);
         }
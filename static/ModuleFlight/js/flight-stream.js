@@ -0,0 +1,126 @@
+/**
+ * ModuleFlight - Résultats de recherche en flux (Server-Sent Events)
+ * Chaque offre est ajoutée à la page dès sa réception, puis le résumé (total, facettes)
+ */
+
+$(document).ready(function() {
+    const DEPARTURE_LABELS = {
+        night: 'Nuit (0h-6h)',
+        morning: 'Matin (6h-12h)',
+        afternoon: 'Après-midi (12h-18h)',
+        evening: 'Soir (18h-24h)'
+    };
+
+    const FlightStream = {
+        init: function() {
+            this.$list = $('#offer-stream');
+            this.url = this.$list.data('stream-url');
+            this.count = 0;
+            if (!this.url || typeof EventSource === 'undefined') {
+                return;
+            }
+            this.open();
+        },
+
+        open: function() {
+            this.source = new EventSource(this.url);
+            this.source.addEventListener('offer', this.handleOffer.bind(this));
+            this.source.addEventListener('summary', this.handleSummary.bind(this));
+            this.source.addEventListener('search_error', this.handleSearchError.bind(this));
+            // Coupure réseau : pas de reconnexion automatique (elle relancerait la recherche)
+            this.source.onerror = this.handleConnectionError.bind(this);
+        },
+
+        close: function() {
+            if (this.source) {
+                this.source.close();
+            }
+            $('#offer-stream-loader').addClass('d-none');
+        },
+
+        handleOffer: function(e) {
+            const data = JSON.parse(e.data);
+            this.$list.append(data.html);
+            this.count += 1;
+            $('#offer-stream-count').text(this.count + ' vol' + (this.count > 1 ? 's' : '') + ' trouvé' + (this.count > 1 ? 's' : '') + '...');
+        },
+
+        handleSummary: function(e) {
+            const data = JSON.parse(e.data);
+            this.close();
+            // Recherche gardée côté serveur : filtres et tris via api/search/<search_id>/results/
+            this.searchId = data.search_id;
+            this.$list.attr('data-search-id', data.search_id || '');
+
+            const total = data.total_offers;
+            if (total === 0) {
+                $('#offer-stream-count').text('Résultats de recherche');
+                $('#offer-stream-empty').removeClass('d-none');
+                return;
+            }
+            const plural = total > 1 ? 's' : '';
+            $('#offer-stream-count').text(total + ' vol' + plural + ' disponible' + plural);
+            this.renderFacets(data.facets);
+        },
+
+        renderFacets: function(facets) {
+            const parts = [];
+            if (facets.price && facets.price.min !== null) {
+                parts.push('<strong>Prix :</strong> ' + facets.price.min + ' - ' + facets.price.max + ' ' + (facets.price.currency || ''));
+            }
+            const stops = Object.keys(facets.stops || {}).sort().map(function(count) {
+                const label = count === '0' ? 'Direct' : count + ' escale' + (count > 1 ? 's' : '');
+                return label + ' (' + facets.stops[count] + ')';
+            });
+            if (stops.length) {
+                parts.push('<strong>Escales :</strong> ' + stops.join(', '));
+            }
+            const windows = Object.keys(DEPARTURE_LABELS).filter(function(name) {
+                return facets.departure && facets.departure[name];
+            }).map(function(name) {
+                return DEPARTURE_LABELS[name] + ' (' + facets.departure[name] + ')';
+            });
+            if (windows.length) {
+                parts.push('<strong>Départ :</strong> ' + windows.join(', '));
+            }
+            const airlines = (facets.airlines || []).map(function(airline) {
+                return $('<span>').text(airline.name + ' (' + airline.count + ')').html();
+            });
+            if (airlines.length) {
+                parts.push('<strong>Compagnies :</strong> ' + airlines.join(', '));
+            }
+            $('#offer-stream-facets').removeClass('d-none').find('.card-body').html(parts.join('<br>'));
+        },
+
+        handleSearchError: function(e) {
+            const data = JSON.parse(e.data);
+            this.close();
+            $('#offer-stream-count').text('Erreur de recherche');
+            if (typeof showNotification === 'function') {
+                showNotification({
+                    title: 'Erreur de recherche',
+                    message: data.message,
+                    type: 'error',
+                    duration: 8000
+                });
+            }
+            if (this.count === 0) {
+                $('#offer-stream-empty').removeClass('d-none');
+            }
+        },
+
+        handleConnectionError: function() {
+            if (this.source && this.source.readyState === EventSource.CLOSED) {
+                return;
+            }
+            this.close();
+            if (this.count === 0) {
+                $('#offer-stream-count').text('Résultats de recherche');
+                $('#offer-stream-empty').removeClass('d-none');
+            }
+        }
+    };
+
+    FlightStream.init();
+    window.FlightStream = FlightStream;
+});